@@ -1,32 +1,244 @@
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, session, stream_with_context
 from flask import redirect
+from datetime import datetime
 import os
 import sys
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+# front-end files (see static_assets.StaticAssetStore)
+FRONTEND_DIR = os.path.join(BASE_DIR, "web_frontend")
 
 import auth
 import election
+import eligibility
 import voting
 import blockchain
 import reporting
-
-app = Flask(__name__, static_folder="web_frontend", static_url_path="")
-app.secret_key = "change-me-in-real-app"   # for sessions (ok for local demo)
-
-@app.get("/api/ping")
+import profiling
+import provisioning
+import ranked
+import reconcile
+import admission
+import analytics
+import archive
+import history
+import jobs
+import events
+import responses
+import shared_state
+import static_assets
+import storage
+import tenants
+import traffic
+
+api = Blueprint("api", __name__)
+
+@api.get("/api/ping")
 def api_ping():
     print("DEBUG: /api/ping was called")
     return jsonify({"ok": True, "msg": "Hello from Python API"})
 
 # ---------- helpers ----------
 
+def app_state():
+    """Per-app objects created by create_app() (storage, caches, assets)."""
+    return current_app.extensions["evoting"]
+
+
+# streams, static files and the capture's own endpoints are not recorded
+UNCAPTURED_ENDPOINTS = {
+    "api.api_stream",
+    "api.index",
+    "api.fingerprinted_asset",
+    "api.asset",
+    "api.api_capture_status",
+    "api.api_capture_start",
+    "api.api_capture_stop",
+}
+
+
+@api.before_app_request
+def capture_request():
+    """Traffic capture (see traffic.py); runs first so rejected requests are recorded too."""
+    recorder = app_state()["traffic"]
+    if not recorder.active or request.endpoint not in current_app.view_functions \
+            or request.endpoint in UNCAPTURED_ENDPOINTS:
+        return
+    # one id per browser session, so replay keeps each client's requests in order
+    session_id = session.get("capture_session")
+    if session_id is None:
+        session_id = session["capture_session"] = traffic.new_session_id()
+    path = request.full_path if request.query_string else request.path
+    g.capture = recorder.begin(session_id, request.method, path, request.get_json(silent=True))
+
+
+@api.after_app_request
+def capture_status(response):
+    if "capture" in g:
+        g.capture_status = response.status_code
+    return response
+
+
+@api.teardown_app_request
+def finish_capture(exc):
+    ctx = g.pop("capture", None)
+    if ctx is not None:
+        app_state()["traffic"].end(ctx, g.pop("capture_status", 500))
+
+
+@api.before_app_request
+def admit_request():
+    """Rate limits and the bounded priority queue (see admission.py)."""
+    control = app_state()["admission"]
+    if control is None:
+        return None
+    # logged-in users are limited per account, others per address
+    client = session.get("username") or request.remote_addr
+    decision = control.admit(request.endpoint, request.method, client)
+    if isinstance(decision, admission.Rejected):
+        resp = jsonify({"ok": False, "error": f"Too many requests: {decision.reason}"})
+        resp.status_code = 429
+        resp.headers["Retry-After"] = str(decision.retry_after)
+        return resp
+    g.admitted = decision is True
+    return None
+
+
+@api.teardown_app_request
+def release_admission(exc):
+    if g.pop("admitted", False):
+        app_state()["admission"].release()
+
+
+# shared front-end files: served without looking up a tenant
+TENANTLESS_ENDPOINTS = {"api.index", "api.fingerprinted_asset", "api.asset"}
+
+
+@api.before_app_request
+def activate_storage():
+    # every module reads/writes through storage.get_storage()
+    registry = app_state()["tenants"]
+    if registry is None:
+        g.storage_token = storage.activate(app_state()["storage"])
+        return None
+    if request.endpoint in TENANTLESS_ENDPOINTS:
+        return None
+    name = registry.resolve(request.host, request.environ.get("evoting.tenant"))
+    try:
+        if name is None:
+            raise tenants.TenantError("No tenant in the host name or path.")
+        store = registry.acquire(name)
+    except tenants.TenantError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 404
+    g.tenant = name
+    g.tenant_store = store
+    g.storage_token = storage.activate(store)
+    return None
+
+
+@api.teardown_app_request
+def deactivate_storage(exc):
+    token = g.pop("storage_token", None)
+    if token is not None:
+        storage.deactivate(token)
+    store = g.pop("tenant_store", None)
+    if store is not None:
+        app_state()["tenants"].release(g.tenant, store)
+
+
+# long-lived streams and the profiler's own endpoints
+UNPROFILED_ENDPOINTS = {
+    "api.api_stream",
+    "api.api_profiling_report",
+    "api.api_profiling_start",
+    "api.api_profiling_stop",
+    "api.api_profiling_reset",
+    "api.api_profiling_collapsed",
+}
+
+
+@api.before_app_request
+def start_profiling():
+    profiler = app_state()["profiler"]
+    # off: this check is all a request pays
+    if profiler.active and request.endpoint not in UNPROFILED_ENDPOINTS:
+        rule = request.url_rule.rule if request.url_rule else request.path
+        g.profile = profiler.begin(f"{request.method} {rule}")
+
+
+@api.teardown_app_request
+def stop_profiling(exc):
+    ctx = g.pop("profile", None)
+    if ctx is not None:
+        app_state()["profiler"].end(ctx)
+
+
+@api.after_app_request
+def compress(response):
+    cache = None
+    if getattr(response, "cache_key", None) is not None:
+        cache = response_cache("compressed", lambda: responses.SerializedCache(max_items=256))
+    return responses.compress_response(response, request.headers.get("Accept-Encoding"), cache)
+
+
+def json_bytes_response(body, cache_key=None):
+    """Response for an already encoded JSON body."""
+    resp = current_app.response_class(body, mimetype="application/json")
+    resp.cache_key = cache_key
+    return resp
+
+
+def response_cache(name, factory):
+    """Encoded-response cache of the current storage (each tenant has its own)."""
+    return storage.get_storage().cached(name, factory)
+
+
+def chain_snapshot():
+    """
+    The blockchain as this request sees it: taken once per request, so
+    every read in the request is consistent while votes keep being added.
+    Reads don't take the blockchain's write lock.
+    """
+    if "chain_snapshot" not in g:
+        g.chain_snapshot = blockchain.get_blockchain().snapshot()
+    return g.chain_snapshot
+
+
+def ledger_snapshot():
+    """
+    What tallies and block counts are read from: the chain snapshot, or,
+    with a shared ledger, the shared segment (so this worker doesn't need
+    to load the chain to serve results).
+    """
+    if "ledger_snapshot" not in g:
+        shared = shared_state.get_shared_ledger()
+        g.ledger_snapshot = shared.snapshot() if shared is not None else chain_snapshot()
+    return g.ledger_snapshot
+
+
+def result_entry(e, tallies):
+    """Result summary of one election; ranked ones include the runoff rounds."""
+    entry = {"election": e, "counts": tallies.get(e["id"], {})}
+    if ranked.is_ranked(e):
+        entry["irv"] = ranked.tabulate_election(e)
+    return entry
+
+
+def election_error_response(exc):
+    """JSON error for an ElectionError: 404 if the election doesn't exist, else 400."""
+    code = 404 if isinstance(exc, election.ElectionNotFound) else 400
+    return jsonify({"ok": False, "error": str(exc)}), code
+
+
 def current_user():
     username = session.get("username")
     role = session.get("role")
     if not username or not role:
         return None
+    # a login is only valid for the tenant it was made on
+    if session.get("tenant") != g.get("tenant"):
+        return None
     return {"username": username, "role": role}
 
 
@@ -48,15 +260,36 @@ def require_admin():
 
 # ---------- static front-end ----------
 
-@app.route("/")
+@api.route("/")
 def index():
-    # serve index.html from web_frontend folder
-    return send_from_directory(app.static_folder, "index.html")
+    # serve index.html from web_frontend folder (kept in memory, precompressed)
+    assets = app_state()["assets"]
+    return assets.response(assets.get("index.html"), request)
+
+
+@api.get(static_assets.ASSET_PREFIX + "<path:name>")
+def fingerprinted_asset(name):
+    """Immutable, content-addressed URLs (see StaticAssetStore.url_for)."""
+    assets = app_state()["assets"]
+    asset = assets.get_fingerprinted(name)
+    if asset is None:
+        return jsonify({"ok": False, "error": "Not found"}), 404
+    return assets.response(asset, request, immutable=True)
+
+
+@api.get("/<path:name>")
+def asset(name):
+    """Front-end files by their own name (e.g. /index.html): revalidated on every use."""
+    assets = app_state()["assets"]
+    found = assets.get(name)
+    if found is None:
+        return jsonify({"ok": False, "error": "Not found"}), 404
+    return assets.response(found, request)
 
 
 # ---------- auth endpoints ----------
 
-@app.post("/api/register")
+@api.post("/api/register")
 def api_register():
     data = request.get_json(force=True)
     username = (data.get("username") or "").strip()
@@ -88,7 +321,7 @@ def api_register():
     return jsonify({"ok": True, "role": role})
 
 
-@app.post("/api/login")
+@api.post("/api/login")
 def api_login():
     data = request.get_json(force=True)
     username = (data.get("username") or "").strip()
@@ -105,12 +338,13 @@ def api_login():
 
     session["username"] = user["username"]
     session["role"] = user["role"]
+    session["tenant"] = g.get("tenant")
 
     reporting.log_action(username, "LOGIN_API", f"role={user['role']}")
     return jsonify({"ok": True, "username": user["username"], "role": user["role"]})
 
 
-@app.post("/api/logout")
+@api.post("/api/logout")
 def api_logout():
     user = current_user()
     if user:
@@ -119,7 +353,7 @@ def api_logout():
     return jsonify({"ok": True})
 
 
-@app.get("/api/me")
+@api.get("/api/me")
 def api_me():
     user = current_user()
     if not user:
@@ -127,76 +361,140 @@ def api_me():
     return jsonify({"ok": True, "user": user})
 
 
+@api.get("/api/bootstrap")
+def api_bootstrap():
+    """
+    Everything the front end needs on page load in one round trip:
+    the current user, active elections with candidates and, for admins,
+    all elections with result summaries.
+    """
+    user = current_user()
+    els = election._load_elections()
+    out = {
+        "ok": True,
+        "user": user,
+        "active_elections": [e for e in els if e.get("is_active")],
+    }
+    if user and user["role"] == "admin":
+        tallies = archive.with_archived_tallies(analytics.get_ledger().tally_all(ledger_snapshot()))
+        out["elections"] = els
+        out["results"] = [result_entry(e, tallies) for e in els]
+
+    resp = jsonify(out)
+    # per-user data: browsers may keep it but must revalidate (cheap 304)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    resp.vary.add("Cookie")
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+
 # ---------- elections (admin) ----------
 
-@app.get("/api/elections")
+@api.get("/api/elections")
 def api_list_elections():
     els = election._load_elections()
     return jsonify({"ok": True, "elections": els})
 
 
-@app.post("/api/elections")
+@api.post("/api/elections")
 def api_create_election():
     user, resp, code = require_admin()
     if resp:
         return resp, code
 
     data = request.get_json(force=True)
-    title = (data.get("title") or "").strip()
-    desc = (data.get("description") or "").strip()
-    if not title:
-        return jsonify({"ok": False, "error": "title required"}), 400
-
-    els = election._load_elections()
-    new_id = election._next_election_id(els)
-    new_e = {
-        "id": new_id,
-        "title": title,
-        "description": desc,
-        "is_active": False,
-        "candidates": [],
-    }
-    els.append(new_e)
-    election._save_elections(els)
-    reporting.log_action(user["username"], "CREATE_ELECTION_API", f"id={new_id}")
+    try:
+        new_e = election.new_election(data.get("title"), data.get("description"),
+                                      data.get("type") or ranked.SINGLE)
+    except election.ElectionError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    reporting.log_action(user["username"], "CREATE_ELECTION_API", f"id={new_e['id']}")
     return jsonify({"ok": True, "election": new_e})
 
 
-@app.post("/api/elections/<int:eid>/candidates")
-def api_add_candidate(eid):
+@api.post("/api/elections/bulk")
+def api_provision_elections():
+    """
+    Admin: create many elections with candidates from one spec
+    (see provisioning.validate_spec). All or nothing, one write.
+    """
     user, resp, code = require_admin()
     if resp:
         return resp, code
 
-    data = request.get_json(force=True)
-    name = (data.get("name") or "").strip()
-    els = election._load_elections()
-    e = next((x for x in els if x["id"] == eid), None)
-    if not e:
+    spec = request.get_json(force=True, silent=True)
+    if spec is None:
+        return jsonify({"ok": False, "error": "JSON spec required"}), 400
+    try:
+        created = provisioning.provision_elections(spec, username=user["username"])
+    except provisioning.ProvisioningError as exc:
+        return jsonify({"ok": False, "error": str(exc), "problems": exc.errors}), 400
+    return jsonify({"ok": True, "created": len(created), "ids": [e["id"] for e in created]})
+
+
+@api.get("/api/elections/<int:eid>/roll")
+def api_get_roll(eid):
+    """Admin: whether the election has a voter roll, and its turnout (eligible, voted, %)."""
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    e = next((x for x in election._load_elections() if x["id"] == eid), None)
+    if e is None:
         return jsonify({"ok": False, "error": "Election not found"}), 404
-    if not name:
-        return jsonify({"ok": False, "error": "name required"}), 400
+    return jsonify({"ok": True, "roll": e.get("roll"), "turnout": eligibility.get_rolls().turnout(e)})
+
+
+@api.put("/api/elections/<int:eid>/roll")
+def api_set_roll(eid):
+    """
+    Admin: restrict voting to {"usernames": [...]}; {"usernames": null}
+    opens the election to every user again.
+    """
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    data = request.get_json(force=True, silent=True) or {}
+    usernames = data.get("usernames")
+    if usernames is not None and (not isinstance(usernames, list)
+                                  or not all(isinstance(u, str) for u in usernames)):
+        return jsonify({"ok": False, "error": "usernames must be a list of strings or null"}), 400
+
+    try:
+        e = eligibility.set_roll(eid, usernames)
+    except election.ElectionError as exc:
+        return election_error_response(exc)
+    except eligibility.RollError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    reporting.log_action(user["username"], "SET_ROLL_API",
+                         f"election_id={eid}, eligible={e['roll']['eligible'] if e.get('roll') else 'all'}")
+    return jsonify({"ok": True, "roll": e.get("roll"), "turnout": eligibility.get_rolls().turnout(e)})
+
+
+@api.post("/api/elections/<int:eid>/candidates")
+def api_add_candidate(eid):
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
 
-    cid = election._next_candidate_id(e)
-    e.setdefault("candidates", []).append({"id": cid, "name": name})
-    election._save_elections(els)
+    data = request.get_json(force=True)
+    try:
+        e = election.add_candidates(eid, [data.get("name")])
+    except election.ElectionError as exc:
+        return election_error_response(exc)
     reporting.log_action(user["username"], "ADD_CANDIDATE_API", f"election_id={eid}")
     return jsonify({"ok": True, "election": e})
 
 
-@app.post("/api/elections/<int:eid>/toggle")
+@api.post("/api/elections/<int:eid>/toggle")
 def api_toggle_election(eid):
     user, resp, code = require_admin()
     if resp:
         return resp, code
 
-    els = election._load_elections()
-    e = next((x for x in els if x["id"] == eid), None)
-    if not e:
-        return jsonify({"ok": False, "error": "Election not found"}), 404
-
-    e["is_active"] = not e.get("is_active", False)
-    election._save_elections(els)
+    try:
+        e = election.set_election_active(eid)
+    except election.ElectionError as exc:
+        return election_error_response(exc)
     reporting.log_action(
         user["username"],
         "TOGGLE_ELECTION_API",
@@ -205,7 +503,22 @@ def api_toggle_election(eid):
     return jsonify({"ok": True, "election": e})
 
 
-@app.get("/api/elections/active")
+@api.post("/api/elections/<int:eid>/archive")
+def api_archive_election(eid):
+    """Move a closed election's blocks into a compressed cold segment."""
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+
+    try:
+        entry = archive.archive_election(eid)
+    except archive.ArchiveError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    reporting.log_action(user["username"], "ARCHIVE_ELECTION_API", f"election_id={eid}")
+    return jsonify({"ok": True, "archive": entry})
+
+
+@api.get("/api/elections/active")
 def api_active_elections():
     active = election.list_active_elections()
     return jsonify({"ok": True, "elections": active})
@@ -213,7 +526,7 @@ def api_active_elections():
 
 # ---------- voting ----------
 
-@app.post("/api/vote")
+@api.post("/api/vote")
 def api_vote():
     user, resp, code = require_logged_in()
     if resp:
@@ -222,70 +535,414 @@ def api_vote():
     data = request.get_json(force=True)
     try:
         election_id = int(data.get("election_id"))
-        candidate_id = int(data.get("candidate_id"))
     except (TypeError, ValueError):
         return jsonify({"ok": False, "error": "invalid ids"}), 400
 
-    # reuse your helpers
-    if voting.has_user_voted_in_election(user["username"], election_id):
-        return jsonify({"ok": False, "error": "Already voted in this election"}), 400
+    # closed elections are final (their cached results rely on it)
+    e = next((x for x in election.list_active_elections() if x["id"] == election_id), None)
+    if e is None:
+        return jsonify({"ok": False, "error": "Election not found or not active"}), 400
+
+    ranking = None
+    if ranked.is_ranked(e):
+        # a plain candidate_id is accepted as a one-candidate ranking
+        try:
+            ranking = ranked.parse_ranking(data.get("ranking") or [data.get("candidate_id")], e)
+        except ValueError as exc:
+            return jsonify({"ok": False, "error": str(exc)}), 400
+        candidate_id = ranking[0]
+    else:
+        try:
+            candidate_id = int(data.get("candidate_id"))
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "error": "invalid ids"}), 400
+        if not any(c["id"] == candidate_id for c in e.get("candidates", [])):
+            return jsonify({"ok": False, "error": "No such candidate in this election"}), 400
 
-    votes = voting._load_votes()
     new_vote = {
-        "id": voting._next_vote_id(votes),
         "election_id": election_id,
         "voter_username": user["username"],
         "candidate_id": candidate_id,
     }
-    votes.append(new_vote)
-    voting._save_votes(votes)
-
-    block = blockchain.add_vote_to_blockchain(
-        user["username"], election_id, candidate_id
-    )
+    if ranking is not None:
+        new_vote["ranking"] = ranking
+    try:
+        block = voting.record_vote(new_vote, e)
+    except voting.NotEligible as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 403
+    except voting.AlreadyVoted as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
 
     reporting.log_action(
         user["username"],
         "VOTE_API",
         f"election_id={election_id}, candidate_id={candidate_id}, block={block.index}",
     )
+    events.publish_vote_block(block)
 
     return jsonify({"ok": True, "block_index": block.index})
 
 
 # ---------- blockchain + results ----------
 
-@app.get("/api/blockchain")
+@api.get("/api/blockchain")
 def api_blockchain():
-    bc = blockchain.get_blockchain()
-    chain_dicts = [b.to_dict() for b in bc.get_chain()]
-    return jsonify({"ok": True, "chain": chain_dicts})
-
+    """
+    The hot chain. ?include_archived=1 also returns the blocks of archived
+    elections (read back from their segments) in index order.
+    """
+    if request.args.get("include_archived") == "1":
+        chain = [b.to_dict() for b in archive.full_chain()]
+        return jsonify({"ok": True, "chain": chain, "archives": archive._load_manifest()})
+
+    chain_json, count, last_hash = response_cache("chain_json", responses.ChainJSONCache).chain_bytes(
+        chain_snapshot())
+    body = b'{"ok":true,"chain":' + chain_json + b"}"
+    return json_bytes_response(body, cache_key=("chain", count, last_hash))
+
+
+@api.get("/api/stream")
+def api_stream():
+    """
+    Server-sent events: "block" (new block header) and "tally"
+    (per-election vote delta) as votes are committed.
+    Clients load /api/results once, then apply the deltas.
+    """
+    try:
+        last_id = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        last_id = None
 
-@app.get("/api/blockchain/verify")
+    publisher = events.get_publisher()
+    try:
+        sub = publisher.subscribe(last_event_id=last_id)
+    except events.TooManySubscribers:
+        return jsonify({"ok": False, "error": "Too many live subscribers"}), 503
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                messages = sub.get(timeout=15)
+                if not messages:
+                    yield ": keep-alive\n\n"
+                for m in messages:
+                    yield m
+        finally:
+            publisher.unsubscribe(sub)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+
+
+@api.get("/api/blockchain/verify")
 def api_blockchain_verify():
+    """?archives=1 also checks the archived segments."""
     bc = blockchain.get_blockchain()
-    valid, msg = bc.is_valid()
-    return jsonify({"ok": True, "valid": valid, "message": msg})
+    snapshot = chain_snapshot()
+    valid, msg = bc.is_valid(snapshot)
+    if valid and request.args.get("archives") == "1":
+        valid, msg = archive.verify_archives()
+    return jsonify({"ok": True, "valid": valid, "message": msg, "blocks": len(snapshot)})
+
+
+@api.get("/api/reconcile")
+def api_reconcile():
+    """
+    Admin: ballots that votes.json and the blockchain disagree on.
+    Incremental by default; ?full=1 re-checks every ballot.
+    """
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    full = request.args.get("full") == "1"
+    return jsonify({"ok": True, **reconcile.get_reconciler(full=full).report()})
 
 
-@app.get("/api/results")
+@api.get("/api/results")
 def api_results():
     elections = election._load_elections()
-    votes = voting._load_votes()
-    out = []
+    version = election.elections_version()
+    snapshot = ledger_snapshot()
+    tallies = archive.with_archived_tallies(analytics.get_ledger().tally_all(snapshot))
+    results_json = response_cache("results_json", responses.SerializedCache)
+    parts = []
 
     for e in elections:
-        counts = {}
-        for v in votes:
-            if v["election_id"] == e["id"]:
-                cid = v["candidate_id"]
-                counts[cid] = counts.get(cid, 0) + 1
-        out.append({"election": e, "counts": counts})
+        if e.get("is_active"):
+            parts.append(responses.dumps(result_entry(e, tallies)))
+            continue
+        key = ("results", e["id"], version)
+        encoded = results_json.get(key)
+        if encoded is None:
+            encoded = results_json.put(key, responses.dumps(result_entry(e, tallies)))
+        parts.append(encoded)
+
+    head = responses.dumps({"ok": True, "blocks": len(snapshot), "last_hash": snapshot.last_hash})
+    body = head[:-1] + b',"results":[' + b",".join(parts) + b"]}"
+    return json_bytes_response(body)
+
+
+@api.get("/api/results/<int:eid>/rounds")
+def api_irv_rounds(eid):
+    """Round-by-round instant-runoff tabulation of a ranked election."""
+    e = next((x for x in election._load_elections() if x["id"] == eid), None)
+    if e is None:
+        return jsonify({"ok": False, "error": "Election not found"}), 404
+    if not ranked.is_ranked(e):
+        return jsonify({"ok": False, "error": "Not a ranked election"}), 400
+    return jsonify({"ok": True, "election_id": eid, **ranked.tabulate_election(e)})
+
+
+@api.get("/api/results/history")
+def api_results_history():
+    """Standings as of ?block=<index> or ?at=<ISO time>."""
+    hist = history.get_history()
+    try:
+        if "block" in request.args:
+            block_index, tallies = hist.tallies_at_block(int(request.args["block"]))
+        elif "at" in request.args:
+            block_index, tallies = hist.tallies_at_time(request.args["at"])
+        else:
+            return jsonify({"ok": False, "error": "block or at required"}), 400
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid block or time"}), 400
+
+    timestamp = None
+    if block_index is not None:
+        timestamp = hist.timestamp_of(block_index)
+
+    out = [{"election_id": eid, "counts": counts} for eid, counts in sorted(tallies.items())]
+    return jsonify({"ok": True, "block_index": block_index, "timestamp": timestamp, "results": out})
+
+
+@api.get("/api/results/<int:eid>/turnout")
+def api_turnout(eid):
+    try:
+        bucket = int(request.args.get("bucket", 3600))
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid bucket"}), 400
+    if bucket <= 0:
+        return jsonify({"ok": False, "error": "invalid bucket"}), 400
+
+    histogram = analytics.get_ledger().turnout_histogram(eid, bucket_seconds=bucket, snapshot=ledger_snapshot())
+    return jsonify({"ok": True, "election_id": eid, "bucket_seconds": bucket, "turnout": histogram})
+
+
+# ---------- profiling (admin) ----------
+
+@api.get("/api/admin/profiling")
+def api_profiling_report():
+    """
+    Profiler status, per-route aggregates and, with memory profiling,
+    process-wide allocation growth (?limit= functions/allocation sites).
+    """
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid limit"}), 400
+    profiler = app_state()["profiler"]
+    return jsonify({"ok": True, **profiler.status(), "routes": profiler.summary(limit),
+                    "process_allocations": profiler.allocations(limit)})
+
+
+@api.post("/api/admin/profiling/start")
+def api_profiling_start():
+    """
+    Start profiling: {"sample_rate": 0.1, "duration": 60, "memory": true}.
+    All fields are optional (every request, until stopped, no memory tracing).
+    """
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        sample_rate = float(data.get("sample_rate", 1.0))
+        duration = float(data["duration"]) if data.get("duration") is not None else None
+        app_state()["profiler"].start(sample_rate, duration, bool(data.get("memory")))
+    except (TypeError, ValueError) as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    reporting.log_action(user["username"], "PROFILING_START", f"sample_rate={sample_rate}, duration={duration}")
+    return jsonify({"ok": True, **app_state()["profiler"].status()})
+
+
+@api.post("/api/admin/profiling/stop")
+def api_profiling_stop():
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    app_state()["profiler"].stop()
+    return jsonify({"ok": True, **app_state()["profiler"].status()})
+
+
+@api.post("/api/admin/profiling/reset")
+def api_profiling_reset():
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    app_state()["profiler"].reset()
+    return jsonify({"ok": True})
+
+
+@api.get("/api/admin/profiling/collapsed")
+def api_profiling_collapsed():
+    """Sampled stacks in collapsed format, e.g. for flamegraph.pl."""
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    return Response(app_state()["profiler"].collapsed_stacks(), mimetype="text/plain")
+
+
+# ---------- traffic capture (admin) ----------
+
+@api.get("/api/admin/capture")
+def api_capture_status():
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    return jsonify({"ok": True, **app_state()["traffic"].status()})
+
+
+@api.post("/api/admin/capture/start")
+def api_capture_start():
+    """
+    Start recording requests for replay: {"duration": 600, "max_requests": 100000}
+    (both optional). The capture file is written to the reports directory;
+    replay it with `python src/traffic.py <file>`.
+    """
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    if app_state()["tenants"] is not None:
+        # one recorder sees every tenant's requests
+        return jsonify({"ok": False, "error": "Capture is not available with multiple tenants"}), 400
+    data = request.get_json(force=True, silent=True) or {}
+    name = f"traffic_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    path = os.path.join(storage.get_storage().reports_dir, name)
+    try:
+        duration = float(data["duration"]) if data.get("duration") is not None else None
+        max_requests = int(data["max_requests"]) if data.get("max_requests") is not None else None
+        app_state()["traffic"].start(path, auth._load_users(), election._load_elections(),
+                                     duration, max_requests)
+    except (TypeError, ValueError) as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    reporting.log_action(user["username"], "CAPTURE_START", f"file={name}")
+    return jsonify({"ok": True, **app_state()["traffic"].status()})
+
+
+@api.post("/api/admin/capture/stop")
+def api_capture_stop():
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    recorder = app_state()["traffic"]
+    recorder.stop()
+    reporting.log_action(user["username"], "CAPTURE_STOP", f"requests={recorder.recorded}")
+    return jsonify({"ok": True, **recorder.status()})
+
+
+# ---------- background jobs (admin) ----------
+
+@api.get("/api/admin/jobs")
+def api_list_jobs():
+    """Recent jobs, newest first (?limit=), and the queue status."""
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid limit"}), 400
+    manager = jobs.get_job_manager()
+    return jsonify({"ok": True, **manager.status(), "jobs": manager.list(limit)})
+
+
+@api.post("/api/admin/jobs")
+def api_submit_job():
+    """
+    Queue a job: {"kind": "verify"|"dump"|"export"|"archive"|"backup", "params": {...}}.
+    Params: verify {"archives": bool}, export {"election_ids": [...],
+    "formats": [...]}, archive {"election_id": n}, backup {"incremental": bool}.
+    Answers 202 with the job.
+    """
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        job = jobs.get_job_manager().submit(data.get("kind"), data.get("params"), user["username"])
+    except jobs.JobError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    return jsonify({"ok": True, "job": job}), 202
+
+
+@api.get("/api/admin/jobs/<int:job_id>")
+def api_get_job(job_id):
+    """One job: status, progress, and its result once finished."""
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    job = jobs.get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Job not found"}), 404
+    return jsonify({"ok": True, "job": job})
+
+
+@api.post("/api/admin/jobs/<int:job_id>/cancel")
+def api_cancel_job(job_id):
+    user, resp, code = require_admin()
+    if resp:
+        return resp, code
+    try:
+        job = jobs.get_job_manager().cancel(job_id, user["username"])
+    except jobs.JobError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    return jsonify({"ok": True, "job": job})
+
+
+def create_app(storage_config=None, secret_key="change-me-in-real-app", admission_control=None,
+               tenant_registry=None):
+    """
+    Application factory.
+    storage_config selects where this instance keeps its data (see
+    storage.from_config): None for the project's data/ folder, a directory
+    path, ":memory:" or a Storage object. Each app gets its own blockchain
+    and caches, so many independent apps can run in one process.
+    admission_control is an admission.Admission (default limits if None)
+    or False to turn rate limiting and request queueing off.
+    tenant_registry (a tenants.TenantRegistry) makes the app serve many
+    organizations, each with its own data, chosen per request by host
+    name or /t/<tenant>/ path prefix; storage_config is then ignored.
+    """
+    # front-end files are served by the asset store, not Flask's static route
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = secret_key   # for sessions (ok for local demo)
+    app.json = responses.FastJSONProvider(app)
+    app.extensions["evoting"] = {
+        "storage": storage.from_config(storage_config) if tenant_registry is None else None,
+        "tenants": tenant_registry,
+        # front-end files are fingerprinted, precompressed and kept in memory
+        "assets": static_assets.StaticAssetStore(FRONTEND_DIR),
+        # on-demand request profiling, off until an admin starts it
+        "profiler": profiling.Profiler(),
+        # request capture for load replay, off until an admin starts it
+        "traffic": traffic.TrafficRecorder(),
+        # rate limits + bounded priority queue; False disables it
+        "admission": (admission.Admission() if admission_control is None
+                      else admission_control or None),
+    }
+    app.register_blueprint(api)
+    if tenant_registry is not None:
+        app.wsgi_app = tenants.TenantMiddleware(app.wsgi_app)
+    return app
+
 
-    return jsonify({"ok": True, "results": out})
+app = create_app()
 
 
 if __name__ == "__main__":
-    # static folder "web_frontend" must contain your index.html
+    # FRONTEND_DIR ("web_frontend") must contain your index.html
     app.run(debug=True)
@@ -0,0 +1,78 @@
+"""
+Benchmark: bitset voter rolls at election-day scale.
+
+Usage:
+    python benchmarks/bench_eligibility.py [voters]
+
+Builds a roll and a has-voted set over `voters` dense voter numbers
+(default 10M, half eligible, 60% of those voted) and reports their
+memory, the cost of eligibility / has-voted checks and of turnout via
+popcount. For comparison, memory of the same roll as a Python set of
+usernames and the old has-voted check (a scan of the vote list) are
+measured on a 1M sample.
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+from eligibility import Bitset
+
+SAMPLE = 1_000_000
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bitset_from(numbers):
+    bits = Bitset()
+    for n in numbers:
+        bits.add(n)
+    return bits
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    rng = random.Random(7)
+    eligible = rng.sample(range(n), n // 2)
+    voted = eligible[: len(eligible) * 6 // 10]
+
+    roll, t_roll = timed(lambda: bitset_from(eligible))
+    has_voted, _ = timed(lambda: bitset_from(voted))
+    probes = [rng.randrange(n) for _ in range(100_000)]
+
+    _, t_check = timed(lambda: sum(1 for p in probes if p in roll))
+    (count, cast), t_turnout = timed(lambda: (roll.count(), has_voted.count_and(roll)))
+    assert count == len(eligible) and cast == len(voted)
+
+    # the same roll as a set of usernames, 1M sample
+    tracemalloc.start()
+    names = {f"voter{i:08d}" for i in eligible[:SAMPLE]}
+    set_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del names
+
+    # the old has-voted check: scan the vote dicts
+    votes = [{"id": i, "election_id": 1, "voter_username": f"voter{v:08d}", "candidate_id": 1}
+             for i, v in enumerate(voted[:SAMPLE])]
+    target = votes[-1]["voter_username"]
+    _, t_scan = timed(lambda: any(v["voter_username"] == target and v["election_id"] == 1 for v in votes))
+
+    print(f"voters={n:,} eligible={count:,} voted={cast:,} ({100 * cast / count:.1f}%)")
+    print(f"  roll bitset           : {roll.nbytes / 1e6:8.2f} MB  (built in {t_roll:.1f} s)")
+    print(f"  username set ({SAMPLE // 1_000_000}M)     : {set_bytes / 1e6:8.2f} MB  "
+          f"(~{set_bytes * len(eligible) / SAMPLE / 1e6:,.0f} MB for the full roll)")
+    print(f"  eligibility check     : {t_check / len(probes) * 1e9:8.0f} ns per check")
+    print(f"  turnout (popcount x2) : {t_turnout * 1000:8.1f} ms")
+    print(f"  old has-voted scan    : {t_scan * 1000:8.1f} ms per check ({len(votes):,} votes)")
+
+
+if __name__ == "__main__":
+    main()
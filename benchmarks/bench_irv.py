@@ -0,0 +1,97 @@
+"""
+Benchmark: instant-runoff tabulation of ranked ballots.
+
+Usage:
+    python benchmarks/bench_irv.py [ballots] [candidates]
+
+Compares a straightforward tabulator (every round rescans every ballot
+for its first continuing choice) with ranked.instant_runoff (ballots
+grouped by identical ranking; each round only moves the groups of the
+eliminated candidate). Both must agree on every round.
+"""
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+import ranked
+
+
+def make_ballots(n, k, seed=42):
+    """Rankings drawn from skewed candidate popularity, truncated at random lengths."""
+    rng = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(k)]
+    # a limited pool of distinct rankings, as in real elections
+    pool = []
+    for _ in range(min(20000, n)):
+        remaining = list(range(1, k + 1))
+        w = list(weights)
+        ranking = []
+        for _ in range(rng.randint(1, k)):
+            i = rng.choices(range(len(remaining)), weights=w)[0]
+            ranking.append(remaining.pop(i))
+            w.pop(i)
+        pool.append(ranking)
+    pool_weights = [rng.paretovariate(1.2) for _ in pool]
+    return rng.choices(pool, weights=pool_weights, k=n)
+
+
+def naive_irv(rankings, candidate_ids):
+    eliminated = set()
+    rounds = []
+    while True:
+        totals = {cid: 0 for cid in candidate_ids if cid not in eliminated}
+        exhausted = 0
+        for ranking in rankings:
+            for cid in ranking:
+                if cid not in eliminated:
+                    totals[cid] += 1
+                    break
+            else:
+                exhausted += 1
+        rounds.append({"counts": totals, "exhausted": exhausted})
+        active = sum(totals.values())
+        leader = max(totals, key=totals.get)
+        if totals[leader] * 2 > active or len(totals) == 1:
+            return leader, rounds
+        eliminated.add(min(totals, key=lambda c: (totals[c], [r["counts"].get(c, 0) for r in reversed(rounds[:-1])],
+                                                  -candidate_ids.index(c))))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    candidate_ids = list(range(1, k + 1))
+    rankings, t_gen = timed(lambda: make_ballots(n, k))
+
+    def engine():
+        ballots = ranked.RankedBallots(candidate_ids)
+        ballots.add_many(rankings)
+        return ballots, ranked.instant_runoff(ballots)
+
+    (ballots, fast), t_fast = timed(engine)
+    _, t_tab = timed(lambda: ranked.instant_runoff(ballots))
+    (winner, slow), t_slow = timed(lambda: naive_irv(rankings, candidate_ids))
+
+    assert fast["winner"] == winner
+    assert [r["counts"] for r in fast["rounds"]] == [r["counts"] for r in slow]
+    assert [r["exhausted"] for r in fast["rounds"]] == [r["exhausted"] for r in slow]
+
+    print(f"ballots={n:,} candidates={k} distinct rankings={ballots.group_count:,} "
+          f"rounds={len(fast['rounds'])} (generated in {t_gen:.1f} s)")
+    print(f"  rescan every round   : {t_slow * 1000:9.1f} ms")
+    print(f"  grouped + tabulate   : {t_fast * 1000:9.1f} ms  ({t_slow / t_fast:.1f}x)")
+    print(f"  tabulate only        : {t_tab * 1000:9.1f} ms  ({t_slow / t_tab:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
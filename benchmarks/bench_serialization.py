@@ -0,0 +1,79 @@
+"""
+Benchmark: /api/blockchain payload encoding and compression.
+
+Usage:
+    python benchmarks/bench_serialization.py [blocks]
+
+Compares the old path (to_dict + jsonify-style stdlib json with sorted
+keys) with responses.dumps (orjson if installed) and with the block
+cache, then reports bytes on the wire for identity/gzip/deflate.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+import responses
+from blockchain import Block
+
+
+def make_chain(n):
+    chain = []
+    prev = "0"
+    for i in range(n):
+        h = hashlib.sha256(f"{i}{prev}".encode()).hexdigest()
+        chain.append(Block(i, f"2025-12-07T10:{i // 60 % 60:02d}:{i % 60:02d}.{i % 999999:06d}",
+                           hashlib.sha256(f"voter{i}".encode()).hexdigest(),
+                           i % 50 + 1, i % 7 + 1, prev, h))
+        prev = h
+    return chain
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    chain = make_chain(n)
+
+    def old_path():
+        payload = {"ok": True, "chain": [b.to_dict() for b in chain]}
+        return json.dumps(payload, sort_keys=True).encode("utf-8")
+
+    def fast_path():
+        return responses.dumps({"ok": True, "chain": [b.to_dict() for b in chain]})
+
+    cache = responses.ChainJSONCache()
+    cache.chain_bytes(chain)
+
+    def cached_path():
+        return b'{"ok":true,"chain":' + cache.chain_bytes(chain)[0] + b"}"
+
+    old_body, t_old = timed(old_path)
+    fast_body, t_fast = timed(fast_path)
+    cached_body, t_cached = timed(cached_path)
+    assert json.loads(old_body) == json.loads(cached_body) == json.loads(fast_body)
+
+    print(f"blocks={n:,} encoder={'orjson' if responses.orjson else 'stdlib json'}")
+    print(f"  jsonify-style (old)  : {t_old * 1000:9.1f} ms  {len(old_body):>12,} bytes")
+    print(f"  responses.dumps      : {t_fast * 1000:9.1f} ms  {len(fast_body):>12,} bytes")
+    print(f"  cached block bytes   : {t_cached * 1000:9.1f} ms  {len(cached_body):>12,} bytes")
+    for encoding in ("gzip", "deflate"):
+        body, t = timed(lambda: responses.compress(cached_body, encoding), repeat=1)
+        print(f"  {encoding:<7} on the wire  : {t * 1000:9.1f} ms  {len(body):>12,} bytes "
+              f"({len(body) / len(old_body):.1%} of old)")
+
+
+if __name__ == "__main__":
+    main()
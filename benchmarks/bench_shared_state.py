@@ -0,0 +1,79 @@
+"""
+Benchmark: per-worker cost of results with and without a shared ledger.
+
+Usage:
+    python benchmarks/bench_shared_state.py [votes] [workers]
+
+Writes a journaled chain of `votes` vote blocks (default 200k) to a
+temporary directory, then starts `workers` processes (default 4) that
+each serve one "results" read the way api_server does:
+  - private : load the blockchain and build a ColumnarLedger
+  - shared  : attach the shared ledger segment and read its tallies
+and reports each worker's startup time and peak memory (max RSS).
+"""
+import multiprocessing as mp
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+import analytics
+import blockchain
+import storage
+
+
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def worker(config, out):
+    start_rss = _max_rss_mb()
+    start = time.perf_counter()
+    with storage.use_storage(storage.from_config(config)):
+        tallies = analytics.get_ledger().tally_all()
+    out.put((time.perf_counter() - start, _max_rss_mb() - start_rss, sum(map(len, tallies.values()))))
+
+
+def run(config, workers):
+    out = mp.Queue()
+    procs = [mp.Process(target=worker, args=(config, out)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return results
+
+
+def main():
+    votes = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    base = tempfile.mkdtemp(prefix="evoting-bench-")
+    try:
+        store = storage.from_config(storage.SHARED_PREFIX + base)
+        with storage.use_storage(store):
+            bc = blockchain.get_blockchain()
+            for i in range(votes):
+                bc.add_vote_block(f"voter{i}", 1 + i % 20, 1 + i % 7)
+        store.close()
+
+        print(f"{votes:,} votes, {workers} workers")
+        for name, config in (("private", storage.JOURNAL_PREFIX + base), ("shared", storage.SHARED_PREFIX + base)):
+            results = run(config, workers)
+            secs = sum(r[0] for r in results) / len(results)
+            mem = sum(r[1] for r in results) / len(results)
+            print(f"  {name:<8} startup {secs * 1000:8.1f} ms/worker   "
+                  f"memory {mem:7.1f} MB/worker   {mem * workers:7.1f} MB total")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    mp.set_start_method("spawn", force=True)
+    main()
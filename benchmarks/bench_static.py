@@ -0,0 +1,75 @@
+"""
+Benchmark: serving web_frontend/index.html.
+
+Usage:
+    python benchmarks/bench_static.py [requests]
+
+Compares the old send_from_directory route with the in-memory
+StaticAssetStore (first load with gzip, and a revalidation that
+ends in 304 Not Modified).
+"""
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+from flask import Flask, request, send_from_directory
+
+from static_assets import StaticAssetStore
+
+STATIC_DIR = os.path.join(BASE_DIR, "web_frontend")
+
+
+def make_old_app():
+    app = Flask(__name__, static_folder=STATIC_DIR, static_url_path="")
+
+    @app.route("/")
+    def index():
+        return send_from_directory(app.static_folder, "index.html")
+
+    return app
+
+
+def make_new_app():
+    app = Flask(__name__)
+    assets = StaticAssetStore(STATIC_DIR)
+
+    @app.route("/")
+    def index():
+        return assets.response(assets.get("index.html"), request)
+
+    return app
+
+
+def run(client, n, headers=None):
+    start = time.perf_counter()
+    total = 0
+    for _ in range(n):
+        resp = client.get("/", headers=headers or {})
+        total += len(resp.data)
+        resp.close()
+    elapsed = time.perf_counter() - start
+    return n / elapsed, total / n, resp.status_code
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    old = make_old_app().test_client()
+    new = make_new_app().test_client()
+    gz = {"Accept-Encoding": "gzip, deflate, br"}
+    etag = new.get("/", headers=gz).headers["ETag"]
+
+    rows = [
+        ("send_from_directory", run(old, n, gz)),
+        ("in-memory, compressed", run(new, n, gz)),
+        ("in-memory, If-None-Match", run(new, n, dict(gz, **{"If-None-Match": etag}))),
+    ]
+    print(f"requests={n:,}")
+    for label, (rps, size, status) in rows:
+        print(f"  {label:<26}: {rps:10,.0f} req/s  {size:9,.0f} bytes/response  (HTTP {status})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: columnar NumPy tallies vs. the dict-increment loops.
+
+Usage:
+    python benchmarks/bench_tally.py [ballots] [elections] [candidates]
+
+The loop baseline runs on at most LOOP_SAMPLE ballots (a list of 10M vote
+dicts needs several GB of RAM) and its throughput is reported per ballot,
+so the two numbers are directly comparable.
+"""
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+import numpy as np
+
+from analytics import ColumnarLedger
+
+LOOP_SAMPLE = 1_000_000
+
+
+def loop_tally(votes, election_ids):
+    """The /api/results loop as it was: one pass over all votes per election."""
+    out = {}
+    for eid in election_ids:
+        counts = {}
+        for v in votes:
+            if v["election_id"] == eid:
+                cid = v["candidate_id"]
+                counts[cid] = counts.get(cid, 0) + 1
+        out[eid] = counts
+    return out
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    n_elections = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    n_candidates = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    rng = np.random.default_rng(42)
+    eids = rng.integers(1, n_elections + 1, size=n)
+    cids = rng.integers(1, n_candidates + 1, size=n)
+    ts = np.sort(rng.uniform(1.7e9, 1.7e9 + 12 * 3600, size=n))
+
+    ledger, t_load = timed(ColumnarLedger.from_arrays, eids, cids, ts)
+    tallies, t_all = timed(ledger.tally_all)
+    _, t_one = timed(ledger.tally, 1)
+    _, t_hist = timed(ledger.turnout_histogram, 1, 600)
+
+    sample = min(n, LOOP_SAMPLE)
+    votes = [
+        {"election_id": e, "candidate_id": c}
+        for e, c in zip(eids[:sample].tolist(), cids[:sample].tolist())
+    ]
+    loop_result, t_loop = timed(loop_tally, votes, range(1, n_elections + 1))
+
+    check = ColumnarLedger.from_arrays(eids[:sample], cids[:sample], ts[:sample]).tally_all()
+    assert check == loop_result, "columnar tally disagrees with loop tally"
+    assert sum(sum(c.values()) for c in tallies.values()) == n
+
+    print(f"ballots={n:,} elections={n_elections} candidates={n_candidates}")
+    print(f"  columnar load          : {t_load:8.3f} s")
+    print(f"  columnar tally_all     : {t_all:8.3f} s  ({n / t_all:,.0f} ballots/s)")
+    print(f"  columnar tally(1)      : {t_one:8.3f} s")
+    print(f"  turnout histogram(1)   : {t_hist:8.3f} s")
+    print(f"  loop tally ({sample:,})  : {t_loop:8.3f} s  ({sample / t_loop:,.0f} ballots/s)")
+    print(f"  speed-up (tally_all)   : {(n / t_all) / (sample / t_loop):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
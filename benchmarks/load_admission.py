@@ -0,0 +1,121 @@
+"""
+Load generator: vote latency under a login flood, with and without
+admission control.
+
+Usage:
+    python benchmarks/load_admission.py [seconds] [flood_threads] [voter_threads]
+
+Runs in-process against an in-memory app. Flood threads send failing
+logins from many addresses (each login loads the whole users list and
+hashes a password) while voter threads, logged in beforehand, cast
+votes. Reports votes cast, vote latency percentiles and how many flood
+requests got 429.
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import api_server  # noqa: E402  (adds src/ to sys.path)
+import admission
+import auth
+import provisioning
+import storage
+
+USERS = 5_000
+VOTES_PER_THREAD = 200
+
+
+def setup_store(rounds):
+    store = storage.MemoryStorage()
+    salt = auth._generate_salt()
+    pw_hash = auth._hash_password("pw", salt)
+    users = [{"username": f"u{i}", "password_hash": pw_hash, "salt": salt, "role": "voter"}
+             for i in range(USERS)]
+    users[0]["role"] = "admin"
+    with storage.use_storage(store):
+        auth._save_users(users)
+        provisioning.provision_elections({"elections": [
+            {"title": f"Run {i}", "active": True, "candidates": ["A", "B"]} for i in range(rounds)
+        ]})
+    return store
+
+
+def run(app, election_id, seconds, flood_threads, voter_threads):
+    stop = threading.Event()
+    latencies, flood = [], {"ok": 0, "429": 0}
+    lock = threading.Lock()
+
+    def flooder(n):
+        client = app.test_client()
+        while not stop.is_set():
+            addr = f"10.{n}.{random.randrange(256)}.{random.randrange(256)}"
+            r = client.post("/api/login", json={"username": "u1", "password": "wrong"},
+                            environ_base={"REMOTE_ADDR": addr})
+            with lock:
+                flood["429" if r.status_code == 429 else "ok"] += 1
+
+    # voters log in before the flood starts; only their votes are timed
+    voter_clients = []
+    for n in range(voter_threads):
+        clients = []
+        for i in range(n * VOTES_PER_THREAD + 1, (n + 1) * VOTES_PER_THREAD + 1):
+            client = app.test_client()
+            client.post("/api/login", json={"username": f"u{i}", "password": "pw"},
+                        environ_base={"REMOTE_ADDR": f"192.168.{n}.{i % 256}"})
+            clients.append(client)
+        voter_clients.append(clients)
+
+    def voter(n):
+        for i, client in enumerate(voter_clients[n]):
+            if stop.is_set():
+                return
+            start = time.perf_counter()
+            r = client.post("/api/vote", json={"election_id": election_id, "candidate_id": 1 + i % 2})
+            if r.status_code == 200:
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=flooder, args=(n,)) for n in range(flood_threads)]
+    threads += [threading.Thread(target=voter, args=(n,)) for n in range(voter_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    return latencies, flood
+
+
+def pct(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float("nan")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    flood_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    voter_threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    store = setup_store(rounds=2)
+
+    modes = [
+        ("no admission control", False),
+        ("admission control   ", admission.Admission(
+            # a small server: 4 requests at a time, short queue
+            limiter=admission.RateLimiter(route_limits={"api.api_login": (100.0, 100)}),
+            queue=admission.AdmissionQueue(max_active=4, max_queue=16, max_wait=1.0, reserved=2))),
+    ]
+    print(f"{seconds:.0f}s, {flood_threads} login flood threads, {voter_threads} voter threads, {USERS:,} users")
+    for election_id, (name, control) in enumerate(modes, start=1):
+        app = api_server.create_app(store, admission_control=control)
+        latencies, flood = run(app, election_id, seconds, flood_threads, voter_threads)
+        print(f"  {name}: {len(latencies):5d} votes  p50 {pct(latencies, 0.5):7.1f} ms  "
+              f"p99 {pct(latencies, 0.99):7.1f} ms  | flood served {flood['ok']:6d}, 429 {flood['429']:6d}")
+
+
+if __name__ == "__main__":
+    main()
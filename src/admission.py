@@ -0,0 +1,238 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Request priorities (lower is served first).
+PRIORITY_VOTE = 0
+PRIORITY_WRITE = 1
+PRIORITY_READ = 2
+
+# endpoint -> priority; other endpoints: WRITE for POST/PUT/DELETE, READ otherwise
+ENDPOINT_PRIORITIES = {
+    "api.api_vote": PRIORITY_VOTE,
+}
+
+# Never queued or limited: long-lived streams and in-memory static files.
+EXEMPT_ENDPOINTS = {"api.api_stream", "api.index", "api.fingerprinted_asset", "api.asset"}
+
+# endpoint -> (tokens per second, burst), per client and for all clients together
+DEFAULT_CLIENT_LIMITS = {
+    "api.api_login": (10.0, 50),
+    "api.api_register": (5.0, 50),
+    "api.api_vote": (5.0, 20),
+}
+DEFAULT_ROUTE_LIMITS = {
+    "api.api_login": (200.0, 400),
+    "api.api_register": (50.0, 100),
+}
+
+DEFAULT_MAX_ACTIVE = 64
+# Slots only votes may use, so other work can never fill the server.
+DEFAULT_RESERVED_FOR_VOTES = 8
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_MAX_WAIT = 5.0
+
+# Per-client buckets kept (least recently used ones are dropped).
+MAX_TRACKED_CLIENTS = 100_000
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` stored."""
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now=None):
+        """Take one token. Returns 0 if allowed, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per (endpoint, client) and per endpoint."""
+
+    def __init__(self, client_limits=None, route_limits=None, max_clients=MAX_TRACKED_CLIENTS):
+        self.client_limits = DEFAULT_CLIENT_LIMITS if client_limits is None else client_limits
+        self.route_limits = DEFAULT_ROUTE_LIMITS if route_limits is None else route_limits
+        self.max_clients = max_clients
+        self._client_buckets = OrderedDict()
+        self._route_buckets = {}
+        self._lock = threading.Lock()
+
+    def check(self, endpoint, client):
+        """Returns 0 if the request may proceed, else seconds to wait."""
+        client_limit = self.client_limits.get(endpoint)
+        route_limit = self.route_limits.get(endpoint)
+        if client_limit is None and route_limit is None:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            if client_limit is not None:
+                key = (endpoint, client)
+                bucket = self._client_buckets.get(key)
+                if bucket is None:
+                    bucket = self._client_buckets[key] = TokenBucket(*client_limit, now=now)
+                    if len(self._client_buckets) > self.max_clients:
+                        self._client_buckets.popitem(last=False)
+                else:
+                    self._client_buckets.move_to_end(key)
+                wait = bucket.take(now)
+                if wait:
+                    return wait
+            if route_limit is not None:
+                bucket = self._route_buckets.get(endpoint)
+                if bucket is None:
+                    bucket = self._route_buckets[endpoint] = TokenBucket(*route_limit, now=now)
+                return bucket.take(now)
+        return 0.0
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "rejected")
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.rejected = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionQueue:
+    """
+    At most `max_active` requests run at once, `reserved` of those slots
+    for votes only; up to `max_queue` more wait, served by priority then
+    arrival. When the queue is full, a request pushes out the
+    lowest-priority waiter if it outranks it, otherwise it is rejected at
+    once. Waiters give up after `max_wait` seconds.
+    """
+
+    def __init__(self, max_active=DEFAULT_MAX_ACTIVE, max_queue=DEFAULT_MAX_QUEUE, max_wait=DEFAULT_MAX_WAIT,
+                 reserved=DEFAULT_RESERVED_FOR_VOTES):
+        if not 0 <= reserved < max_active:
+            raise ValueError("reserved must be between 0 and max_active - 1")
+        self.max_active = max_active
+        self.reserved = reserved
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters = []   # heap of _Waiter
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.rejected = 0
+
+    def _limit(self, priority):
+        return self.max_active if priority == PRIORITY_VOTE else self.max_active - self.reserved
+
+    def acquire(self, priority):
+        """Wait for a slot. Returns True when admitted (call release()), False if rejected."""
+        limit = self._limit(priority)
+        with self._cond:
+            if self.active < limit and not self._waiters:
+                self.active += 1
+                return True
+            if len(self._waiters) >= self.max_queue:
+                worst = max(self._waiters) if self._waiters else None
+                if worst is None or worst.priority <= priority:
+                    self.rejected += 1
+                    return False
+                worst.rejected = True
+                self._waiters.remove(worst)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+            me = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._waiters, me)
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                if me.rejected:
+                    self.rejected += 1
+                    return False
+                # the best waiter has the highest limit: if it can't run, no one can
+                if self.active < limit and self._waiters[0] is me:
+                    heapq.heappop(self._waiters)
+                    self.active += 1
+                    # another slot may still be free for the next waiter
+                    self._cond.notify_all()
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(me)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                    self.rejected += 1
+                    return False
+                self._cond.wait(remaining)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """Whole seconds a rejected client should wait before retrying."""
+        return max(1, math.ceil(self.max_wait / 2))
+
+
+class Rejected:
+    """Why a request was not admitted; retry_after is in whole seconds."""
+
+    def __init__(self, reason, retry_after):
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission:
+    """
+    Admission control for the API: rate limits first (cheap, no waiting),
+    then a slot in the bounded priority queue.
+    """
+
+    def __init__(self, limiter=None, queue=None):
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.queue = queue if queue is not None else AdmissionQueue()
+
+    @staticmethod
+    def priority(endpoint, method):
+        if endpoint in ENDPOINT_PRIORITIES:
+            return ENDPOINT_PRIORITIES[endpoint]
+        return PRIORITY_WRITE if method in ("POST", "PUT", "PATCH", "DELETE") else PRIORITY_READ
+
+    def admit(self, endpoint, method, client):
+        """
+        Returns True if the request holds a queue slot (release() it when
+        done), None if it is exempt, or a Rejected.
+        """
+        if endpoint in EXEMPT_ENDPOINTS:
+            return None
+        wait = self.limiter.check(endpoint, client)
+        if wait:
+            return Rejected("rate limit exceeded", max(1, math.ceil(wait)))
+        if not self.queue.acquire(self.priority(endpoint, method)):
+            return Rejected("server busy", self.queue.retry_after())
+        return True
+
+    def release(self):
+        self.queue.release()
+
+    def status(self):
+        return {
+            "active": self.queue.active,
+            "queued": len(self.queue._waiters),
+            "max_active": self.queue.max_active,
+            "reserved_for_votes": self.queue.reserved,
+            "max_queue": self.queue.max_queue,
+            "rejected": self.queue.rejected,
+        }
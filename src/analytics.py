@@ -0,0 +1,305 @@
+import threading
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:  # analytics still work without numpy, just slower
+    np = None
+
+from blockchain import get_blockchain
+from shared_state import SharedSnapshot, get_shared_ledger
+from storage import get_storage
+
+# Initial capacity of the column arrays, doubled whenever it is exceeded.
+_INITIAL_CAPACITY = 1024
+
+# Above this many (election, candidate) pairs in the id range, tally_all()
+# (and tally(), for candidate ids) groups with np.unique instead of a dense
+# bincount over the combined key.
+_DENSE_KEY_LIMIT = 50_000_000
+
+
+def _timestamp_to_epoch(ts):
+    """Convert a block ISO timestamp (UTC, naive) to epoch seconds."""
+    return datetime.fromisoformat(ts).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _epoch_to_iso(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class ColumnarLedger:
+    """
+    Column-oriented view of the vote blocks in the blockchain.
+    Columns (one entry per vote block, genesis excluded):
+      - election_id
+      - candidate_id
+      - timestamp (epoch seconds)
+    The columns are loaded once and then extended incrementally with
+    only the blocks appended since the last refresh().
+    Queries can be answered as of a ChainSnapshot: rows are in chain
+    order, so the snapshot's rows are a prefix of the columns.
+    """
+
+    def __init__(self, blockchain=None):
+        self.blockchain = blockchain
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._size = 0
+        self._blocks_seen = 0
+        self._last_hash = None
+        self._source = None     # chain list the columns were loaded from
+        self._skipped = []      # chain positions without a row (genesis)
+        if np is not None:
+            self._election_ids = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+            self._candidate_ids = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+            self._timestamps = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+        else:
+            self._election_ids = []
+            self._candidate_ids = []
+            self._timestamps = []
+
+    @classmethod
+    def from_arrays(cls, election_ids, candidate_ids, timestamps):
+        """Build a ledger directly from columns (used by benchmarks)."""
+        ledger = cls(blockchain=None)
+        ledger._append(election_ids, candidate_ids, timestamps)
+        return ledger
+
+    # ---------- loading ----------
+
+    def _append(self, election_ids, candidate_ids, timestamps):
+        n = len(election_ids)
+        if n == 0:
+            return
+        if np is None:
+            self._election_ids.extend(election_ids)
+            self._candidate_ids.extend(candidate_ids)
+            self._timestamps.extend(timestamps)
+            self._size += n
+            return
+
+        needed = self._size + n
+        capacity = len(self._election_ids)
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            self._election_ids = np.resize(self._election_ids, capacity)
+            self._candidate_ids = np.resize(self._candidate_ids, capacity)
+            self._timestamps = np.resize(self._timestamps, capacity)
+
+        end = self._size + n
+        self._election_ids[self._size:end] = election_ids
+        self._candidate_ids[self._size:end] = candidate_ids
+        self._timestamps[self._size:end] = timestamps
+        self._size = end
+
+    def refresh(self):
+        """
+        Pull blocks appended to the chain since the last refresh.
+        If the already loaded part of the chain changed (e.g. the chain was
+        replaced), the columns are rebuilt from scratch.
+        """
+        self._sync(None)
+        return self
+
+    def _sync(self, snapshot):
+        """
+        Load the chain up to `snapshot` (default: the chain as it is now)
+        and return how many rows that snapshot covers.
+        """
+        with self._lock:
+            if self.blockchain is None:
+                return self._size
+            if snapshot is None:
+                snapshot = self.blockchain.snapshot()
+            n = len(snapshot)
+            # an older snapshot of the same list is a prefix of what is loaded
+            if snapshot.blocks is not self._source or n > self._blocks_seen:
+                self._refresh_locked(snapshot)
+            return n - bisect_left(self._skipped, n)
+
+    def _refresh_locked(self, chain):
+        seen = self._blocks_seen
+        if seen and (len(chain) < seen or chain[seen - 1].hash != self._last_hash):
+            self._reset()
+            seen = 0
+        self._source = chain.blocks
+        if len(chain) == seen:
+            return
+
+        new_blocks = []
+        for pos, b in enumerate(chain[seen:], start=seen):
+            if b.election_id == -1:
+                self._skipped.append(pos)
+            else:
+                new_blocks.append(b)
+        self._append(
+            [b.election_id for b in new_blocks],
+            [b.candidate_id for b in new_blocks],
+            [_timestamp_to_epoch(b.timestamp) for b in new_blocks],
+        )
+        self._blocks_seen = len(chain)
+        self._last_hash = chain[-1].hash
+
+    def __len__(self):
+        return self._size
+
+    def _columns(self, snapshot=None):
+        # Rows below _size never change, so views taken under the lock stay
+        # valid even if a later refresh() grows the arrays.
+        n = self._sync(snapshot) if snapshot is not None else None
+        with self._lock:
+            if n is None:
+                n = self._size
+            return self._election_ids[:n], self._candidate_ids[:n], self._timestamps[:n]
+
+    # ---------- tallies ----------
+
+    def tally(self, election_id, snapshot=None):
+        """Return a dict: {candidate_id: count} for one election."""
+        eids, cids, _ = self._columns(snapshot)
+        if np is None:
+            counts = {}
+            for eid, cid in zip(eids, cids):
+                if eid == election_id:
+                    counts[cid] = counts.get(cid, 0) + 1
+            return counts
+
+        selected = cids[eids == election_id]
+        if not len(selected):
+            return {}
+        offset = int(selected.min())
+        if int(selected.max()) - offset < _DENSE_KEY_LIMIT:
+            bins = np.bincount(selected - offset)
+            nonzero = np.flatnonzero(bins)
+            return {int(c) + offset: int(bins[c]) for c in nonzero}
+        values, counts = np.unique(selected, return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def tally_all(self, snapshot=None):
+        """
+        Return a dict: {election_id: {candidate_id: count}} for all elections
+        (as of `snapshot` if given).
+        """
+        eids, cids, _ = self._columns(snapshot)
+        tallies = {}
+        if np is None:
+            for eid, cid in zip(eids, cids):
+                counts = tallies.setdefault(eid, {})
+                counts[cid] = counts.get(cid, 0) + 1
+            return tallies
+        if not len(eids):
+            return tallies
+
+        # the range is worked out in Python ints: the combined key must not overflow int64
+        e_min, c_min = int(eids.min()), int(cids.min())
+        width = int(cids.max()) - c_min + 1
+        if (int(eids.max()) - e_min + 1) * width > _DENSE_KEY_LIMIT:
+            pairs, counts = np.unique(np.stack((eids, cids), axis=1), axis=0, return_counts=True)
+            for (eid, cid), count in zip(pairs.tolist(), counts.tolist()):
+                tallies.setdefault(eid, {})[cid] = count
+            return tallies
+
+        bins = np.bincount((eids - e_min) * width + (cids - c_min))
+        keys = np.flatnonzero(bins)
+        for key, count in zip(keys.tolist(), bins[keys].tolist()):
+            eid, cid = divmod(key, width)
+            tallies.setdefault(eid + e_min, {})[cid + c_min] = count
+        return tallies
+
+    # ---------- turnout ----------
+
+    def turnout_histogram(self, election_id, bucket_seconds=3600, snapshot=None):
+        """
+        Votes per time bucket for one election.
+        Returns a list of {"start": iso_timestamp, "votes": count}
+        covering the first to the last vote, empty buckets included.
+        """
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive")
+        eids, _, ts = self._columns(snapshot)
+
+        if np is None:
+            selected = [t for e, t in zip(eids, ts) if e == election_id]
+            if not selected:
+                return []
+            start = min(selected) // bucket_seconds * bucket_seconds
+            bins = [0] * (int((max(selected) - start) // bucket_seconds) + 1)
+            for t in selected:
+                bins[int((t - start) // bucket_seconds)] += 1
+        else:
+            selected = ts[eids == election_id]
+            if not len(selected):
+                return []
+            start = float(selected.min()) // bucket_seconds * bucket_seconds
+            bins = np.bincount(((selected - start) // bucket_seconds).astype(np.int64)).tolist()
+
+        return [
+            {"start": _epoch_to_iso(start + i * bucket_seconds), "votes": int(count)}
+            for i, count in enumerate(bins)
+        ]
+
+
+class SharedColumnarLedger(ColumnarLedger):
+    """
+    ColumnarLedger over a SharedLedger segment (see shared_state.py): the
+    columns are views of the mapped file, so worker processes share one
+    copy, and tallies as of the latest block are read as published.
+    Snapshots are SharedSnapshots; a ChainSnapshot is matched by length.
+    """
+
+    def __init__(self, shared):
+        super().__init__(blockchain=None)
+        self.shared = shared
+
+    def refresh(self):
+        return self
+
+    def _snapshot(self, snapshot):
+        latest = self.shared.snapshot()
+        if snapshot is None:
+            return latest
+        if isinstance(snapshot, SharedSnapshot):
+            return snapshot
+        return latest.prefix(len(snapshot))
+
+    def _columns(self, snapshot=None):
+        snapshot = self._snapshot(snapshot)
+        n = len(snapshot)
+        if not n:
+            return [], [], []
+        segment = snapshot.segment
+        # the genesis block (first in the hot chain) has no vote row
+        start = 1 if segment.column("election", 1)[0] == -1 else 0
+        columns = [segment.column(name, n, start) for name in ("election", "candidate", "timestamp")]
+        if np is not None:
+            columns = [np.frombuffer(c, dtype=np.float64 if c.format == "d" else np.int64) for c in columns]
+        return tuple(columns)
+
+    def __len__(self):
+        return len(self._columns()[0])
+
+    def tally_all(self, snapshot=None):
+        snapshot = self._snapshot(snapshot)
+        key, tallies = self.shared.tallies()
+        if key == (snapshot.generation, snapshot.length, snapshot.last_hash):
+            return tallies
+        return super().tally_all(snapshot)
+
+
+def get_ledger():
+    """
+    Return the cached columnar ledger for the current blockchain,
+    refreshed with any blocks added since the last call.
+    With a shared ledger it reads the shared segment instead.
+    """
+    store = get_storage()
+    shared = get_shared_ledger(store)
+    if shared is not None:
+        return store.cached("columnar_ledger", lambda: SharedColumnarLedger(shared))
+    ledger = store.cached("columnar_ledger", lambda: ColumnarLedger(get_blockchain()))
+    return ledger.refresh()
@@ -0,0 +1,323 @@
+import gzip
+import hashlib
+import heapq
+import json
+from datetime import datetime
+
+from blockchain import Block, Blockchain, get_blockchain
+from election import _load_elections, _save_elections, list_elections
+from reporting import log_action
+from storage import get_storage
+
+
+class ArchiveError(Exception):
+    pass
+
+
+# ---------- manifest & segments ----------
+
+def _segment_name(election_id, generation=1):
+    # archiving an election again writes a new generation next to the old one
+    if generation == 1:
+        return f"election_{election_id}.seg.json.gz"
+    return f"election_{election_id}.{generation}.seg.json.gz"
+
+
+def _load_manifest():
+    """
+    List of archive entries, one per archived election.
+    An entry still marked pending (see archive_election) is finished
+    first: either an archive is in progress (this waits for it) or one
+    was cut off by a crash.
+    """
+    manifest = get_storage().load_list("archives")
+    if any(a.get("pending") for a in manifest):
+        _finish_pending()
+        manifest = get_storage().load_list("archives")
+    return manifest
+
+
+def _save_manifest(entries):
+    get_storage().save_list("archives", entries)
+
+
+def get_archive_entry(election_id):
+    return next((a for a in _load_manifest() if a["election_id"] == election_id), None)
+
+
+def _encode_segment(election_id, blocks, tally):
+    payload = {
+        "election_id": election_id,
+        "tally": tally,
+        "blocks": [b.to_dict() for b in blocks],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(raw, compresslevel=9, mtime=0)
+
+
+def load_segment(election_id, entry=None):
+    """
+    Return the archived blocks of one election (sorted by index).
+    The segment's digest is checked against the manifest first.
+    """
+    entry = entry or get_archive_entry(election_id)
+    if entry is None:
+        raise ArchiveError(f"Election {election_id} is not archived.")
+    data = get_storage().load_blob(entry["segment"])
+    if hashlib.sha256(data).hexdigest() != entry["digest"]:
+        raise ArchiveError(f"Archive segment of election {election_id} does not match its digest.")
+    payload = json.loads(gzip.decompress(data))
+    return [Block.from_dict(d) for d in payload["blocks"]]
+
+
+# ---------- archiving ----------
+
+def archive_election(election_id):
+    """
+    Seal a closed election's blocks into a compressed, read-only segment
+    and drop them from the hot chain.
+    The manifest keeps the segment digest, the final tally and the hashes
+    of archived blocks that hot blocks link to, so the hot chain can still
+    be verified without opening the segment.
+    The last block of the chain always stays hot (new votes link to it);
+    archiving the election again later moves it too.
+    Crash safety: the segment is written, then the manifest entry marked
+    "pending", then the blocks are detached, then the entry is committed.
+    Archiving again writes the segment under a new name (the next
+    generation): the committed entry keeps pointing at an intact segment
+    until the new entry replaces it, and only then is the old one removed.
+    If detaching fails the manifest is put back; if the process dies
+    instead, loading the chain drops the pending entry's blocks and
+    _load_manifest() commits it. Readers wait for an archive
+    in progress, so no vote is counted both in the hot chain and in the
+    manifest.
+    The chain's writers are held off from reading the blocks to detaching
+    them, so no vote is dropped without being archived.
+    Returns the manifest entry.
+    """
+    store = get_storage()
+    bc = get_blockchain()
+    with store.write_section("archives"), store.write_section("elections"), bc.exclusive():
+        elections = _load_elections()
+        election = next((e for e in elections if e["id"] == election_id), None)
+        if election is None:
+            raise ArchiveError("Election not found.")
+        if election.get("is_active"):
+            raise ArchiveError("Only closed elections can be archived.")
+
+        hot = [b for b in bc.get_chain()[:-1] if b.election_id == election_id]
+        manifest = _load_manifest()
+        entry = next((a for a in manifest if a["election_id"] == election_id), None)
+        archived = load_segment(election_id, entry) if entry else []
+        if not hot and entry:
+            return entry
+        if not hot:
+            raise ArchiveError("This election has no blocks to archive.")
+
+        blocks = sorted({b.index: b for b in archived + hot}.values(), key=lambda b: b.index)
+        indexes = {b.index for b in blocks}
+        tally = {}
+        for b in blocks:
+            tally[b.candidate_id] = tally.get(b.candidate_id, 0) + 1
+        # archived blocks whose successor lives elsewhere (hot chain or another segment)
+        links = {b.index: b.hash for b in blocks if b.index + 1 not in indexes}
+
+        data = _encode_segment(election_id, blocks, tally)
+        generation = entry.get("generation", 1) + 1 if entry else 1
+        name = _segment_name(election_id, generation)
+        store.save_blob(name, data)
+
+        new_entry = {
+            "election_id": election_id,
+            "segment": name,
+            "generation": generation,
+            "digest": hashlib.sha256(data).hexdigest(),
+            "block_count": len(blocks),
+            "first_index": blocks[0].index,
+            "last_index": blocks[-1].index,
+            # index and time ranges let historical queries skip the segment
+            "first_timestamp": min(b.timestamp for b in blocks),
+            "last_timestamp": max(b.timestamp for b in blocks),
+            "tally": {str(cid): n for cid, n in tally.items()},
+            "links": {str(i): h for i, h in links.items()},
+            "archived_at": datetime.utcnow().isoformat(),
+            "pending": True,
+        }
+        if entry:
+            new_entry["replaces"] = entry["segment"]   # removed once this entry is committed
+        others = [a for a in manifest if a["election_id"] != election_id]
+        _save_manifest(others + [new_entry])
+
+        try:
+            bc.detach_blocks(hot, links)
+        except BaseException:
+            # nothing was detached: put the manifest back, drop the new segment
+            if any(b.index == hot[0].index for b in bc.get_chain()):
+                _save_manifest(manifest)
+                store.delete_blob(name)
+            raise
+
+        manifest = others
+
+        del new_entry["pending"]
+        replaced = new_entry.pop("replaces", None)
+        _save_manifest(manifest + [new_entry])
+        if replaced is not None:
+            store.delete_blob(replaced)
+        election["archived"] = True
+        _save_elections(elections)
+    log_action(None, "ARCHIVE_ELECTION",
+               f"election_id={election_id}, blocks={len(blocks)}, segment={name}")
+    return new_entry
+
+
+def _finish_pending():
+    """Complete archives whose manifest entry is still pending (see archive_election)."""
+    store = get_storage()
+    bc = get_blockchain()
+    with store.write_section("archives"), store.write_section("elections"), bc.exclusive():
+        manifest = store.load_list("archives")
+        pending = [a for a in manifest if a.get("pending")]
+        if not pending:
+            return
+        elections = _load_elections()
+        replaced = []   # segments of earlier generations, removed once committed
+        for entry in pending:
+            segment = {b.index for b in load_segment(entry["election_id"], entry)}
+            hot = [b for b in bc.get_chain() if b.index in segment]
+            if hot:
+                bc.detach_blocks(hot, {int(i): h for i, h in entry["links"].items()})
+            del entry["pending"]
+            if "replaces" in entry:
+                replaced.append(entry.pop("replaces"))
+            for e in elections:
+                if e["id"] == entry["election_id"]:
+                    e["archived"] = True
+        _save_manifest(manifest)
+        for name in replaced:
+            store.delete_blob(name)
+        _save_elections(elections)
+    log_action(None, "ARCHIVE_RECOVERED", f"elections={[a['election_id'] for a in pending]}")
+
+
+# ---------- queries ----------
+
+def archived_tallies():
+    """Final tallies of archived elections: {election_id: {candidate_id: count}}."""
+    return {
+        a["election_id"]: {int(cid): n for cid, n in a["tally"].items()}
+        for a in _load_manifest()
+    }
+
+
+def with_archived_tallies(tallies):
+    """Copy of hot-chain tallies with the archived elections' tallies added."""
+    merged = {eid: dict(counts) for eid, counts in tallies.items()}
+    for eid, counts in archived_tallies().items():
+        target = merged.setdefault(eid, {})
+        for cid, n in counts.items():
+            target[cid] = target.get(cid, 0) + n
+    return merged
+
+
+def _segment_overlap(entry, block_index, when):
+    """
+    How a query bound cuts one segment: "all" of its blocks match,
+    "none" do, or "some" (only then does the segment need opening).
+    Entries written before time ranges were recorded count as "some".
+    """
+    inside = False
+    if block_index is not None:
+        if entry["first_index"] > block_index:
+            return "none"
+        inside = entry["last_index"] > block_index
+    if when is not None:
+        if "first_timestamp" not in entry:
+            return "some"
+        if datetime.fromisoformat(entry["first_timestamp"]) > when:
+            return "none"
+        inside = inside or datetime.fromisoformat(entry["last_timestamp"]) > when
+    return "some" if inside else "all"
+
+
+def archived_tallies_upto(block_index=None, when=None):
+    """
+    Tallies of archived blocks with index <= block_index and/or
+    timestamp <= when (a naive UTC datetime). Segments entirely inside
+    the bounds are answered from the manifest; only a segment the bound
+    falls inside is opened.
+    Returns (tallies, last matching block index or None).
+    """
+    tallies = {}
+    last_index = None
+    for entry in _load_manifest():
+        overlap = _segment_overlap(entry, block_index, when)
+        if overlap == "none":
+            continue
+        if overlap == "all":
+            counts = tallies.setdefault(entry["election_id"], {})
+            for cid, n in entry["tally"].items():
+                counts[int(cid)] = counts.get(int(cid), 0) + n
+            last_index = entry["last_index"] if last_index is None else max(last_index, entry["last_index"])
+            continue
+        for b in load_segment(entry["election_id"], entry):
+            if block_index is not None and b.index > block_index:
+                break
+            if when is not None and datetime.fromisoformat(b.timestamp) > when:
+                continue
+            counts = tallies.setdefault(b.election_id, {})
+            counts[b.candidate_id] = counts.get(b.candidate_id, 0) + 1
+            last_index = b.index if last_index is None else max(last_index, b.index)
+    return tallies, last_index
+
+
+def full_chain():
+    """Hot chain and all archived blocks merged in index order."""
+    segments = [load_segment(a["election_id"], a) for a in _load_manifest()]
+    return list(heapq.merge(get_blockchain().get_chain(), *segments, key=lambda b: b.index))
+
+
+def verify_archives():
+    """
+    Check every segment: digest, block hashes, links between its own
+    blocks and the recorded links to the rest of the chain.
+    Returns (is_valid, message) like Blockchain.is_valid().
+    """
+    by_index = {}
+    for entry in _load_manifest():
+        try:
+            blocks = load_segment(entry["election_id"], entry)
+        except (ArchiveError, OSError, ValueError) as exc:
+            return False, str(exc)
+        for b in blocks:
+            if not Blockchain._is_valid_record(b.to_dict()):
+                return False, f"Invalid hash at archived block index {b.index}."
+            by_index[b.index] = b
+        for index, hash_ in entry["links"].items():
+            if by_index.get(int(index)) is None or by_index[int(index)].hash != hash_:
+                return False, f"Archive link for block {index} does not match its segment."
+
+    for b in get_blockchain().get_chain():
+        by_index.setdefault(b.index, b)
+    for index, b in by_index.items():
+        prev = by_index.get(index - 1)
+        if index > 0 and (prev is None or b.previous_hash != prev.hash):
+            return False, f"Broken link between block {index - 1} and {index}."
+    return True, f"Archives are valid ({len(_load_manifest())} segment(s))."
+
+
+def archive_election_interactive():
+    """Interactive: archive a closed election."""
+    list_elections(show_candidates=False)
+    try:
+        election_id = int(input("Enter ID of the CLOSED election to archive: ").strip())
+    except ValueError:
+        print("❌ Invalid election ID.")
+        return
+    try:
+        entry = archive_election(election_id)
+    except ArchiveError as exc:
+        print(f"❌ {exc}")
+        return
+    print(f"✅ Archived {entry['block_count']} block(s) into {entry['segment']}.")
+    print(f"   Digest: {entry['digest']}")
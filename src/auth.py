@@ -1,31 +1,15 @@
-import json
 import os
 import hashlib
 import getpass
 from reporting import log_action
+from storage import get_storage
 
-# ====== COMMON PATH SETUP ======
-# project root ( .. from src/ )
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-os.makedirs(DATA_DIR, exist_ok=True)
-
-USERS_FILE = os.path.join(DATA_DIR, "users.json")
-# ================================
 
 def _load_users():
-    print("DEBUG USERS_FILE:", USERS_FILE)  # <-- TEMP DEBUG
-    if not os.path.exists(USERS_FILE):
-        print("DEBUG: users.json does NOT exist")
-        return []
-    with open(USERS_FILE, "r", encoding="utf-8") as f:
-        users = json.load(f)
-    print("DEBUG: loaded", len(users), "users")
-    return users
+    return get_storage().load_list("users")
 
 def _save_users(users):
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=2)
+    get_storage().save_list("users", users)
 
 
 def _generate_salt():
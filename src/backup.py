@@ -0,0 +1,356 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import storage
+from archive import load_segment, verify_archives
+from blockchain import Blockchain, get_blockchain
+from reporting import log_action
+
+# Lists copied whole by every backup (they are small next to the chain).
+COPIED_LISTS = ("users", "elections", "archives")
+
+MANIFEST = "manifest.json"
+BLOCKS_FILE = "blocks.jsonl"
+# votes.json has a row per block, so like the chain it is stored
+# incrementally: votes are only appended, in id order.
+VOTES_FILE = "votes.jsonl"
+BLOBS_DIR = "blobs"
+
+
+class BackupError(Exception):
+    pass
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def default_backup_dir(store=None):
+    """<project>/backups for file storage, else under the reports directory."""
+    store = store or storage.get_storage()
+    base = getattr(store, "base_dir", None)
+    return os.path.join(base, "backups") if base else os.path.join(store.reports_dir, "backups")
+
+
+def _jsonl(items):
+    return "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in items).encode("utf-8")
+
+
+def _referenced_blobs(lists):
+    """Blob names the data refers to: archive segments and voter rolls."""
+    names = [a["segment"] for a in lists["archives"]]
+    names += [e["roll"]["blob"] for e in lists["elections"] if e.get("roll")]
+    return names
+
+
+# ---------- manifests ----------
+
+def load_manifest(backup_dir):
+    try:
+        with open(os.path.join(backup_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as exc:
+        raise BackupError(f"{backup_dir} is not a readable backup: {exc}")
+
+
+def list_backups(dest):
+    """Manifests of the backups in dest, oldest first."""
+    if not os.path.isdir(dest):
+        return []
+    out = []
+    for name in sorted(os.listdir(dest)):
+        if os.path.isfile(os.path.join(dest, name, MANIFEST)):
+            out.append(load_manifest(os.path.join(dest, name)))
+    return out
+
+
+def _backup_chain(dest, backup_id):
+    """Manifests from the full backup up to backup_id (the restore order)."""
+    chain = []
+    while backup_id is not None:
+        manifest = load_manifest(os.path.join(dest, backup_id))
+        chain.append(manifest)
+        backup_id = manifest["base"]
+    return list(reversed(chain))
+
+
+# ---------- backup ----------
+
+def create_backup(dest=None, incremental=False, progress=None):
+    """
+    Back up the current storage while the app keeps running.
+    The write barrier is held only while the lists are loaded and a chain
+    snapshot is taken, so votes in progress finish first and new ones
+    wait a moment; everything else (encoding, hashing, writing) happens
+    after. An incremental backup stores only the blocks added since the
+    latest backup in dest, the votes added since then, the other lists
+    and any new or changed blobs.
+    progress(done, total) is called while blocks are written, if given.
+    Returns the manifest.
+    """
+    store = storage.get_storage()
+    dest = dest or default_backup_dir(store)
+    bc = get_blockchain()
+
+    base = None
+    if incremental:
+        previous = list_backups(dest)
+        if not previous:
+            raise BackupError("No earlier backup to build on; make a full backup first.")
+        base = previous[-1]
+
+    with store.write_barrier.paused():
+        lists = {name: store.load_list(name) for name in COPIED_LISTS}
+        votes = store.load_list("votes")
+        snapshot = bc.snapshot()
+
+    from_index = 0
+    if base is not None:
+        last = base["chain"]["last_index"]
+        # (if that block was archived since, verification on restore covers it)
+        block = next((b for b in snapshot if b.index == last), None)
+        if block is not None and block.hash != base["chain"]["last_hash"]:
+            raise BackupError("The chain changed since the last backup; make a full backup.")
+        from_index = last + 1
+        known_votes = base.get("votes")
+        if known_votes is None:
+            raise BackupError("The latest backup stores votes whole; make a full backup.")
+        count = known_votes["count"]
+        # votes are only appended: the ones backed up must still come first
+        if len(votes) < count or (count and votes[count - 1]["id"] != known_votes["last_id"]):
+            raise BackupError("votes.json changed since the last backup; make a full backup.")
+        new_votes = votes[count:]
+    else:
+        new_votes = votes
+
+    created = datetime.utcnow()
+    backup_id = created.strftime("%Y%m%dT%H%M%S%f") + ("_incr" if base else "_full")
+    out_dir = os.path.join(dest, backup_id)
+    os.makedirs(os.path.join(out_dir, BLOBS_DIR))
+
+    files = {}
+    total = len(snapshot)
+    lines = []
+    for done, b in enumerate(snapshot):
+        if progress is not None and done % 10_000 == 0:
+            progress(done, total)
+        if b.index >= from_index:
+            lines.append(json.dumps(b.to_dict(), separators=(",", ":")))
+    data = ("\n".join(lines) + "\n" if lines else "").encode("utf-8")
+    files[BLOCKS_FILE] = _write(out_dir, BLOCKS_FILE, data)
+    files[VOTES_FILE] = _write(out_dir, VOTES_FILE, _jsonl(new_votes))
+    for name, items in lists.items():
+        files[f"{name}.json"] = _write(out_dir, f"{name}.json", json.dumps(items).encode("utf-8"))
+
+    # blobs are immutable once written: copy those the base chain lacks
+    known = {}
+    for m in _backup_chain(dest, base["id"]) if base else []:
+        known.update(m["blobs"])
+    blobs = {}
+    for name in _referenced_blobs(lists):
+        blob = store.load_blob(name)
+        digest = _sha256(blob)
+        if known.get(name, {}).get("sha256") == digest:
+            blobs[name] = known[name]
+        else:
+            _write(os.path.join(out_dir, BLOBS_DIR), name, blob)
+            blobs[name] = {"sha256": digest, "stored_in": backup_id}
+
+    manifest = {
+        "id": backup_id,
+        "created": created.isoformat(),
+        "kind": "incremental" if base else "full",
+        "base": base["id"] if base else None,
+        "chain": {
+            "blocks": total,
+            "from_index": from_index,
+            "new_blocks": len(lines),
+            "last_index": snapshot[-1].index,
+            "last_hash": snapshot.last_hash,
+        },
+        "votes": {
+            "count": len(votes),
+            "new_votes": len(new_votes),
+            "last_id": votes[-1]["id"] if votes else None,
+        },
+        "files": files,
+        "blobs": blobs,
+    }
+    # written last: a backup without a manifest is incomplete and ignored
+    _write(out_dir, MANIFEST, json.dumps(manifest, indent=2).encode("utf-8"))
+    log_action(None, "BACKUP", f"id={backup_id}, blocks={len(lines)}")
+    return manifest
+
+
+def _write(directory, name, data):
+    # temp file + rename, like the storage's own writes
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(directory, name))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return _sha256(data)
+
+
+# ---------- restore ----------
+
+def _read_checked(path, digest):
+    with open(path, "rb") as f:
+        data = f.read()
+    if _sha256(data) != digest:
+        raise BackupError(f"{path} does not match its checksum.")
+    return data
+
+
+def load_backup(backup_dir):
+    """
+    Assemble the state saved by a backup (following incremental backups
+    back to their full one) into a MemoryStorage, check every checksum and
+    verify the chain and archives. Raises BackupError if anything is off.
+    """
+    backup_dir = os.path.abspath(backup_dir)
+    dest, backup_id = os.path.split(backup_dir)
+    chain = _backup_chain(dest, backup_id)
+    if chain[0]["kind"] != "full":
+        raise BackupError(f"Backup {chain[0]['id']} is incremental but has no base.")
+    target = chain[-1]
+
+    blocks = {}
+    for m in chain:
+        data = _read_checked(os.path.join(dest, m["id"], BLOCKS_FILE), m["files"][BLOCKS_FILE])
+        for line in data.decode("utf-8").splitlines():
+            d = json.loads(line)
+            blocks[d["index"]] = d
+
+    directory = os.path.join(dest, target["id"])
+    lists = {}
+    for name in COPIED_LISTS:
+        data = _read_checked(os.path.join(directory, f"{name}.json"), target["files"][f"{name}.json"])
+        lists[name] = json.loads(data)
+    if "votes" in target:
+        votes = []
+        for m in chain:
+            data = _read_checked(os.path.join(dest, m["id"], VOTES_FILE), m["files"][VOTES_FILE])
+            votes.extend(json.loads(line) for line in data.decode("utf-8").splitlines())
+        if len(votes) != target["votes"]["count"] or (votes and votes[-1]["id"] != target["votes"]["last_id"]):
+            raise BackupError("The backed-up votes do not add up to the recorded votes.json.")
+        lists["votes"] = votes
+    else:
+        # backups made before votes were stored incrementally copy votes.json whole
+        data = _read_checked(os.path.join(directory, "votes.json"), target["files"]["votes.json"])
+        lists["votes"] = json.loads(data)
+
+    restored = storage.MemoryStorage()
+    archived = set()
+    for name, info in target["blobs"].items():
+        blob = _read_checked(os.path.join(dest, info["stored_in"], BLOBS_DIR, name), info["sha256"])
+        restored.save_blob(name, blob)
+    with storage.use_storage(restored):
+        for entry in lists["archives"]:
+            # blocks archived after they were backed up are no longer hot
+            archived.update(b.index for b in load_segment(entry["election_id"], entry))
+
+    hot = [blocks[i] for i in sorted(blocks) if i <= target["chain"]["last_index"] and i not in archived]
+    if len(hot) != target["chain"]["blocks"] or (hot and hot[-1]["hash"] != target["chain"]["last_hash"]):
+        raise BackupError("The backed-up blocks do not add up to the recorded chain.")
+    for name, items in lists.items():
+        restored.save_list(name, items)
+    restored.save_list("blockchain", hot)
+
+    with storage.use_storage(restored):
+        valid, msg = Blockchain(restored).is_valid()
+        if valid:
+            valid, msg = verify_archives()
+    if not valid:
+        raise BackupError(f"Restored chain is invalid: {msg}")
+    return restored, target
+
+
+def restore_backup(backup_dir, target_store, force=False):
+    """
+    Verify a backup (see load_backup) and write it into target_store.
+    Refuses to overwrite a storage that already has users or a chain
+    unless force is set. Returns the backup's manifest.
+    Every file goes through the storage's save_blob()/save_list(), so
+    each one is replaced atomically (temp file + rename, never rewritten
+    in place), and the whole restore runs with the target's writers held
+    off by its write barrier.
+    """
+    restored, manifest = load_backup(backup_dir)
+    with target_store.write_barrier.paused():
+        if not force and (target_store.load_list("users") or target_store.load_list("blockchain")):
+            raise BackupError("The target already holds data; use force to overwrite it.")
+        # blobs first: the restored lists refer to them
+        for name in _referenced_blobs({n: restored.load_list(n) for n in ("archives", "elections")}):
+            target_store.save_blob(name, restored.load_blob(name))
+        for name in COPIED_LISTS + ("votes", "blockchain"):
+            target_store.save_list(name, restored.load_list(name))
+    with storage.use_storage(target_store):
+        log_action(None, "RESTORE", f"id={manifest['id']}")
+    return manifest
+
+
+# ---------- console / CLI ----------
+
+def backup_interactive():
+    """Interactive: make a full or incremental backup of the running data."""
+    answer = input("Incremental backup (only blocks since the last backup)? (y/N): ").strip().lower()
+    try:
+        manifest = create_backup(incremental=answer == "y")
+    except (BackupError, OSError) as exc:
+        print(f"❌ {exc}")
+        return
+    print(f"✅ Backup {manifest['id']} written ({manifest['chain']['new_blocks']} new block(s)) "
+          f"to {default_backup_dir()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up or restore the e-voting data.")
+    parser.add_argument("--data-dir", help="project directory holding data/ (default: this project)")
+    parser.add_argument("--journal-chain", action="store_true",
+                        help="the blockchain is kept as an append-only journal (data/blockchain.jsonl)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    make = sub.add_parser("backup", help="write a backup")
+    make.add_argument("--dest", help="backup directory (default: <data-dir>/backups)")
+    make.add_argument("--incremental", action="store_true", help="only blocks since the latest backup")
+    sub.add_parser("list", help="list backups").add_argument("--dest")
+    restore = sub.add_parser("restore", help="verify a backup and restore it into --data-dir")
+    restore.add_argument("backup", help="backup directory (…/backups/<id>)")
+    restore.add_argument("--force", action="store_true", help="overwrite existing data")
+    args = parser.parse_args(argv)
+
+    if args.journal_chain:
+        store = storage.from_config(storage.JOURNAL_PREFIX + (args.data_dir or ""))
+    else:
+        store = storage.from_config(args.data_dir)
+    try:
+        with storage.use_storage(store):
+            if args.command == "backup":
+                m = create_backup(args.dest, args.incremental)
+                print(f"✅ {m['kind']} backup {m['id']}: {m['chain']['new_blocks']} block(s), "
+                      f"{m['votes']['new_votes']} vote(s)")
+            elif args.command == "list":
+                for m in list_backups(args.dest or default_backup_dir(store)):
+                    print(f"{m['id']}  {m['kind']:<11} blocks={m['chain']['blocks']} new={m['chain']['new_blocks']}")
+            else:
+                m = restore_backup(args.backup, store, args.force)
+                print(f"✅ Restored backup {m['id']} ({m['chain']['blocks']} blocks, chain verified)")
+    except BackupError as exc:
+        print(f"❌ {exc}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
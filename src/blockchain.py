@@ -1,34 +1,29 @@
-import json
-import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import islice
 import hashlib
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-os.makedirs(DATA_DIR, exist_ok=True)
+from shared_state import open_shared_ledger
+from storage import get_storage
 
-BLOCKCHAIN_FILE = os.path.join(DATA_DIR, "blockchain.json")
+# is_valid() reports progress every this many blocks.
+PROGRESS_INTERVAL = 10_000
 
 
-def _load_chain_raw():
-    """Load raw chain (list of dicts) from blockchain.json."""
-    if not os.path.exists(BLOCKCHAIN_FILE):
-        return []
-
-    with open(BLOCKCHAIN_FILE, "r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            return []
-        except json.JSONDecodeError:
-            return []
+def _load_chain_raw(store):
+    """
+    Load raw chain (list of dicts) from blockchain.json.
+    An unreadable file raises StorageCorruptedError (from the storage):
+    treating it as an empty chain would write a fresh genesis block over
+    the ledger.
+    """
+    return store.load_list("blockchain")
 
 
-def _save_chain_raw(chain_list):
+def _save_chain_raw(store, chain_list):
     """Save raw chain (list of dicts) to blockchain.json."""
-    with open(BLOCKCHAIN_FILE, "w", encoding="utf-8") as f:
-        json.dump(chain_list, f, indent=2)
+    store.save_list("blockchain", chain_list)
 
 
 class Block:
@@ -42,9 +37,12 @@ class Block:
       - candidate_id
       - previous_hash
       - hash
+      - ranking (ranked elections only: candidate ids in order of preference;
+        candidate_id is then the first choice)
     """
 
-    def __init__(self, index, timestamp, voter_hash, election_id, candidate_id, previous_hash, hash_):
+    def __init__(self, index, timestamp, voter_hash, election_id, candidate_id, previous_hash, hash_,
+                 ranking=None):
         self.index = index
         self.timestamp = timestamp
         self.voter_hash = voter_hash
@@ -52,9 +50,10 @@ class Block:
         self.candidate_id = candidate_id
         self.previous_hash = previous_hash
         self.hash = hash_
+        self.ranking = ranking
 
     def to_dict(self):
-        return {
+        d = {
             "index": self.index,
             "timestamp": self.timestamp,
             "voter_hash": self.voter_hash,
@@ -63,6 +62,9 @@ class Block:
             "previous_hash": self.previous_hash,
             "hash": self.hash,
         }
+        if self.ranking is not None:
+            d["ranking"] = self.ranking
+        return d
 
     @staticmethod
     def from_dict(d):
@@ -74,17 +76,84 @@ class Block:
             candidate_id=d["candidate_id"],
             previous_hash=d["previous_hash"],
             hash_=d["hash"],
+            ranking=d.get("ranking"),
         )
 
 
+class ChainSnapshot:
+    """
+    Read-only view of the first `length` blocks of a chain list.
+    The chain list is only ever appended to (archiving swaps in a new
+    list), so the view stays consistent without copying the blocks and
+    without taking the write lock, while new votes keep coming in.
+    """
+
+    def __init__(self, blocks, length):
+        self.blocks = blocks
+        self.length = length
+        self.last_hash = blocks[length - 1].hash if length else None
+
+    @property
+    def key(self):
+        """Identifies the snapshot's content: (length, last block hash)."""
+        return self.length, self.last_hash
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return islice(self.blocks, self.length)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.blocks[slice(*item.indices(self.length))]
+        if item < 0:
+            item += self.length
+        if not 0 <= item < self.length:
+            raise IndexError("block position out of snapshot range")
+        return self.blocks[item]
+
+
 class Blockchain:
     """
     Simple blockchain to store votes.
     """
 
-    def __init__(self):
+    def __init__(self, store=None):
+        self.store = store if store is not None else get_storage()
+        # serializes writers (new votes, archiving); readers don't take it
+        self._write_lock = threading.RLock()
+        # index -> hash of archived blocks that a hot block links to
+        # (see archive.py); lets is_valid() check links across the gaps
+        self.archived_links = self._load_archived_links()
+        # lets a journaled store cut off a torn last block on load
+        self.store.record_validators["blockchain"] = self._is_valid_record
+        # ledger state shared with other worker processes (see shared_state.py)
+        self.shared = open_shared_ledger(self.store)
+        self._published = None   # (generation, journal offset) self.chain matches
+        if self.shared is None:
+            self._load()
+            return
+        # loaded under the writer lock: no other process is mid-append
+        with self._write_lock, self.shared.locked():
+            self._load()
+            offset = self.store.journal_size("blockchain")
+            header = self.shared.header()
+            if (header.journal_offset, header.count) != (offset, len(self.chain)) or \
+                    self.shared.snapshot().last_hash != self.chain[-1].hash:
+                self.shared.rebuild(self.chain, offset)
+            self._published = (self.shared.header().generation, offset)
+
+    def _load_archived_links(self):
+        return {
+            int(index): hash_
+            for entry in self.store.load_list("archives")
+            for index, hash_ in entry.get("links", {}).items()
+        }
+
+    def _load(self):
         # Load existing chain or create a new one with a genesis block
-        raw_chain = _load_chain_raw()
+        raw_chain = _load_chain_raw(self.store)
         if not raw_chain:
             # No chain yet, create genesis
             genesis = self._create_genesis_block()
@@ -92,17 +161,74 @@ class Blockchain:
             self._persist()
         else:
             self.chain = [Block.from_dict(b) for b in raw_chain]
+        self._detach_pending_archives()
+
+    def _detach_pending_archives(self):
+        """
+        An archive cut off by a crash after its manifest entry was saved
+        as pending (see archive.archive_election): its blocks are sealed
+        in the segment but may still be here. Drop them now, before any
+        tally is taken, so they are not counted twice; archive.py then
+        commits the entry.
+        """
+        for entry in self.store.load_list("archives"):
+            if not entry.get("pending"):
+                continue
+            # the segment holds every block of the election up to last_index
+            stale = [b for b in self.chain[:-1] if b.election_id == entry["election_id"]
+                     and entry["first_index"] <= b.index <= entry["last_index"]]
+            if stale:
+                indexes = {b.index for b in stale}
+                self.chain = [b for b in self.chain if b.index not in indexes]
+                self._persist()
+
+    def catch_up(self):
+        """
+        With a shared ledger: take in blocks other processes appended since
+        this one last looked, by reading only the new part of the journal
+        (the whole journal if archiving rewrote it). Cheap when nothing changed.
+        """
+        if self.shared is None:
+            return
+        header = self.shared.header()
+        if (header.generation, header.journal_offset) == self._published:
+            return
+        with self._write_lock:
+            generation, offset = self._published
+            header = self.shared.header()
+            if header.generation != generation:
+                raw = self.store.read_journal("blockchain", 0, header.journal_offset)
+                self.archived_links = self._load_archived_links()
+                self.chain = [Block.from_dict(b) for b in raw]
+            elif header.journal_offset != offset:
+                raw = self.store.read_journal("blockchain", offset, header.journal_offset)
+                self.chain.extend(Block.from_dict(b) for b in raw)
+            self._published = (header.generation, header.journal_offset)
 
     def _persist(self):
         """Save current chain to file."""
-        _save_chain_raw([b.to_dict() for b in self.chain])
+        _save_chain_raw(self.store, [b.to_dict() for b in self.chain])
+
+    @classmethod
+    def _is_valid_record(cls, d):
+        """True if d is a complete block dict whose hash matches its content."""
+        try:
+            return d["hash"] == cls._calculate_hash(
+                d["index"], d["timestamp"], d["voter_hash"],
+                d["election_id"], d["candidate_id"], d["previous_hash"], d.get("ranking"),
+            )
+        except (KeyError, TypeError):
+            return False
 
     @staticmethod
-    def _calculate_hash(index, timestamp, voter_hash, election_id, candidate_id, previous_hash):
+    def _calculate_hash(index, timestamp, voter_hash, election_id, candidate_id, previous_hash, ranking=None):
         """
         Calculate SHA-256 hash of block content.
         """
         content = f"{index}{timestamp}{voter_hash}{election_id}{candidate_id}{previous_hash}"
+        if ranking is not None:
+            # only ranked ballots carry it, so older blocks keep their hashes
+            content += "|" + ",".join(str(cid) for cid in ranking)
         return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
     def _create_genesis_block(self):
@@ -118,6 +244,12 @@ class Blockchain:
         hash_ = self._calculate_hash(index, timestamp, voter_hash, election_id, candidate_id, previous_hash)
         return Block(index, timestamp, voter_hash, election_id, candidate_id, previous_hash, hash_)
 
+    def snapshot(self):
+        """Consistent read-only view of the chain as it is now (see ChainSnapshot)."""
+        self.catch_up()
+        chain = self.chain
+        return ChainSnapshot(chain, len(chain))
+
     def get_last_block(self):
         return self.chain[-1]
 
@@ -128,47 +260,113 @@ class Blockchain:
         """
         return hashlib.sha256(username.encode("utf-8")).hexdigest()
 
-    def add_vote_block(self, username: str, election_id: int, candidate_id: int) -> Block:
+    def add_vote_block(self, username: str, election_id: int, candidate_id: int, ranking=None) -> Block:
         """
         Create and append a new block representing a vote.
         """
-        last_block = self.get_last_block()
-        index = last_block.index + 1
-        timestamp = datetime.utcnow().isoformat()
-        voter_hash = self.hash_username(username)
-        previous_hash = last_block.hash
-
-        hash_ = self._calculate_hash(index, timestamp, voter_hash, election_id, candidate_id, previous_hash)
-
-        new_block = Block(
-            index=index,
-            timestamp=timestamp,
-            voter_hash=voter_hash,
-            election_id=election_id,
-            candidate_id=candidate_id,
-            previous_hash=previous_hash,
-            hash_=hash_,
-        )
+        with self._write_lock, self._publishing():
+            last_block = self.get_last_block()
+            index = last_block.index + 1
+            timestamp = datetime.utcnow().isoformat()
+            voter_hash = self.hash_username(username)
+            previous_hash = last_block.hash
+
+            hash_ = self._calculate_hash(index, timestamp, voter_hash, election_id, candidate_id, previous_hash,
+                                         ranking)
+
+            new_block = Block(
+                index=index,
+                timestamp=timestamp,
+                voter_hash=voter_hash,
+                election_id=election_id,
+                candidate_id=candidate_id,
+                previous_hash=previous_hash,
+                hash_=hash_,
+                ranking=ranking,
+            )
 
-        self.chain.append(new_block)
-        self._persist()
+            # encoded up front: a block the shared ledger can't hold is never saved
+            row = self.shared.encode(new_block) if self.shared is not None else None
+            # persist first: readers (snapshots) only ever see saved blocks
+            self.store.append_item("blockchain", new_block.to_dict(),
+                                   lambda: [b.to_dict() for b in self.chain] + [new_block.to_dict()])
+            if self.shared is not None:
+                offset = self.store.journal_size("blockchain")
+                try:
+                    self.shared.append(row, offset)
+                except BaseException:
+                    # not published: take the block back out of the journal
+                    self._persist()
+                    raise
+                self._published = (self._published[0], offset)
+            self.chain.append(new_block)
         return new_block
 
+    @contextmanager
+    def exclusive(self):
+        """
+        Hold off every other writer (threads, and worker processes with a
+        shared ledger) with the chain up to date, e.g. to read blocks and
+        then detach them without a vote slipping in between.
+        """
+        with self._write_lock, self._publishing():
+            yield
+
+    @contextmanager
+    def _publishing(self):
+        """With a shared ledger: hold the cross-process writer lock, up to date with other writers."""
+        if self.shared is None:
+            yield
+            return
+        with self.shared.locked():
+            self.catch_up()
+            yield
+
+    def detach_blocks(self, blocks, links):
+        """
+        Remove blocks from the hot chain after archive.py has sealed them
+        in a segment. The chain tip can't be detached: new blocks link to it.
+        `links` ({index: hash}) are the archived hashes that remaining
+        blocks point to.
+        """
+        indexes = {b.index for b in blocks}
+        with self._write_lock, self._publishing():
+            if self.chain[-1].index in indexes:
+                raise ValueError("The last block of the chain cannot be detached.")
+            self.archived_links.update(links)
+            # a new list, so readers iterating the old one are unaffected
+            self.chain = [b for b in self.chain if b.index not in indexes]
+            self._persist()
+            if self.shared is not None:
+                # the journal was rewritten: other processes reload it
+                offset = self.store.journal_size("blockchain")
+                self.shared.rebuild(self.chain, offset)
+                self._published = (self.shared.header().generation, offset)
+
     def get_chain(self):
         """Return list of blocks."""
+        self.catch_up()
         return self.chain
     
-    def is_valid(self):
+    def is_valid(self, snapshot=None, progress=None):
         """
         Check that:
         - each block's hash is correct
         - each block's previous_hash matches the hash of the previous block
+        Checks `snapshot` (default: a snapshot taken now), so votes added
+        meanwhile don't interfere.
+        progress(done, total) is called every PROGRESS_INTERVAL blocks, if given.
         Returns: (is_valid: bool, message: str)
         """
-        if not self.chain:
+        chain = snapshot if snapshot is not None else self.snapshot()
+        if not len(chain):
             return False, "Blockchain is empty."
 
-        for i, block in enumerate(self.chain):
+        total = len(chain)
+        prev_block = None
+        for done, block in enumerate(chain):
+            if progress is not None and done % PROGRESS_INTERVAL == 0:
+                progress(done, total)
             # Recalculate hash
             recalculated = self._calculate_hash(
                 block.index,
@@ -177,38 +375,59 @@ class Blockchain:
                 block.election_id,
                 block.candidate_id,
                 block.previous_hash,
+                block.ranking,
             )
 
             if block.hash != recalculated:
                 return False, f"Invalid hash at block index {block.index}."
 
             # Check previous_hash linkage (skip for genesis block)
-            if i > 0:
-                prev_block = self.chain[i - 1]
-                if block.previous_hash != prev_block.hash:
-                    return False, f"Broken link between block {prev_block.index} and {block.index}."
+            if prev_block is not None:
+                if prev_block.index == block.index - 1:
+                    expected = prev_block.hash
+                else:
+                    # predecessor was archived: check against its recorded hash
+                    expected = self.archived_links.get(block.index - 1)
+                if block.previous_hash != expected:
+                    return False, f"Broken link between block {block.index - 1} and {block.index}."
+            prev_block = block
 
         return True, "Blockchain is valid."
 
 
 
 
-# Create a single global blockchain instance for the whole app
-_blockchain_instance = Blockchain()
-
-
-def add_vote_to_blockchain(username: str, election_id: int, candidate_id: int) -> Block:
+def add_vote_to_blockchain(username: str, election_id: int, candidate_id: int, ranking=None) -> Block:
     """
     Helper used by voting.py to add a vote block.
     """
-    return _blockchain_instance.add_vote_block(username, election_id, candidate_id)
+    return get_blockchain().add_vote_block(username, election_id, candidate_id, ranking)
 
 
 def get_blockchain():
     """
-    Return the global blockchain instance (for reading / validation later).
+    Return the blockchain of the current storage (for reading / validation later).
+    It is loaded on first use, then kept for the lifetime of the storage.
     """
-    return _blockchain_instance
+    store = get_storage()
+    return store.cached("blockchain", lambda: Blockchain(store))
+
+def format_block(block):
+    """Lines describing one block, as printed by print_blockchain()."""
+    lines = [
+        f"Index       : {block.index}",
+        f"Timestamp   : {block.timestamp}",
+        f"Voter Hash  : {block.voter_hash}",
+        f"Election ID : {block.election_id}",
+        f"Candidate ID: {block.candidate_id}",
+    ]
+    if block.ranking is not None:
+        lines.append(f"Ranking     : {block.ranking}")
+    lines.append(f"Prev Hash   : {block.previous_hash}")
+    lines.append(f"Hash        : {block.hash}")
+    lines.append("-" * 60)
+    return lines
+
 
 def print_blockchain():
     """
@@ -223,14 +442,7 @@ def print_blockchain():
 
     print("\n=== BLOCKCHAIN ===")
     for block in chain:
-        print(f"Index       : {block.index}")
-        print(f"Timestamp   : {block.timestamp}")
-        print(f"Voter Hash  : {block.voter_hash}")
-        print(f"Election ID : {block.election_id}")
-        print(f"Candidate ID: {block.candidate_id}")
-        print(f"Prev Hash   : {block.previous_hash}")
-        print(f"Hash        : {block.hash}")
-        print("-" * 60)
+        print("\n".join(format_block(block)))
 
 def check_blockchain_integrity():
     """
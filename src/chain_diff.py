@@ -0,0 +1,282 @@
+import argparse
+import heapq
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+from blockchain import Block, get_blockchain
+
+# Field-level differences printed per block before the rest is summarized.
+MAX_PRINTED_DIFFERENCES = 20
+
+
+def load_chain_file(path):
+    """
+    Load a chain from a blockchain.json copy (JSON array) or a
+    blockchain.jsonl journal (one block per line; a torn last line, left
+    by a crash mid-append, is ignored). Any other unreadable line raises
+    ValueError. Returns a list of Block.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".jsonl"):
+        records = []
+        lines = text.splitlines()
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as exc:
+                if number == len(lines) and not text.endswith("\n"):
+                    break
+                raise ValueError(f"{path} line {number} is corrupted: {exc}") from exc
+    else:
+        records = json.loads(text)
+    return [Block.from_dict(d) for d in records]
+
+
+def _block_index(block):
+    return block.index
+
+
+class _KnownHashes:
+    """
+    The block hashes one chain knows, by block index: its blocks (sorted
+    by index, with gaps where elections were archived) plus, for a chain
+    with archived elections, the archived hashes its hot blocks link to.
+    Lookups bisect the chain instead of indexing every block.
+    """
+
+    def __init__(self, chain, links=None):
+        self.chain = chain
+        self.links = links or {}
+        self.link_indexes = sorted(self.links)
+        self.end = max(chain[-1].index if chain else -1, self.link_indexes[-1] if self.link_indexes else -1)
+
+    def position(self, index):
+        """Position of the first block with a block index >= `index`."""
+        chain = self.chain
+        # indexes are unique and increasing, so the block sits at or before
+        # `index - first index`; without gaps it is right there
+        guess = index - chain[0].index if chain else -1
+        if 0 <= guess < len(chain) and chain[guess].index == index:
+            return guess
+        return bisect_left(chain, index, 0, max(0, min(guess + 1, len(chain))), key=_block_index)
+
+    def hash_at(self, index):
+        pos = self.position(index)
+        if pos < len(self.chain) and self.chain[pos].index == index:
+            return self.chain[pos].hash
+        return self.links.get(index)
+
+    def floor(self, index):
+        """The largest block index <= `index` this chain knows a hash for, or None."""
+        pos = self.position(index + 1)
+        best = self.chain[pos - 1].index if pos else None
+        pos = bisect_right(self.link_indexes, index)
+        if pos and (best is None or self.link_indexes[pos - 1] > best):
+            best = self.link_indexes[pos - 1]
+        return best
+
+    def points(self, start=0):
+        """(index, block or None, hash) for every index >= `start` this chain knows, in index order."""
+        chain = self.chain
+        blocks = ((chain[pos].index, chain[pos], chain[pos].hash) for pos in range(self.position(start), len(chain)))
+        links = ((i, None, self.links[i]) for i in self.link_indexes[bisect_left(self.link_indexes, start):])
+        return heapq.merge(blocks, links, key=itemgetter(0))
+
+
+def _common_floor(a, b, index):
+    """The largest block index <= `index` whose hash both chains know, or None."""
+    while index is not None:
+        found = a.floor(index)
+        if found is None:
+            return None
+        index = b.floor(found)
+        if index == found:
+            return found
+    return None
+
+
+def _first_divergence(a, b):
+    """first_divergence() over two _KnownHashes."""
+    last = min(a.end, b.end)
+    # smallest block index at which the chains disagree: in [lo, hi], hi meaning "none"
+    lo, hi = 0, last + 1
+    comparisons = 0
+    while lo < hi:
+        mid = (lo + hi) // 2
+        index = _common_floor(a, b, mid)
+        if index is None:
+            lo = mid + 1
+            continue
+        comparisons += 1
+        if a.hash_at(index) == b.hash_at(index):
+            lo = mid + 1
+        else:
+            hi = index
+    if lo <= last:
+        return lo, lo, comparisons
+    index = _common_floor(a, b, last)
+    return (index + 1 if index is not None else 0), None, comparisons
+
+
+def first_divergence(chain_a, chain_b, links_a=None, links_b=None):
+    """
+    Binary search for the first block index where the two chains differ.
+    Blocks are paired by index, not list position: archiving leaves gaps
+    in the hot chain, so the same block can sit at different positions,
+    and `links_a` / `links_b` (Blockchain.archived_links) stand in for
+    archived blocks. Every block hash covers the previous hash, so equal
+    hashes at index i mean equal chains up to i (archived blocks
+    included): the "same prefix" test is monotonic in the index and each
+    probe bisects both chains, so only O(log n) blocks are looked at.
+    Returns (length of the agreeing prefix in block indexes, index of the
+    first differing block or None, hash_comparisons).
+    Tampering that keeps the stored hash is not seen here; is_valid()
+    catches that.
+    """
+    return _first_divergence(_KnownHashes(chain_a, links_a), _KnownHashes(chain_b, links_b))
+
+
+def _describe(block, index, hash_):
+    # a block one chain only knows through an archive link
+    return block.to_dict() if block is not None else {"index": index, "hash": hash_, "archived": True}
+
+
+def _aligned(a, b):
+    """(index, point of a or None, point of b or None) for every index either chain knows, in order."""
+    points_a, points_b = a.points(), b.points()
+    pa, pb = next(points_a, None), next(points_b, None)
+    while pa is not None or pb is not None:
+        if pb is None or (pa is not None and pa[0] < pb[0]):
+            yield pa[0], pa, None
+            pa = next(points_a, None)
+        elif pa is None or pb[0] < pa[0]:
+            yield pb[0], None, pb
+            pb = next(points_b, None)
+        else:
+            yield pa[0], pa, pb
+            pa, pb = next(points_a, None), next(points_b, None)
+
+
+def diff_chains(chain_a, chain_b, links_a=None, links_b=None):
+    """
+    Compare two chains (lists of Block sorted by index), aligned by block
+    index. `links_a` / `links_b` are a chain's archived links ({index:
+    hash}, Blockchain.archived_links) so archived blocks are compared too.
+    Returns a dict with the agreeing prefix, whether the chains forked
+    (differ at an index both know) and the differing blocks: `changed`
+    lists the indexes from the fork on with the differing fields,
+    `only_a` / `only_b` the blocks one chain has past the other's end,
+    and `unmatched_a` / `unmatched_b` counts the blocks inside the other
+    chain's range that it does not hold (archived there).
+    The fork is found by binary search; the rest takes one pass over both
+    chains.
+    """
+    a, b = _KnownHashes(chain_a, links_a), _KnownHashes(chain_b, links_b)
+    common, fork_index, comparisons = _first_divergence(a, b)
+
+    changed = []
+    unmatched_a = unmatched_b = 0
+    for index, pa, pb in _aligned(a, b):
+        if pa is None:
+            unmatched_b += pb[1] is not None and index <= a.end
+        elif pb is None:
+            unmatched_a += pa[1] is not None and index <= b.end
+        elif fork_index is not None and index >= fork_index:
+            da, db = _describe(pa[1], index, pa[2]), _describe(pb[1], index, pb[2])
+            # only the hash is known for a block archived in one chain
+            keys = ("hash",) if da.get("archived") or db.get("archived") else {**da, **db}
+            fields = [k for k in keys if da.get(k) != db.get(k)]
+            if fields:
+                changed.append({"index": index, "fields": fields, "a": da, "b": db})
+
+    return {
+        "length_a": len(chain_a),
+        "length_b": len(chain_b),
+        "common_prefix": common,
+        "forked": fork_index is not None,
+        "fork_index": fork_index,
+        "hash_comparisons": comparisons,
+        "changed": changed,
+        "only_a": [blk.to_dict() for blk in chain_a[a.position(b.end + 1):]],
+        "only_b": [blk.to_dict() for blk in chain_b[b.position(a.end + 1):]],
+        "unmatched_a": unmatched_a,
+        "unmatched_b": unmatched_b,
+    }
+
+
+def print_diff(diff, name_a="A", name_b="B"):
+    """Pretty-print the result of diff_chains()."""
+    print(f"\n=== CHAIN DIFF: {name_a} ({diff['length_a']} blocks) vs {name_b} ({diff['length_b']} blocks) ===")
+    print(f"Common prefix : {diff['common_prefix']} block index(es) "
+          f"({diff['hash_comparisons']} hash comparison(s))")
+    for name, other, count in ((name_a, name_b, diff["unmatched_a"]), (name_b, name_a, diff["unmatched_b"])):
+        if count:
+            print(f"ℹ️  {count} block(s) of {name} are not in {other}'s hot chain (archived there).")
+    if not diff["forked"] and not diff["only_a"] and not diff["only_b"]:
+        print("✅ The chains are identical.")
+        return
+    if diff["forked"]:
+        print(f"❌ The chains FORK at block index {diff['fork_index']}.")
+    else:
+        longer = name_a if diff["only_a"] else name_b
+        print(f"ℹ️  No fork: {longer} extends the other chain.")
+
+    for change in diff["changed"][:MAX_PRINTED_DIFFERENCES]:
+        print(f"  index {change['index']}: differs in {', '.join(change['fields'])}")
+        for field in change["fields"]:
+            print(f"      {name_a}: {field}={change['a'].get(field)}")
+            print(f"      {name_b}: {field}={change['b'].get(field)}")
+    hidden = len(diff["changed"]) - MAX_PRINTED_DIFFERENCES
+    if hidden > 0:
+        print(f"  ... {hidden} more differing block(s)")
+    if diff["only_a"]:
+        print(f"  {len(diff['only_a'])} block(s) only in {name_a} "
+              f"(indexes {diff['only_a'][0]['index']}..{diff['only_a'][-1]['index']})")
+    if diff["only_b"]:
+        print(f"  {len(diff['only_b'])} block(s) only in {name_b} "
+              f"(indexes {diff['only_b'][0]['index']}..{diff['only_b'][-1]['index']})")
+
+
+def compare_with_backup():
+    """Interactive: compare the live blockchain with a backup/replica file."""
+    path = input("Path of the backup blockchain file (.json or .jsonl): ").strip()
+    try:
+        backup = load_chain_file(path)
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        print(f"❌ Could not read {path}: {exc}")
+        return
+    bc = get_blockchain()
+    print_diff(diff_chains(bc.get_chain(), backup, links_a=bc.archived_links), "live", "backup")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find where two copies of the blockchain diverge.")
+    parser.add_argument("chain_a", help="blockchain file (.json or .jsonl)")
+    parser.add_argument("chain_b", nargs="?", help="second file (default: the live data/ blockchain)")
+    parser.add_argument("--json", action="store_true", help="print the diff as JSON")
+    args = parser.parse_args(argv)
+
+    chain_a = load_chain_file(args.chain_a)
+    links_b = None
+    if args.chain_b:
+        chain_b, name_b = load_chain_file(args.chain_b), args.chain_b
+    else:
+        bc = get_blockchain()
+        chain_b, name_b, links_b = bc.get_chain(), "live", bc.archived_links
+
+    diff = diff_chains(chain_a, chain_b, links_b=links_b)
+    if args.json:
+        json.dump(diff, sys.stdout, indent=2)
+        print()
+    else:
+        print_diff(diff, args.chain_a, name_b)
+    return 1 if diff["forked"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import argparse
+import json
+import shlex
+import sys
+import time
+
+import storage
+from analytics import get_ledger
+from archive import ArchiveError, verify_archives, with_archived_tallies
+from blockchain import get_blockchain
+from election import ElectionError, _load_elections, add_candidates, new_election, set_election_active
+from ranked import RANKED, SINGLE, is_ranked, tabulate_election
+from reporting import EXPORT_FORMATS, export_results_bulk, log_action
+from storage import StorageCorruptedError
+
+# Username recorded in logs/actions.log for scripted changes.
+CLI_USER = "cli"
+
+
+class CommandError(Exception):
+    pass
+
+
+class _Parser(argparse.ArgumentParser):
+    """
+    Raises CommandError instead of exiting, so a bad batch line doesn't
+    end the batch, and instead of printing help or usage, which would land
+    in the middle of the JSON-lines output.
+    """
+
+    def print_help(self, file=None):
+        raise CommandError(self.format_help().strip())
+
+    def print_usage(self, file=None):
+        raise CommandError(self.format_usage().strip())
+
+    def error(self, message):
+        raise CommandError(message)
+
+    def exit(self, status=0, message=None):
+        raise CommandError((message or "").strip() or "usage error")
+
+
+def _election_summary(e):
+    return {
+        "id": e["id"],
+        "title": e["title"],
+        "type": e.get("type", SINGLE),
+        "is_active": e.get("is_active", False),
+        "archived": e.get("archived", False),
+        "candidates": e.get("candidates", []),
+    }
+
+
+# ---------- commands ----------
+# Each takes the parsed arguments and returns a JSON-serializable result;
+# failures raise CommandError (or ElectionError / ArchiveError / ValueError).
+
+def cmd_list(args):
+    return {"elections": [_election_summary(e) for e in _load_elections()]}
+
+
+def cmd_create_election(args):
+    e = new_election(args.title, args.description, RANKED if args.ranked else SINGLE, active=args.open)
+    log_action(CLI_USER, "CREATE_ELECTION_CLI", f"id={e['id']}")
+    return _election_summary(e)
+
+
+def cmd_add_candidate(args):
+    e = add_candidates(args.election_id, args.names)
+    log_action(CLI_USER, "ADD_CANDIDATE_CLI", f"election_id={e['id']}, count={len(args.names)}")
+    return _election_summary(e)
+
+
+def cmd_toggle(args):
+    e = set_election_active(args.election_id, args.active)
+    log_action(CLI_USER, "TOGGLE_ELECTION_CLI", f"election_id={e['id']}, active={e['is_active']}")
+    return {"id": e["id"], "is_active": e["is_active"]}
+
+
+def cmd_verify(args):
+    bc = get_blockchain()
+    snapshot = bc.snapshot()
+    valid, msg = bc.is_valid(snapshot)
+    if valid and args.archives:
+        valid, msg = verify_archives()
+    if not valid:
+        raise CommandError(msg)
+    return {"valid": True, "message": msg, "blocks": len(snapshot)}
+
+
+def cmd_export(args):
+    formats = args.formats or EXPORT_FORMATS
+    return {"files": export_results_bulk(args.election_ids or None, formats)}
+
+
+def cmd_results(args):
+    snapshot = get_blockchain().snapshot()
+    tallies = with_archived_tallies(get_ledger().tally_all(snapshot))
+    elections = _load_elections()
+    if args.election_ids:
+        wanted = set(args.election_ids)
+        elections = [e for e in elections if e["id"] in wanted]
+        if len(elections) != len(wanted):
+            raise CommandError("Election not found.")
+    results = []
+    for e in elections:
+        entry = {"election_id": e["id"], "title": e["title"], "counts": tallies.get(e["id"], {})}
+        if is_ranked(e):
+            entry["irv"] = tabulate_election(e)
+        results.append(entry)
+    return {"blocks": len(snapshot), "last_hash": snapshot.last_hash, "results": results}
+
+
+def _add_commands(sub):
+    sub.add_parser("list", help="list elections").set_defaults(func=cmd_list)
+
+    p = sub.add_parser("create-election", help="create an election (closed unless --open)")
+    p.add_argument("--title", required=True)
+    p.add_argument("--description", default="")
+    p.add_argument("--ranked", action="store_true", help="ranked-choice ballots (instant runoff)")
+    p.add_argument("--open", action="store_true", help="open it for voting right away")
+    p.set_defaults(func=cmd_create_election)
+
+    p = sub.add_parser("add-candidate", help="add one or more candidates to an election")
+    p.add_argument("election_id", type=int)
+    p.add_argument("names", nargs="+")
+    p.set_defaults(func=cmd_add_candidate)
+
+    p = sub.add_parser("toggle", help="open or close an election")
+    p.add_argument("election_id", type=int)
+    state = p.add_mutually_exclusive_group()
+    state.add_argument("--open", dest="active", action="store_const", const=True, help="open it (no-op if open)")
+    state.add_argument("--close", dest="active", action="store_const", const=False, help="close it (no-op if closed)")
+    p.set_defaults(func=cmd_toggle, active=None)
+
+    p = sub.add_parser("verify", help="verify the blockchain (fails if it is invalid)")
+    p.add_argument("--archives", action="store_true", help="also verify archived segments")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("export", help="write result reports to the reports directory")
+    p.add_argument("--election", dest="election_ids", type=int, action="append", help="repeatable; default all")
+    p.add_argument("--format", dest="formats", choices=EXPORT_FORMATS, action="append", help="repeatable; default all")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("results", help="vote counts (and runoff rounds) per election")
+    p.add_argument("election_ids", type=int, nargs="*", help="default all")
+    p.set_defaults(func=cmd_results)
+
+
+def command_parser(parser_class=_Parser):
+    parser = parser_class(prog="", add_help=False)
+    _add_commands(parser.add_subparsers(dest="command", required=True, parser_class=parser_class))
+    return parser
+
+
+# ---------- running ----------
+
+def run_command(args):
+    """
+    Run one parsed command and return its outcome:
+        {"command": ..., "ok": true, "ms": ..., "result": {...}}
+        {"command": ..., "ok": false, "ms": ..., "error": "..."}
+    """
+    started = time.perf_counter()
+    try:
+        out = {"command": args.command, "ok": True, "result": args.func(args)}
+    except (CommandError, ElectionError, ArchiveError, StorageCorruptedError, ValueError, OSError) as exc:
+        out = {"command": args.command, "ok": False, "error": str(exc)}
+    out["ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return out
+
+
+def run_batch(lines, emit, stop_on_error=False):
+    """
+    Run commands given one per line (shell-style quoting, # comments)
+    in this process, so the chain, ledger and caches loaded by one command
+    are reused by the next. emit(outcome) is called after each command,
+    with the line number added. Returns (commands run, commands failed).
+    """
+    parser = command_parser()
+    ran = failed = 0
+    for number, line in enumerate(lines, start=1):
+        try:
+            words = shlex.split(line, comments=True)
+            if not words:
+                continue
+            outcome = run_command(parser.parse_args(words))
+        except (CommandError, ValueError) as exc:   # ValueError: unbalanced quotes
+            outcome = {"command": line.strip().split(" ", 1)[0], "ok": False, "error": str(exc), "ms": 0.0}
+        outcome["line"] = number
+        emit(outcome)
+        ran += 1
+        if not outcome["ok"]:
+            failed += 1
+            if stop_on_error:
+                break
+    return ran, failed
+
+
+def _emit(outcome):
+    print(json.dumps(outcome, separators=(",", ":")), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run admin operations without the menus. Each command prints one JSON line "
+                    "with its result (or error) and its time in ms.")
+    parser.add_argument("--data-dir", help="keep data/, reports/ and logs/ under this directory")
+    parser.add_argument("--memory", action="store_true", help="keep everything in memory (nothing is saved)")
+    parser.add_argument("--journal-chain", action="store_true",
+                        help="store the blockchain as an append-only journal (data/blockchain.jsonl)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    batch = sub.add_parser("batch", help="run the commands in a file ('-' for stdin), one per line")
+    batch.add_argument("file")
+    batch.add_argument("--stop-on-error", action="store_true")
+    _add_commands(sub)
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        config = storage.MEMORY
+    elif args.journal_chain:
+        config = storage.JOURNAL_PREFIX + (args.data_dir or "")
+    else:
+        config = args.data_dir
+
+    with storage.use_storage(storage.from_config(config)):
+        if args.command != "batch":
+            outcome = run_command(args)
+            _emit(outcome)
+            return 0 if outcome["ok"] else 1
+        started = time.perf_counter()
+        try:
+            if args.file == "-":
+                ran, failed = run_batch(sys.stdin, _emit, args.stop_on_error)
+            else:
+                with open(args.file, "r", encoding="utf-8") as f:
+                    ran, failed = run_batch(f, _emit, args.stop_on_error)
+        except OSError as exc:
+            _emit({"command": "batch", "ok": False, "error": str(exc), "ms": 0.0})
+            return 1
+        _emit({"command": "batch", "ok": failed == 0, "commands": ran, "failed": failed,
+               "ms": round((time.perf_counter() - started) * 1000, 3)})
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
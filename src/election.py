@@ -1,24 +1,21 @@
-import json
-import os
+from ranked import ELECTION_TYPES, RANKED, SINGLE, election_type
 from reporting import log_action
+from storage import get_storage
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-os.makedirs(DATA_DIR, exist_ok=True)
-
-ELECTIONS_FILE = os.path.join(DATA_DIR, "elections.json")
 
 def _load_elections():
-    print("DEBUG ELECTIONS_FILE:", ELECTIONS_FILE)  # TEMP
-    if not os.path.exists(ELECTIONS_FILE):
-        print("DEBUG: elections.json does NOT exist")
-        return []
-    with open(ELECTIONS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return get_storage().load_list("elections")
 
 def _save_elections(elections):
-    with open(ELECTIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(elections, f, indent=2)
+    get_storage().save_list("elections", elections)
+
+
+def elections_version():
+    """
+    Cheap change marker for the elections list, or None.
+    Used to cache data derived from elections that are closed.
+    """
+    return get_storage().version("elections")
 
 
 def _next_election_id(elections):
@@ -36,26 +33,84 @@ def _next_candidate_id(election):
     return max(c["id"] for c in candidates) + 1
 
 
+class ElectionError(Exception):
+    pass
+
+
+class ElectionNotFound(ElectionError):
+    pass
+
+
+def _find_election(elections, election_id):
+    election = next((e for e in elections if e["id"] == election_id), None)
+    if election is None:
+        raise ElectionNotFound("Election not found.")
+    return election
+
+
+def new_election(title, description="", kind=SINGLE, active=False):
+    """Create an election (closed unless active) and return it."""
+    title = (title or "").strip()
+    if not title:
+        raise ElectionError("Election title cannot be empty.")
+    if kind not in ELECTION_TYPES:
+        raise ElectionError(f"Election type must be one of: {', '.join(ELECTION_TYPES)}.")
+    with get_storage().write_section("elections"):
+        elections = _load_elections()
+        election = {
+            "id": _next_election_id(elections),
+            "title": title,
+            "description": (description or "").strip(),
+            "type": kind,
+            "is_active": active,
+            "candidates": []
+        }
+        elections.append(election)
+        _save_elections(elections)
+    return election
+
+
+def add_candidates(election_id, names):
+    """Add candidates (by name) to an election and return the election."""
+    with get_storage().write_section("elections"):
+        elections = _load_elections()
+        election = _find_election(elections, election_id)
+        names = [(n or "").strip() for n in names]
+        if not names or not all(names):
+            raise ElectionError("Candidate name cannot be empty.")
+        candidates = election.setdefault("candidates", [])
+        for name in names:
+            candidates.append({"id": _next_candidate_id(election), "name": name})
+        _save_elections(elections)
+    return election
+
+
+def set_election_active(election_id, active=None):
+    """Open or close an election (toggle it if active is None); returns it."""
+    with get_storage().write_section("elections"):
+        elections = _load_elections()
+        election = _find_election(elections, election_id)
+        if election.get("archived"):
+            raise ElectionError("This election is archived and cannot be reopened.")
+        election["is_active"] = not election.get("is_active", False) if active is None else active
+        _save_elections(elections)
+    return election
+
+
 def create_election():
     """Interactive: admin creates a new election."""
-    elections = _load_elections()
-
     print("\n=== Create New Election ===")
     title = input("Election title: ").strip()
     description = input("Description: ").strip()
+    ranked = input("Ranked-choice ballots (instant runoff)? (y/N): ").strip().lower() == "y"
 
-    new_election = {
-        "id": _next_election_id(elections),
-        "title": title,
-        "description": description,
-        "is_active": False,  # initially closed
-        "candidates": []
-    }
-
-    elections.append(new_election)
-    _save_elections(elections)
+    try:
+        election = new_election(title, description, RANKED if ranked else SINGLE)
+    except ElectionError as exc:
+        print(f"❌ {exc}")
+        return
 
-    print(f"✅ Election created with ID {new_election['id']} (currently CLOSED).")
+    print(f"✅ Election created with ID {election['id']} (currently CLOSED).")
 
 
 def list_elections(show_candidates=False):
@@ -69,7 +124,8 @@ def list_elections(show_candidates=False):
     print("\n=== Elections ===")
     for e in elections:
         status = "ACTIVE" if e.get("is_active") else "CLOSED"
-        print(f"- ID: {e['id']} | {e['title']} [{status}]")
+        kind = " (ranked)" if election_type(e) == RANKED else ""
+        print(f"- ID: {e['id']} | {e['title']}{kind} [{status}]")
         print(f"  Description: {e['description']}")
         if show_candidates:
             candidates = e.get("candidates", [])
@@ -97,25 +153,13 @@ def add_candidate_to_election():
         print("❌ Invalid ID.")
         return
 
-    # find election
-    election = next((e for e in elections if e["id"] == election_id), None)
-    if election is None:
-        print("❌ Election not found.")
-        return
-
     candidate_name = input("Candidate name: ").strip()
-    if not candidate_name:
-        print("❌ Candidate name cannot be empty.")
+    try:
+        election = add_candidates(election_id, [candidate_name])
+    except ElectionError as exc:
+        print(f"❌ {exc}")
         return
 
-    new_candidate = {
-        "id": _next_candidate_id(election),
-        "name": candidate_name
-    }
-
-    election.setdefault("candidates", []).append(new_candidate)
-    _save_elections(elections)
-
     print(f"✅ Candidate '{candidate_name}' added to election '{election['title']}'.")
 
 
@@ -134,14 +178,12 @@ def toggle_election_status():
         print("❌ Invalid ID.")
         return
 
-    election = next((e for e in elections if e["id"] == election_id), None)
-    if election is None:
-        print("❌ Election not found.")
+    try:
+        election = set_election_active(election_id)
+    except ElectionError as exc:
+        print(f"❌ {exc}")
         return
 
-    election["is_active"] = not election.get("is_active", False)
-    _save_elections(elections)
-
     state = "ACTIVE" if election["is_active"] else "CLOSED"
     print(f"✅ Election '{election['title']}' is now {state}.")
     
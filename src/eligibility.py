@@ -0,0 +1,255 @@
+import hashlib
+import threading
+
+from election import ElectionError, _find_election, _load_elections, _save_elections
+from reporting import log_action
+from storage import get_storage
+
+
+class RollError(Exception):
+    pass
+
+
+class Bitset:
+    """Growable set of small non-negative ints, one bit each."""
+
+    __slots__ = ("bits",)
+
+    def __init__(self, data=b""):
+        self.bits = bytearray(data)
+
+    def add(self, n):
+        byte = n >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        self.bits[byte] |= 1 << (n & 7)
+
+    def __contains__(self, n):
+        byte = n >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (n & 7)))
+
+    def count(self):
+        """Number of members (popcount)."""
+        return int.from_bytes(self.bits, "little").bit_count()
+
+    def count_and(self, other):
+        """Number of members also in `other`."""
+        return (int.from_bytes(self.bits, "little") & int.from_bytes(other.bits, "little")).bit_count()
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+def _roll_blob_name(election_id):
+    return f"election_{election_id}.roll"
+
+
+class EligibilityRolls:
+    """
+    Who may vote and who has voted, per election, as bitsets over a dense
+    voter numbering (a user's position in users.json; users are only
+    ever appended). A 10M-voter roll takes 1.25 MB.
+    An election with a roll (election["roll"]) is open only to the users
+    on it; elections without one are open to every user.
+    Rolls are stored as blobs; has-voted sets are built from votes.json
+    and kept up to date by mark_voted(), so checks don't read votes.json.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._numbers = {}          # username -> voter number
+        self._users_version = None
+        self._user_count = 0
+        self._voted = {}            # election_id -> Bitset
+        self._votes_version = None
+        self._rolls = {}            # election_id -> (digest, Bitset)
+
+    # ---------- voter numbering ----------
+
+    def _sync_users(self):
+        version = self.store.version("users")
+        if version == self._users_version:
+            return
+        users = self.store.load_list("users")
+        if len(users) < self._user_count:
+            self._numbers, self._user_count = {}, 0
+        # users are appended, so only new ones need numbers
+        for n in range(self._user_count, len(users)):
+            self._numbers[users[n]["username"]] = n
+        self._user_count = len(users)
+        self._users_version = version
+
+    def voter_number(self, username):
+        with self._lock:
+            self._sync_users()
+            return self._numbers.get(username)
+
+    # ---------- has voted ----------
+
+    def _sync_votes(self):
+        version = self.store.version("votes")
+        if version == self._votes_version:
+            return
+        self._sync_users()
+        voted = {}
+        for v in self.store.load_list("votes"):
+            n = self._numbers.get(v["voter_username"])
+            if n is not None:
+                voted.setdefault(v["election_id"], Bitset()).add(n)
+        self._voted = voted
+        self._votes_version = version
+
+    def has_voted(self, username, election_id):
+        with self._lock:
+            self._sync_votes()
+            n = self._numbers.get(username)
+            return n is not None and n in self._voted.get(election_id, ())
+
+    def mark_voted(self, username, election_id, version_before):
+        """
+        Record a vote just saved to votes.json (no reload needed).
+        `version_before` is the votes version seen just before that save.
+        The sets only adopt the new version if they matched the old one.
+        If someone else also changed votes.json, the next check reloads it.
+        """
+        with self._lock:
+            self._sync_users()
+            n = self._numbers.get(username)
+            if n is not None:
+                self._voted.setdefault(election_id, Bitset()).add(n)
+            if self._votes_version == version_before:
+                self._votes_version = self.store.version("votes")
+
+    # ---------- rolls ----------
+
+    def roll(self, election):
+        """The election's roll as a Bitset, or None if every user may vote."""
+        info = election.get("roll")
+        if not info:
+            return None
+        with self._lock:
+            cached = self._rolls.get(election["id"])
+            if cached is None or cached[0] != info["digest"]:
+                cached = (info["digest"], Bitset(self.store.load_blob(info["blob"])))
+                self._rolls[election["id"]] = cached
+            return cached[1]
+
+    def is_eligible(self, username, election):
+        roll = self.roll(election)
+        if roll is None:
+            return True
+        n = self.voter_number(username)
+        return n is not None and n in roll
+
+    def build_roll(self, election, usernames):
+        """
+        Store a roll for the election and set election["roll"] (the caller
+        saves the election). Raises RollError listing unknown usernames.
+        """
+        with self._lock:
+            self._sync_users()
+            roll = Bitset()
+            unknown = []
+            for name in usernames:
+                n = self._numbers.get(name)
+                if n is None:
+                    unknown.append(name)
+                else:
+                    roll.add(n)
+            if unknown:
+                shown = ", ".join(unknown[:10]) + (" ..." if len(unknown) > 10 else "")
+                raise RollError(f"{len(unknown)} unknown user(s): {shown}")
+            data = roll.to_bytes()
+            name = _roll_blob_name(election["id"])
+            self.store.save_blob(name, data)
+            digest = hashlib.sha256(data).hexdigest()
+            election["roll"] = {"blob": name, "digest": digest, "eligible": roll.count()}
+            self._rolls[election["id"]] = (digest, roll)
+            return election["roll"]
+
+    # ---------- turnout ----------
+
+    def turnout(self, election):
+        """Eligible voters, votes cast by them and the percentage."""
+        roll = self.roll(election)
+        with self._lock:
+            self._sync_votes()
+            voted = self._voted.get(election["id"], Bitset())
+            if roll is None:
+                eligible, cast = self._user_count, voted.count()
+            else:
+                eligible, cast = roll.count(), voted.count_and(roll)
+        return {
+            "election_id": election["id"],
+            "eligible": eligible,
+            "voted": cast,
+            "percent": round(100.0 * cast / eligible, 2) if eligible else 0.0,
+        }
+
+
+def get_rolls():
+    """The eligibility rolls of the current storage (created on first use)."""
+    store = get_storage()
+    return store.cached("eligibility_rolls", lambda: EligibilityRolls(store))
+
+
+def set_roll(election_id, usernames):
+    """
+    Restrict an election to `usernames`, or open it to every user again
+    (None), and save it. Runs in the elections write section, like the
+    other election writes. Returns the election; raises ElectionNotFound
+    or RollError.
+    """
+    with get_storage().write_section("elections"):
+        elections = _load_elections()
+        election = _find_election(elections, election_id)
+        if usernames is None:
+            election.pop("roll", None)
+        else:
+            get_rolls().build_roll(election, usernames)
+        _save_elections(elections)
+    return election
+
+
+def manage_roll_interactive():
+    """Interactive: show an election's turnout and set or clear its voter roll."""
+    try:
+        election_id = int(input("Election ID: ").strip())
+    except ValueError:
+        print("❌ Invalid election ID.")
+        return
+    elections = _load_elections()
+    election = next((e for e in elections if e["id"] == election_id), None)
+    if election is None:
+        print("❌ Election not found.")
+        return
+
+    t = get_rolls().turnout(election)
+    kind = "voter roll" if election.get("roll") else "open to all users"
+    print(f"\nTurnout: {t['voted']} of {t['eligible']} eligible ({t['percent']}%), {kind}.")
+
+    path = input("File with one username per line (empty: keep, '-': open to all users): ").strip()
+    if not path:
+        return
+    if path == "-":
+        set_roll(election_id, None)
+        print("✅ Election is open to all users.")
+        log_action(None, "SET_ROLL", f"election_id={election_id}, roll=none")
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            usernames = [line.strip() for line in f if line.strip()]
+        info = set_roll(election_id, usernames)["roll"]
+    except OSError as exc:
+        print(f"❌ Could not read {path}: {exc}")
+        return
+    except (RollError, ElectionError) as exc:
+        print(f"❌ {exc}")
+        return
+    print(f"✅ {info['eligible']} eligible voter(s) on the roll.")
+    log_action(None, "SET_ROLL", f"election_id={election_id}, eligible={info['eligible']}")
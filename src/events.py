@@ -0,0 +1,163 @@
+import json
+import threading
+from collections import deque
+
+from storage import get_storage
+
+# Per-subscriber buffer size. A client that falls this many events behind
+# is dropped to a single "resync" event instead of growing without bound.
+DEFAULT_BUFFER_SIZE = 256
+
+# How many recent events are kept for clients reconnecting with Last-Event-ID.
+DEFAULT_HISTORY_SIZE = 1024
+
+DEFAULT_MAX_SUBSCRIBERS = 10000
+
+
+def _format_sse(event_id, event, data):
+    """Encode one event in text/event-stream format."""
+    payload = json.dumps(data, separators=(",", ":"))
+    if event_id is None:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscriber:
+    """
+    One connected client: a bounded buffer of already-encoded events.
+    """
+
+    def __init__(self, buffer_size):
+        self._buffer = deque()
+        self._buffer_size = buffer_size
+        self._cond = threading.Condition()
+        self._lagged = False
+        self.closed = False
+
+    def _push(self, message):
+        with self._cond:
+            if len(self._buffer) >= self._buffer_size:
+                # Backpressure: the client is too slow. Drop what it has not
+                # read yet; it will get one "resync" event and should reload
+                # the full results before applying further deltas.
+                self._buffer.clear()
+                self._lagged = True
+            self._buffer.append(message)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Wait up to `timeout` seconds for events.
+        Returns the list of pending encoded events (empty on timeout).
+        """
+        with self._cond:
+            if not self._buffer and not self._lagged and not self.closed:
+                self._cond.wait(timeout)
+            messages = list(self._buffer)
+            self._buffer.clear()
+            if self._lagged:
+                self._lagged = False
+                messages.insert(0, _format_sse(None, "resync", {"reason": "client too slow"}))
+            return messages
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class EventPublisher:
+    """
+    In-process fan-out of events to SSE subscribers.
+    Each event is encoded once and appended to every subscriber's buffer,
+    so publishing costs O(subscribers) and never blocks on a slow client.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, history_size=DEFAULT_HISTORY_SIZE,
+                 max_subscribers=DEFAULT_MAX_SUBSCRIBERS):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, last_event_id=None):
+        """
+        Register a new subscriber.
+        If last_event_id is given (EventSource reconnect), events published
+        after it are replayed from the recent history, or a "resync" is
+        sent if they are no longer available.
+        """
+        sub = Subscriber(self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._subscribers.add(sub)
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._last_id + 1
+                if last_event_id > self._last_id or oldest > last_event_id + 1:
+                    # events were lost (or the server restarted)
+                    sub._lagged = True
+                for eid, msg in self._history:
+                    if eid > last_event_id:
+                        sub._push(msg)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+        sub.close()
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event, data):
+        """
+        Send an event to all current subscribers. Returns its id.
+        Pushed under the lock (pushing never blocks), so concurrent
+        publishers reach every subscriber in id order, as in the history.
+        """
+        with self._lock:
+            self._last_id += 1
+            event_id = self._last_id
+            message = _format_sse(event_id, event, data)
+            self._history.append((event_id, message))
+            for sub in self._subscribers:
+                sub._push(message)
+        return event_id
+
+
+def block_header(block):
+    """Public part of a block pushed to live subscribers."""
+    return {
+        "index": block.index,
+        "timestamp": block.timestamp,
+        "election_id": block.election_id,
+        "previous_hash": block.previous_hash,
+        "hash": block.hash,
+    }
+
+
+def get_publisher():
+    """Return the event publisher of the current app instance."""
+    return get_storage().cached("event_publisher", EventPublisher)
+
+
+def publish_vote_block(block):
+    """
+    Announce a committed vote: the new block header and the tally delta
+    for its election.
+    """
+    publisher = get_publisher()
+    publisher.publish("block", block_header(block))
+    publisher.publish("tally", {
+        "election_id": block.election_id,
+        "candidate_id": block.candidate_id,
+        "delta": 1,
+        "block_index": block.index,
+    })
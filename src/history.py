@@ -0,0 +1,170 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+from archive import archived_tallies_upto
+from blockchain import get_blockchain
+from election import _load_elections
+from storage import get_storage
+
+# A full tally snapshot is kept every CHECKPOINT_INTERVAL hot blocks, so
+# any historical query replays at most CHECKPOINT_INTERVAL - 1 blocks.
+CHECKPOINT_INTERVAL = 1000
+
+
+def _copy_tallies(tallies):
+    return {eid: dict(counts) for eid, counts in tallies.items()}
+
+
+def _add_tallies(tallies, extra):
+    for eid, counts in extra.items():
+        target = tallies.setdefault(eid, {})
+        for cid, n in counts.items():
+            target[cid] = target.get(cid, 0) + n
+    return tallies
+
+
+class TallyHistory:
+    """
+    Answers "what were the standings at block N / at time T?".
+    Keeps the running tally plus a snapshot every CHECKPOINT_INTERVAL
+    blocks; a query starts from the nearest checkpoint at or before the
+    requested block and replays only the blocks after it.
+    Checkpoints cover the hot chain; votes of archived elections (gaps in
+    the block indexes) are added from their segments, see archive.py.
+    """
+
+    def __init__(self, blockchain=None, interval=CHECKPOINT_INTERVAL):
+        self.blockchain = blockchain
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # _checkpoints[k] = tallies after applying chain[0 .. k * interval]
+        self._checkpoints = []
+        self._running = {}
+        self._indexes = []
+        self._times = []
+        self._last_hash = None
+        self._source = None
+
+    def refresh(self):
+        """Extend checkpoints with blocks appended since the last refresh."""
+        with self._lock:
+            chain = self.blockchain.snapshot()
+            seen = len(self._times)
+            if seen and (len(chain) < seen or chain[seen - 1].hash != self._last_hash):
+                self._reset()
+                seen = 0
+
+            for pos, block in enumerate(chain[seen:], start=seen):
+                if block.election_id != -1:
+                    counts = self._running.setdefault(block.election_id, {})
+                    counts[block.candidate_id] = counts.get(block.candidate_id, 0) + 1
+                if pos % self.interval == 0:
+                    self._checkpoints.append(_copy_tallies(self._running))
+                self._indexes.append(block.index)
+                self._times.append(datetime.fromisoformat(block.timestamp))
+
+            if len(chain):
+                self._last_hash = chain[-1].hash
+            self._source = chain.blocks
+        return self
+
+    def tallies_at_block(self, block_index):
+        """
+        Return (block_index, {election_id: {candidate_id: count}}) counting
+        every vote in blocks 0 .. block_index (inclusive).
+        Indexes past the end of the chain are clamped to the last block.
+        """
+        if block_index < 0:
+            raise ValueError("block index must be >= 0")
+        with self._lock:
+            chain = self._source   # positions below refer to this list
+            block_index = min(block_index, self._indexes[-1])
+            # position of the last hot block with index <= block_index
+            pos = bisect_right(self._indexes, block_index) - 1
+            k = pos // self.interval
+            tallies = _copy_tallies(self._checkpoints[k])
+
+        for block in chain[k * self.interval + 1:pos + 1]:
+            if block.election_id != -1:
+                counts = tallies.setdefault(block.election_id, {})
+                counts[block.candidate_id] = counts.get(block.candidate_id, 0) + 1
+        archived, _ = archived_tallies_upto(block_index=block_index)
+        return block_index, _add_tallies(tallies, archived)
+
+    def block_index_at(self, when):
+        """
+        Return the index of the last block with timestamp <= when,
+        or None if the chain starts after that moment.
+        `when` is a datetime or an ISO-8601 string (UTC).
+        """
+        if isinstance(when, str):
+            when = datetime.fromisoformat(when)
+        if when.tzinfo is not None:
+            # block timestamps are naive UTC
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            pos = bisect_right(self._times, when)
+            hot_index = self._indexes[pos - 1] if pos else None
+        _, archived_index = archived_tallies_upto(when=when)
+        if archived_index is None:
+            return hot_index
+        return archived_index if hot_index is None else max(hot_index, archived_index)
+
+    def tallies_at_time(self, when):
+        """Same as tallies_at_block() for the last block at or before `when`."""
+        block_index = self.block_index_at(when)
+        if block_index is None:
+            return None, {}
+        return self.tallies_at_block(block_index)
+
+    def timestamp_of(self, block_index):
+        """Timestamp of a hot block, or None if it was archived."""
+        with self._lock:
+            pos = bisect_left(self._indexes, block_index)
+            if pos < len(self._indexes) and self._indexes[pos] == block_index:
+                return self._times[pos].isoformat()
+        return None
+
+
+def get_history():
+    """
+    Return the cached tally history for the current blockchain,
+    refreshed with any blocks added since the last call.
+    """
+    history = get_storage().cached("tally_history", lambda: TallyHistory(get_blockchain()))
+    return history.refresh()
+
+
+def show_results_as_of():
+    """
+    Interactive: print election standings as of a block index or a time.
+    """
+    raw = input("Enter a block index or a UTC time (e.g. 2025-12-07T14:00): ").strip()
+    history = get_history()
+    try:
+        if raw.isdigit():
+            block_index, tallies = history.tallies_at_block(int(raw))
+        else:
+            block_index, tallies = history.tallies_at_time(raw)
+    except ValueError:
+        print("❌ Invalid block index or time.")
+        return
+
+    if block_index is None:
+        print("\nNo blocks existed at that time.")
+        return
+
+    timestamp = history.timestamp_of(block_index) or "archived block"
+    print(f"\n=== RESULTS AS OF BLOCK {block_index} ({timestamp}) ===")
+    for e in _load_elections():
+        counts = tallies.get(e["id"], {})
+        candidates = e.get("candidates", [])
+        total_votes = sum(counts.get(c["id"], 0) for c in candidates)
+        print(f"\nElection ID {e['id']}: {e['title']}")
+        print(f"  Total votes: {total_votes}")
+        for c in candidates:
+            print(f"    - {c['name']}: {counts.get(c['id'], 0)} vote(s)")
@@ -0,0 +1,420 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import storage
+from archive import ArchiveError, archive_election, verify_archives
+from backup import BackupError, create_backup
+from blockchain import format_block, get_blockchain
+from reporting import EXPORT_FORMATS, export_results_bulk, log_action
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Heavy jobs running at once; more wait in the queue.
+DEFAULT_MAX_RUNNING = 2
+# Jobs waiting to run; submitting more is refused.
+DEFAULT_MAX_QUEUED = 16
+# Finished jobs kept in the job table (oldest are dropped).
+MAX_KEPT_JOBS = 200
+# Progress is written to the job table at most this often (seconds).
+PROGRESS_SAVE_INTERVAL = 2.0
+
+
+class JobError(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when an admin cancelled it."""
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+# ---------- job kinds ----------
+
+def _check_verify(params):
+    return {"archives": bool(params.get("archives", False))}
+
+
+def _run_verify(ctx, params):
+    bc = get_blockchain()
+    snapshot = bc.snapshot()
+    valid, message = bc.is_valid(snapshot, progress=ctx.progress)
+    if valid and params["archives"]:
+        valid, message = verify_archives()
+    return {"valid": valid, "message": message, "blocks": len(snapshot)}
+
+
+def _check_dump(params):
+    return {}
+
+
+def _run_dump(ctx, params):
+    """Write the whole chain (as print_blockchain shows it) to a report file."""
+    snapshot = get_blockchain().snapshot()
+    reports_dir = storage.get_storage().reports_dir
+    os.makedirs(reports_dir, exist_ok=True)
+    path = os.path.join(reports_dir, f"blockchain_dump_job_{ctx.job_id}.txt")
+    total = len(snapshot)
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("=== BLOCKCHAIN ===\n")
+            for done, block in enumerate(snapshot):
+                if done % 1000 == 0:
+                    ctx.progress(done, total)
+                f.write("\n".join(format_block(block)))
+                f.write("\n")
+    except JobCancelled:
+        os.remove(path)   # no half-written dumps
+        raise
+    return {"path": path, "blocks": total}
+
+
+def _check_export(params):
+    ids = params.get("election_ids")
+    formats = params.get("formats", list(EXPORT_FORMATS))
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise JobError("election_ids must be a list of integers.")
+    if not isinstance(formats, list) or not formats or set(formats) - set(EXPORT_FORMATS):
+        raise JobError(f"formats must be a list of: {', '.join(EXPORT_FORMATS)}")
+    return {"election_ids": ids, "formats": formats}
+
+
+def _run_export(ctx, params):
+    paths = export_results_bulk(params["election_ids"], tuple(params["formats"]), progress=ctx.progress)
+    return {"paths": paths}
+
+
+def _check_archive(params):
+    eid = params.get("election_id")
+    if not isinstance(eid, int):
+        raise JobError("election_id must be an integer.")
+    return {"election_id": eid}
+
+
+def _run_archive(ctx, params):
+    try:
+        entry = archive_election(params["election_id"])
+    except ArchiveError as exc:
+        raise JobError(str(exc))
+    return {"archive": entry}
+
+
+def _check_backup(params):
+    return {"incremental": bool(params.get("incremental", False))}
+
+
+def _run_backup(ctx, params):
+    try:
+        manifest = create_backup(incremental=params["incremental"], progress=ctx.progress)
+    except BackupError as exc:
+        raise JobError(str(exc))
+    return {"backup": manifest["id"], "kind": manifest["kind"], "new_blocks": manifest["chain"]["new_blocks"]}
+
+
+# kind -> (check params -> normalized params, run(ctx, params) -> result)
+JOB_KINDS = {
+    "verify": (_check_verify, _run_verify),
+    "dump": (_check_dump, _run_dump),
+    "export": (_check_export, _run_export),
+    "archive": (_check_archive, _run_archive),
+    "backup": (_check_backup, _run_backup),
+}
+
+
+# ---------- manager ----------
+
+class JobContext:
+    """Handed to a running job: reports progress and notices cancellation."""
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+
+    def progress(self, done, total=None):
+        """Record progress; raises JobCancelled if the job was cancelled."""
+        self.manager._progress(self.job_id, done, total)
+
+
+class JobManager:
+    """
+    Runs long admin operations (verify, dump, export, archive, backup) on
+    background threads of one storage.
+    Every job is a record in the "jobs" list of the storage, saved on each
+    state change (and every few seconds of progress), so the table
+    survives restarts; jobs that were queued or running when the process
+    stopped are marked failed on the next start.
+    At most `max_running` jobs run at once and `max_queued` wait.
+    Running jobs stop at their next progress report once cancelled.
+    The storage is pinned while jobs are queued or running.
+    """
+
+    def __init__(self, store, max_running=DEFAULT_MAX_RUNNING, max_queued=DEFAULT_MAX_QUEUED):
+        self.store = store
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._queue = deque()
+        self._cancel = set()
+        self._workers = []
+        self._last_saved = 0.0
+        self._closed = False
+
+        interrupted = False
+        for job in store.load_list("jobs"):
+            if job["status"] in (QUEUED, RUNNING):
+                job.update(status=FAILED, finished=_now(), error="Interrupted: the application stopped.")
+                interrupted = True
+            self._jobs[job["id"]] = job
+        if interrupted:
+            self._save_locked()
+
+    # ---------- table ----------
+
+    def _save_locked(self):
+        jobs = sorted(self._jobs.values(), key=lambda j: j["id"])
+        finished = [j for j in jobs if j["status"] in FINISHED]
+        for job in finished[:max(0, len(finished) - MAX_KEPT_JOBS)]:
+            del self._jobs[job["id"]]
+        self.store.save_list("jobs", sorted(self._jobs.values(), key=lambda j: j["id"]))
+        self._last_saved = time.monotonic()
+
+    @staticmethod
+    def _copy(job):
+        return {**job, "params": dict(job["params"]), "progress": dict(job["progress"])}
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return self._copy(job) if job else None
+
+    def list(self, limit=50):
+        """Most recent jobs first."""
+        with self._cond:
+            jobs = sorted(self._jobs.values(), key=lambda j: -j["id"])[:limit]
+            return [self._copy(j) for j in jobs]
+
+    # ---------- control ----------
+
+    def submit(self, kind, params=None, username=None):
+        """Queue a job; returns its record. Raises JobError for bad input or a full queue."""
+        if kind not in JOB_KINDS:
+            raise JobError(f"Unknown job kind '{kind}' (one of: {', '.join(JOB_KINDS)}).")
+        if params is not None and not isinstance(params, dict):
+            raise JobError("params must be an object.")
+        params = JOB_KINDS[kind][0](params or {})
+
+        with self._cond:
+            if len(self._queue) >= self.max_queued:
+                raise JobError("Too many jobs waiting; try again later.")
+            job = {
+                "id": max(self._jobs, default=0) + 1,
+                "kind": kind,
+                "params": params,
+                "status": QUEUED,
+                "submitted_by": username,
+                "created": _now(),
+                "started": None,
+                "finished": None,
+                "progress": {"done": 0, "total": None},
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job["id"]] = job
+            self._queue.append(job["id"])
+            self.store.pin()
+            self._save_locked()
+            if len(self._workers) < self.max_running:
+                worker = threading.Thread(target=self._work, name=f"job-worker-{len(self._workers) + 1}",
+                                          daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._cond.notify()
+            created = self._copy(job)
+        log_action(username, "JOB_SUBMIT", f"job_id={job['id']}, kind={kind}")
+        return created
+
+    def cancel(self, job_id, username=None):
+        """
+        Cancel a job: a queued job is dropped at once, a running one stops
+        at its next progress report. Returns the job record.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise JobError("Job not found.")
+            if job["status"] in FINISHED:
+                raise JobError(f"Job already {job['status']}.")
+            if job["status"] == QUEUED:
+                self._queue.remove(job_id)
+                job.update(status=CANCELLED, finished=_now())
+                self.store.unpin()
+                self._save_locked()
+                self._cond.notify_all()
+            else:
+                self._cancel.add(job_id)
+            result = self._copy(job)
+        log_action(username, "JOB_CANCEL", f"job_id={job_id}")
+        return result
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job has finished (or timeout); returns its record."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in FINISHED:
+                    return self._copy(job) if job else None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return self._copy(job)
+                self._cond.wait(remaining)
+
+    def close(self):
+        """Let idle workers exit (called when the storage is unloaded)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def status(self):
+        with self._cond:
+            running = sum(1 for j in self._jobs.values() if j["status"] == RUNNING)
+            return {"running": running, "queued": len(self._queue),
+                    "max_running": self.max_running, "max_queued": self.max_queued}
+
+    # ---------- workers ----------
+
+    def _progress(self, job_id, done, total):
+        with self._cond:
+            job = self._jobs[job_id]
+            job["progress"] = {"done": done, "total": total}
+            if job_id in self._cancel:
+                raise JobCancelled()
+            if time.monotonic() - self._last_saved >= PROGRESS_SAVE_INTERVAL:
+                self._save_locked()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    if self._closed:
+                        self._workers.remove(threading.current_thread())
+                        return
+                    self._cond.wait()
+                job_id = self._queue.popleft()
+                job = self._jobs[job_id]
+                job.update(status=RUNNING, started=_now())
+                kind, params = job["kind"], dict(job["params"])
+                self._save_locked()
+
+            status, result, error = SUCCEEDED, None, None
+            try:
+                # the job sees the same data as the app that submitted it
+                with storage.use_storage(self.store):
+                    result = JOB_KINDS[kind][1](JobContext(self, job_id), params)
+            except JobCancelled:
+                status = CANCELLED
+            except JobError as exc:
+                status, error = FAILED, str(exc)
+            except Exception as exc:
+                status, error = FAILED, f"{type(exc).__name__}: {exc}"
+
+            with self._cond:
+                self._cancel.discard(job_id)
+                job.update(status=status, result=result, error=error, finished=_now())
+                if status == SUCCEEDED and job["progress"]["total"] is not None:
+                    job["progress"]["done"] = job["progress"]["total"]
+                self._save_locked()
+                self._cond.notify_all()
+            with storage.use_storage(self.store):
+                log_action(job["submitted_by"], "JOB_FINISHED", f"job_id={job_id}, kind={kind}, status={status}")
+            self.store.unpin()
+
+
+def get_job_manager():
+    """The job manager of the current storage (created on first use)."""
+    store = storage.get_storage()
+    return store.cached("job_manager", lambda: JobManager(store))
+
+
+# ---------- console ----------
+
+def _print_job(job):
+    progress = job["progress"]
+    done = f"{progress['done']}/{progress['total']}" if progress["total"] else str(progress["done"])
+    print(f"[{job['id']}] {job['kind']} {job['params'] or ''} - {job['status']} ({done})")
+    if job["error"]:
+        print(f"    Error: {job['error']}")
+    if job["result"]:
+        for key, value in job["result"].items():
+            print(f"    {key}: {value}")
+
+
+def manage_jobs():
+    """Interactive: submit, watch and cancel background jobs."""
+    manager = get_job_manager()
+    while True:
+        print("\n=== BACKGROUND JOBS ===")
+        print("1. Verify blockchain (and archives)")
+        print("2. Dump blockchain to a report file")
+        print("3. Export results for all elections")
+        print("4. Archive a closed election")
+        print("5. Online backup (full)")
+        print("6. Online backup (incremental)")
+        print("7. List jobs")
+        print("8. Cancel a job")
+        print("9. Back")
+        choice = input("Choose an option: ").strip()
+
+        try:
+            if choice == "1":
+                job = manager.submit("verify", {"archives": True})
+            elif choice == "2":
+                job = manager.submit("dump")
+            elif choice == "3":
+                job = manager.submit("export")
+            elif choice == "4":
+                try:
+                    eid = int(input("Election ID to archive: ").strip())
+                except ValueError:
+                    print("❌ Invalid election ID.")
+                    continue
+                job = manager.submit("archive", {"election_id": eid})
+            elif choice in ("5", "6"):
+                job = manager.submit("backup", {"incremental": choice == "6"})
+            elif choice == "7":
+                jobs = manager.list(20)
+                if not jobs:
+                    print("\nNo jobs yet.")
+                for job in jobs:
+                    _print_job(job)
+                continue
+            elif choice == "8":
+                try:
+                    job_id = int(input("Job ID to cancel: ").strip())
+                except ValueError:
+                    print("❌ Invalid job ID.")
+                    continue
+                manager.cancel(job_id)
+                print("✅ Cancellation requested.")
+                continue
+            elif choice == "9":
+                return
+            else:
+                print("Invalid choice, please try again.")
+                continue
+        except JobError as exc:
+            print(f"❌ {exc}")
+            continue
+        print(f"✅ Job {job['id']} queued; see 'List jobs' for its progress.")
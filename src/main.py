@@ -1,3 +1,4 @@
+import argparse
 import sys
 from auth import register_user, login_user
 from election import (
@@ -9,7 +10,20 @@ from election import (
 )
 from voting import cast_vote
 from blockchain import print_blockchain, check_blockchain_integrity
-from reporting import show_results, export_election_results_to_file, show_security_info
+from history import show_results_as_of
+from archive import archive_election_interactive
+from chain_diff import compare_with_backup
+from reconcile import reconcile_votes
+from provisioning import provision_from_file
+from jobs import manage_jobs
+from eligibility import manage_roll_interactive
+from reporting import (
+    show_results,
+    export_election_results_to_file,
+    export_all_results_to_files,
+    show_security_info,
+)
+import storage
 
 def guest_menu():
     """
@@ -59,8 +73,16 @@ def admin_menu(user):
         print("6. Verify blockchain integrity")
         print("7. View election results")
         print("8. Export election results to file")
-        print("9. Show security information")
-        print("10. Logout")
+        print("9. Export results for all elections (TXT/CSV/JSON)")
+        print("10. View results as of a block index or time")
+        print("11. Archive a closed election")
+        print("12. Compare blockchain with a backup copy")
+        print("13. Reconcile votes with the blockchain")
+        print("14. Provision elections from a spec file (JSON/YAML)")
+        print("15. Background jobs (verify / dump / export / archive / backup)")
+        print("16. Voter roll and turnout of an election")
+        print("17. Show security information")
+        print("18. Logout")
 
         choice = input("Choose an option: ").strip()
 
@@ -81,8 +103,24 @@ def admin_menu(user):
         elif choice == "8":
             export_election_results_to_file()
         elif choice == "9":
-            show_security_info()
+            export_all_results_to_files()
         elif choice == "10":
+            show_results_as_of()
+        elif choice == "11":
+            archive_election_interactive()
+        elif choice == "12":
+            compare_with_backup()
+        elif choice == "13":
+            reconcile_votes()
+        elif choice == "14":
+            provision_from_file()
+        elif choice == "15":
+            manage_jobs()
+        elif choice == "16":
+            manage_roll_interactive()
+        elif choice == "17":
+            show_security_info()
+        elif choice == "18":
             print("Logging out...")
             return
         else:
@@ -112,5 +150,32 @@ def voter_menu(user):
             print("Invalid choice, please try again.")
 
 
+def run_console(storage_config=None):
+    """
+    Application factory for the console app: run the menus against the
+    given storage (see storage.from_config: None, a directory path,
+    or ":memory:").
+    """
+    store = storage.from_config(storage_config)
+    with storage.use_storage(store):
+        guest_menu()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Secure Blockchain-based E-Voting System (console)")
+    parser.add_argument("--data-dir", help="keep data/, reports/ and logs/ under this directory")
+    parser.add_argument("--memory", action="store_true", help="keep everything in memory (nothing is saved)")
+    parser.add_argument("--journal-chain", action="store_true",
+                        help="store the blockchain as an append-only journal (data/blockchain.jsonl)")
+    args = parser.parse_args(argv)
+    if args.memory:
+        config = storage.MEMORY
+    elif args.journal_chain:
+        config = storage.JOURNAL_PREFIX + (args.data_dir or "")
+    else:
+        config = args.data_dir
+    run_console(config)
+
+
 if __name__ == "__main__":
-    guest_menu()
+    main()
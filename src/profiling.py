@@ -0,0 +1,235 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+# Stack samples are taken from profiled request threads this often.
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Frames deeper than this are cut from collapsed stacks.
+MAX_STACK_DEPTH = 64
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class RouteProfile:
+    """Aggregated profile of one route: call stats and timings."""
+
+    def __init__(self):
+        self.requests = 0
+        self.total_seconds = 0.0
+        self.stats = None           # pstats.Stats, merged over requests
+
+    def add_profile(self, profile):
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+    def top_functions(self, limit=20):
+        """The `limit` functions with the highest cumulative time, as text."""
+        if self.stats is None:
+            return ""
+        out = io.StringIO()
+        self.stats.stream = out
+        self.stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def summary(self, limit=20):
+        return {
+            "requests": self.requests,
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "avg_ms": round(self.total_seconds * 1000 / self.requests, 3) if self.requests else None,
+            "top_functions": self.top_functions(limit),
+        }
+
+
+class Profiler:
+    """
+    On-demand request profiler for the API.
+    Off by default; while off, the request hooks only check `active`.
+    When started, a sampled fraction of requests (optionally only for a
+    time window) is run under cProfile, and a background thread samples
+    the call stacks of the profiled request threads for flame graphs.
+    Results are aggregated per route.
+    With `memory`, tracemalloc reports allocation growth since profiling
+    started. tracemalloc sees the whole process (concurrent requests,
+    jobs, the sampler), so those figures are process-wide, not per route.
+    """
+
+    def __init__(self, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        self.active = False
+        self.sample_rate = 1.0
+        self.deadline = None
+        self.memory = False
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._stacks = {}           # collapsed stack -> samples
+        self._threads = {}          # thread id -> route being profiled
+        self._sampler = None
+        self._started_tracemalloc = False
+        self._baseline = None       # tracemalloc snapshot allocations are compared to
+        self._final_diff = None     # last comparison, kept once tracing stops
+
+    # ---------- control ----------
+
+    def start(self, sample_rate=1.0, duration=None, memory=False):
+        """Profile `sample_rate` of requests, for `duration` seconds (None: until stop())."""
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        if duration is not None and duration <= 0:
+            raise ValueError("duration must be positive")
+        with self._lock:
+            self.sample_rate = sample_rate
+            self.deadline = time.monotonic() + duration if duration else None
+            self.memory = memory
+            if memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            if memory:
+                self._baseline, self._final_diff = tracemalloc.take_snapshot(), None
+            self.active = True
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_stacks, name="profiler-sampler", daemon=True)
+                self._sampler.start()
+
+    def stop(self):
+        with self._lock:
+            self.active = False
+            sampler, self._sampler = self._sampler, None
+            if self._baseline is not None and tracemalloc.is_tracing():
+                self._final_diff = self._compare_locked()
+            self._baseline = None
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            self.memory = False
+        if sampler is not None and sampler is not threading.current_thread():
+            sampler.join()
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+            self._stacks = {}
+            self._final_diff = None
+            if self._baseline is not None and tracemalloc.is_tracing():
+                self._baseline = tracemalloc.take_snapshot()
+
+    # ---------- request hooks ----------
+
+    def begin(self, route):
+        """
+        Called at the start of a request while active. Returns a context
+        for end(), or None if this request is not sampled.
+        """
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.stop()
+            return None
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:   # another profiler owns this interpreter (3.12+)
+            return None
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = route
+        return route, profile, thread_id, time.perf_counter()
+
+    def end(self, ctx):
+        route, profile, thread_id, started = ctx
+        profile.disable()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            rp = self._routes.setdefault(route, RouteProfile())
+            rp.requests += 1
+            rp.total_seconds += elapsed
+            rp.add_profile(profile)
+
+    # ---------- stack sampling ----------
+
+    def _sample_stacks(self):
+        me = threading.get_ident()
+        while self.active:
+            time.sleep(self.sample_interval)
+            with self._lock:
+                threads = dict(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            samples = []
+            for thread_id, route in threads.items():
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(route)
+                samples.append(";".join(reversed(stack)))
+            with self._lock:
+                for key in samples:
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+
+    # ---------- results ----------
+
+    def status(self):
+        remaining = None
+        if self.deadline is not None:
+            remaining = max(0.0, round(self.deadline - time.monotonic(), 1))
+        return {
+            "active": self.active,
+            "sample_rate": self.sample_rate,
+            "seconds_left": remaining,
+            "memory": self.memory,
+        }
+
+    def summary(self, limit=20):
+        """Per-route aggregates (see RouteProfile.summary)."""
+        with self._lock:
+            return {route: rp.summary(limit) for route, rp in sorted(self._routes.items())}
+
+    def _compare_locked(self):
+        return tracemalloc.take_snapshot().compare_to(self._baseline, "lineno")
+
+    def allocations(self, limit=20):
+        """
+        Process-wide allocation growth since profiling started (or was
+        reset), by source line: the `limit` sites that grew the most.
+        None unless memory profiling was asked for.
+        """
+        with self._lock:
+            if self._baseline is not None and tracemalloc.is_tracing():
+                diff = self._compare_locked()
+            else:
+                diff = self._final_diff
+        if diff is None:
+            return None
+        top = sorted((stat for stat in diff if stat.size_diff > 0), key=lambda stat: -stat.size_diff)[:limit]
+        return [
+            {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "bytes": stat.size_diff, "count": stat.count_diff}
+            for stat in top
+        ]
+
+    def collapsed_stacks(self):
+        """
+        Stack samples in collapsed format ("route;frame;frame count" per
+        line), the input of flamegraph.pl, speedscope and similar tools.
+        """
+        with self._lock:
+            items = sorted(self._stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+
+try:
+    import yaml
+except ImportError:  # JSON specs only
+    yaml = None
+
+import storage
+from election import _load_elections, _next_election_id, _save_elections
+from ranked import ELECTION_TYPES, SINGLE
+from reporting import log_action
+
+# Syntax errors of a spec file (json.JSONDecodeError is a ValueError).
+SPEC_SYNTAX_ERRORS = (ValueError, yaml.YAMLError) if yaml is not None else (ValueError,)
+
+# Validation stops collecting after this many problems.
+MAX_REPORTED_ERRORS = 50
+
+
+class ProvisioningError(Exception):
+    """The spec is invalid; .errors lists every problem found."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} problem(s) in the provisioning spec")
+        self.errors = errors
+
+
+def load_spec(path):
+    """Read a provisioning spec from a .json or .yaml/.yml file."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ProvisioningError(["YAML specs need PyYAML (pip install pyyaml); use JSON instead."])
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def validate_spec(spec):
+    """
+    Check a spec of the form
+        {"elections": [{"title": ..., "description": ..., "type": "single"|"ranked",
+                        "active": false, "candidates": ["Alice", {"name": "Bob"}]}, ...]}
+    (a bare list of elections is accepted too).
+    Returns the list of elections normalized to
+    (title, description, type, active, [candidate names]) tuples;
+    raises ProvisioningError with all problems found.
+    """
+    items = spec.get("elections") if isinstance(spec, dict) else spec
+    if not isinstance(items, list):
+        raise ProvisioningError(["The spec must be a list of elections or {\"elections\": [...]}."])
+
+    errors = []
+    normalized = []
+    titles = set()
+    for i, item in enumerate(items):
+        where = f"elections[{i}]"
+        if not isinstance(item, dict):
+            errors.append(f"{where}: must be an object")
+            continue
+        title = item.get("title")
+        if not isinstance(title, str) or not title.strip():
+            errors.append(f"{where}.title: required")
+            title = ""
+        title = title.strip()
+        if title and title in titles:
+            errors.append(f"{where}.title: duplicate title '{title}'")
+        titles.add(title)
+
+        kind = item.get("type", SINGLE)
+        if kind not in ELECTION_TYPES:
+            errors.append(f"{where}.type: must be one of {', '.join(ELECTION_TYPES)}")
+        active = item.get("active", False)
+        if not isinstance(active, bool):
+            errors.append(f"{where}.active: must be true or false")
+
+        names = []
+        seen = set()
+        candidates = item.get("candidates", [])
+        if not isinstance(candidates, list):
+            errors.append(f"{where}.candidates: must be a list")
+            candidates = []
+        for j, c in enumerate(candidates):
+            name = c.get("name") if isinstance(c, dict) else c
+            if not isinstance(name, str) or not name.strip():
+                errors.append(f"{where}.candidates[{j}]: name required")
+                continue
+            name = name.strip()
+            if name in seen:
+                errors.append(f"{where}.candidates[{j}]: duplicate candidate '{name}'")
+            seen.add(name)
+            names.append(name)
+        if active and not names:
+            errors.append(f"{where}: an active election needs candidates")
+
+        normalized.append((title, str(item.get("description") or "").strip(), kind, active, names))
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            break
+
+    if errors:
+        raise ProvisioningError(errors[:MAX_REPORTED_ERRORS])
+    return normalized
+
+
+def provision_elections(spec, username=None):
+    """
+    Create every election of a spec with its candidates.
+    The spec is fully validated first; ids are assigned in one pass and
+    elections.json is written once, so nothing is created if any entry
+    is invalid. Runs in the elections write section, like the other
+    election writes. Returns the created elections.
+    """
+    normalized = validate_spec(spec)
+    with storage.get_storage().write_section("elections"):
+        elections = _load_elections()
+        next_id = _next_election_id(elections)
+        created = []
+        for offset, (title, description, kind, active, names) in enumerate(normalized):
+            created.append({
+                "id": next_id + offset,
+                "title": title,
+                "description": description,
+                "type": kind,
+                "is_active": active,
+                "candidates": [{"id": j, "name": name} for j, name in enumerate(names, start=1)],
+            })
+        elections.extend(created)
+        _save_elections(elections)
+
+    if created:
+        log_action(username, "PROVISION_ELECTIONS",
+                   f"count={len(created)}, ids={created[0]['id']}..{created[-1]['id']}")
+    return created
+
+
+def _provision_file(path, username=None):
+    """Provision the spec at `path`; print what is wrong and return None if it can't be."""
+    try:
+        return provision_elections(load_spec(path), username)
+    except OSError as exc:
+        print(f"❌ Could not read {path}: {exc}")
+    except SPEC_SYNTAX_ERRORS as exc:
+        print(f"❌ Invalid spec file: {exc}")
+    except ProvisioningError as exc:
+        print(f"❌ {exc}:")
+        for problem in exc.errors:
+            print(f"   - {problem}")
+    return None
+
+
+def provision_from_file():
+    """Interactive: create elections from a JSON/YAML spec file."""
+    path = input("Path of the provisioning spec (.json / .yaml): ").strip()
+    created = _provision_file(path)
+    if created is None:
+        return
+    candidates = sum(len(e["candidates"]) for e in created)
+    print(f"✅ Created {len(created)} election(s) with {candidates} candidate(s).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create many elections from a JSON/YAML spec.")
+    parser.add_argument("spec", help="spec file (.json, or .yaml with PyYAML installed)")
+    parser.add_argument("--data-dir", help="project directory holding data/ (default: this project)")
+    args = parser.parse_args(argv)
+
+    with storage.use_storage(storage.from_config(args.data_dir)):
+        created = _provision_file(args.spec, username="cli")
+    if created is None:
+        return 1
+    print(f"✅ Created {len(created)} election(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+import threading
+from array import array
+from collections import Counter
+
+from blockchain import get_blockchain
+from storage import get_storage
+
+SINGLE = "single"
+RANKED = "ranked"
+ELECTION_TYPES = (SINGLE, RANKED)
+
+
+def election_type(election):
+    return election.get("type", SINGLE)
+
+
+def is_ranked(election):
+    return election_type(election) == RANKED
+
+
+def parse_ranking(raw, election):
+    """
+    Validate a ranking (list of candidate ids, or "2,1,3") for an election.
+    Returns the list of ints; raises ValueError with a readable message.
+    """
+    if isinstance(raw, str):
+        raw = [part for part in raw.replace(" ", "").split(",") if part]
+    try:
+        ranking = [int(cid) for cid in raw]
+    except (TypeError, ValueError):
+        raise ValueError("Ranking must be a list of candidate IDs.")
+    if not ranking:
+        raise ValueError("Rank at least one candidate.")
+    if len(set(ranking)) != len(ranking):
+        raise ValueError("A candidate can only be ranked once.")
+    valid = {c["id"] for c in election.get("candidates", [])}
+    unknown = [cid for cid in ranking if cid not in valid]
+    if unknown:
+        raise ValueError(f"No such candidate(s) in this election: {unknown}")
+    return ranking
+
+
+class RankedBallots:
+    """
+    Ranked ballots of one election, grouped by identical ranking.
+    Each distinct ranking is stored once, as candidate positions
+    (0 .. k-1) in one flat integer array, with a count of how many
+    ballots carry it. Millions of ballots usually collapse to a few
+    thousand groups.
+    """
+
+    def __init__(self, candidate_ids):
+        self.candidate_ids = list(candidate_ids)
+        self._position = {cid: i for i, cid in enumerate(self.candidate_ids)}
+        self._groups = Counter()   # ranking tuple (candidate ids) -> ballot count
+
+    def add(self, ranking, count=1):
+        self._groups[tuple(ranking)] += count
+
+    def add_many(self, rankings):
+        self._groups.update(map(tuple, rankings))
+
+    def __len__(self):
+        """Number of ballots."""
+        return sum(self._groups.values())
+
+    @property
+    def group_count(self):
+        return len(self._groups)
+
+    def packed(self):
+        """
+        Return (flat, starts, ends, counts): group g ranks the candidates
+        at positions flat[starts[g]:ends[g]] and stands for counts[g] ballots.
+        Candidates unknown to the election are skipped.
+        """
+        flat, starts, ends, counts = array("i"), array("q"), array("q"), array("q")
+        for ranking, count in self._groups.items():
+            starts.append(len(flat))
+            flat.extend(self._position[cid] for cid in ranking if cid in self._position)
+            ends.append(len(flat))
+            counts.append(count)
+        return flat, starts, ends, counts
+
+
+def instant_runoff(ballots):
+    """
+    Tabulate ranked ballots by instant runoff.
+    Each round the candidate with the fewest votes is eliminated and only
+    the ballot groups currently counting for that candidate move to their
+    next continuing choice; the other groups are not looked at again.
+    Ties for last place go to the candidate with fewer votes in the most
+    recent round where they differed, then to the one listed last.
+    Returns {"winner": candidate_id or None, "rounds": [...]}, where each
+    round has the counts, the exhausted ballots, and the eliminated
+    candidate with where its votes went.
+    """
+    candidate_ids = ballots.candidate_ids
+    k = len(candidate_ids)
+    flat, starts, ends, counts = ballots.packed()
+
+    pos = array("q", starts)
+    piles = [[] for _ in range(k)]   # candidate -> groups counting for it
+    totals = [0] * k
+    exhausted = 0
+    for g in range(len(counts)):
+        if starts[g] < ends[g]:
+            top = flat[starts[g]]
+            piles[top].append(g)
+            totals[top] += counts[g]
+        else:
+            exhausted += counts[g]
+
+    eliminated = [False] * k
+    history = []   # totals of earlier rounds, for tie-breaks
+    rounds = []
+    winner = None
+    while True:
+        continuing = [i for i in range(k) if not eliminated[i]]
+        if not continuing:
+            break
+        active = sum(totals[i] for i in continuing)
+        entry = {
+            "round": len(rounds) + 1,
+            "counts": {candidate_ids[i]: totals[i] for i in continuing},
+            "exhausted": exhausted,
+        }
+        rounds.append(entry)
+
+        leader = max(continuing, key=lambda i: totals[i])
+        if active and (totals[leader] * 2 > active or len(continuing) == 1):
+            winner = candidate_ids[leader]
+            break
+        if not active:
+            break
+
+        loser = min(continuing, key=lambda i: (totals[i], [h[i] for h in reversed(history)], -i))
+        history.append(list(totals))
+        eliminated[loser] = True
+
+        transfers = {}
+        for g in piles[loser]:
+            p = pos[g] + 1
+            end = ends[g]
+            while p < end and eliminated[flat[p]]:
+                p += 1
+            pos[g] = p
+            if p < end:
+                nxt = flat[p]
+                piles[nxt].append(g)
+                totals[nxt] += counts[g]
+                transfers[candidate_ids[nxt]] = transfers.get(candidate_ids[nxt], 0) + counts[g]
+            else:
+                exhausted += counts[g]
+                transfers["exhausted"] = transfers.get("exhausted", 0) + counts[g]
+        piles[loser] = []
+        totals[loser] = 0
+        entry["eliminated"] = candidate_ids[loser]
+        entry["transfers"] = transfers
+
+    return {"winner": winner, "rounds": rounds}
+
+
+def _ranking(block):
+    return tuple(block.ranking or (block.candidate_id,))
+
+
+class ChainBallots:
+    """
+    Ranked ballots of every election, read from the blockchain and grouped
+    by ranking. Like the columnar ledger, it only reads the blocks appended
+    since the last call, and it rebuilds when the chain was rewritten
+    (e.g. by archiving). An archived election's ballots are read from its
+    segment once. Runoff results are cached until the election's ballots
+    or candidates change.
+    """
+
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self._lock = threading.Lock()
+        self._archived = {}   # election id -> (segment digest, Counter)
+        self._results = {}    # election id -> (cache key, result)
+        self._reset()
+
+    def _reset(self):
+        self._groups = {}     # election id -> Counter(ranking tuple -> ballots)
+        self._seen = 0
+        self._last_hash = None
+
+    def _refresh_locked(self):
+        chain = self.blockchain.snapshot()
+        seen = self._seen
+        if seen and (len(chain) < seen or chain[seen - 1].hash != self._last_hash):
+            self._reset()
+            seen = 0
+        for b in chain[seen:]:
+            if b.election_id != -1:
+                self._groups.setdefault(b.election_id, Counter())[_ranking(b)] += 1
+        self._seen, self._last_hash = chain.key
+
+    def _archived_locked(self, election_id):
+        from archive import get_archive_entry, load_segment   # archive imports this module
+        entry = get_archive_entry(election_id)
+        if entry is None:
+            return None, Counter()
+        cached = self._archived.get(election_id)
+        if cached is None or cached[0] != entry["digest"]:
+            cached = self._archived[election_id] = (entry["digest"], Counter(
+                _ranking(b) for b in load_segment(election_id, entry)))
+        return entry["digest"], cached[1]
+
+    def _ballots_locked(self, election):
+        eid = election["id"]
+        digest, archived = self._archived_locked(eid) if election.get("archived") else (None, Counter())
+        ballots = RankedBallots(c["id"] for c in election.get("candidates", []))
+        for groups in (archived, self._groups.get(eid, ())):
+            for ranking, count in groups.items():
+                ballots.add(ranking, count)
+        return ballots, (self._seen, self._last_hash, digest)
+
+    def ballots(self, election):
+        """RankedBallots of one election as the chain is now (archived part included)."""
+        with self._lock:
+            self._refresh_locked()
+            return self._ballots_locked(election)[0]
+
+    def tabulate(self, election):
+        """instant_runoff() of one election, recomputed only after it changed."""
+        with self._lock:
+            self._refresh_locked()
+            ballots, state = self._ballots_locked(election)
+            key = (state, tuple(ballots.candidate_ids))
+            cached = self._results.get(election["id"])
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        result = instant_runoff(ballots)
+        with self._lock:
+            self._results[election["id"]] = (key, result)
+        return result
+
+
+def get_chain_ballots():
+    """The ChainBallots of the current storage (created on first use)."""
+    return get_storage().cached("chain_ballots", lambda: ChainBallots(get_blockchain()))
+
+
+def ballots_for_election(election, votes=None):
+    """
+    Group the ranked ballots of one election: from `votes` (vote records)
+    if given, else from the blockchain (see ChainBallots).
+    """
+    if votes is None:
+        return get_chain_ballots().ballots(election)
+    ballots = RankedBallots(c["id"] for c in election.get("candidates", []))
+    eid = election["id"]
+    ballots.add_many(v.get("ranking") or [v["candidate_id"]] for v in votes if v["election_id"] == eid)
+    return ballots
+
+
+def tabulate_election(election, votes=None):
+    """Instant-runoff result of a ranked election (see instant_runoff)."""
+    if votes is None:
+        return get_chain_ballots().tabulate(election)
+    return instant_runoff(ballots_for_election(election, votes))
+
+
+def print_irv_rounds(election, result):
+    """Print the round-by-round tabulation of a ranked election."""
+    names = {c["id"]: c["name"] for c in election.get("candidates", [])}
+    for r in result["rounds"]:
+        print(f"  Round {r['round']}:")
+        for cid, n in sorted(r["counts"].items(), key=lambda item: -item[1]):
+            print(f"    - {names.get(cid, cid)}: {n} vote(s)")
+        if r["exhausted"]:
+            print(f"    (exhausted: {r['exhausted']})")
+        if "eliminated" in r:
+            print(f"    Eliminated: {names.get(r['eliminated'], r['eliminated'])}")
+    if result["winner"] is not None:
+        print(f"  Winner: {names.get(result['winner'], result['winner'])}")
+    else:
+        print("  No winner (no ballots).")
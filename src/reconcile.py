@@ -0,0 +1,190 @@
+import threading
+
+from archive import _load_manifest, load_segment
+from blockchain import Blockchain, get_blockchain
+from storage import get_storage
+from voting import _load_votes
+
+
+def _vote_key(vote):
+    return Blockchain.hash_username(vote["voter_username"]), vote["election_id"]
+
+
+def _block_key(block):
+    return block.voter_hash, block.election_id
+
+
+class Reconciler:
+    """
+    Checks that votes.json and the blockchain record the same ballots.
+    Both sources are joined on (hash of the voter's username, election id)
+    through a hashed index of the not-yet-matched entries of each side:
+    a ballot leaves the index as soon as its other half shows up, so the
+    index only holds the discrepancies (and ballots in flight). The keys
+    of matched ballots are still kept, one per ballot, to catch a second
+    ballot of the same voter: memory grows with the number of votes.
+    State is kept between runs and only new blocks are processed; new
+    votes are too, but votes.json is a plain JSON file, so any change to
+    it means parsing it whole again (as saving a vote already does).
+    The state is rebuilt when either source changes other than by
+    appending (e.g. an election was archived); edits in place to
+    already-checked votes are only seen by a full run (refresh(full=True)).
+    """
+
+    def __init__(self, blockchain=None):
+        self.blockchain = blockchain
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pending_votes = {}    # key -> vote without a block yet
+        self._pending_blocks = {}   # key -> block without a vote yet
+        self._mismatched = {}       # key -> (vote, block) with different candidates
+        self._matched = set()       # keys of matched ballots (duplicate check)
+        self._duplicates = []
+        self._votes_seen = 0
+        self._last_vote_id = None
+        self._votes_version = None
+        self._blocks_seen = 0
+        self._last_hash = None
+
+    def _known(self, key):
+        return key in self._matched or key in self._mismatched
+
+    def _add_vote(self, vote):
+        key = _vote_key(vote)
+        if self._known(key) or key in self._pending_votes:
+            self._duplicates.append({"source": "votes", "vote_id": vote["id"], "election_id": vote["election_id"]})
+            return
+        block = self._pending_blocks.pop(key, None)
+        if block is None:
+            self._pending_votes[key] = vote
+        elif block.candidate_id != vote["candidate_id"] or block.ranking != vote.get("ranking"):
+            self._mismatched[key] = (vote, block)
+        else:
+            self._matched.add(key)
+
+    def _add_block(self, block):
+        if block.election_id == -1:
+            return  # genesis
+        key = _block_key(block)
+        if self._known(key) or key in self._pending_blocks:
+            self._duplicates.append({"source": "blockchain", "block_index": block.index,
+                                     "election_id": block.election_id})
+            return
+        vote = self._pending_votes.pop(key, None)
+        if vote is None:
+            self._pending_blocks[key] = block
+        elif vote["candidate_id"] != block.candidate_id or vote.get("ranking") != block.ranking:
+            self._mismatched[key] = (vote, block)
+        else:
+            self._matched.add(key)
+
+    def refresh(self, full=False):
+        """Process votes and blocks added since the last refresh (or all of them)."""
+        with self._lock:
+            if full:
+                self._reset()
+            chain = self.blockchain.snapshot()
+            version = get_storage().version("votes")
+            votes = None
+            if version is None or version != self._votes_version:
+                votes = _load_votes()
+
+            seen, n = self._blocks_seen, self._votes_seen
+            chain_rewritten = seen and (len(chain) < seen or chain[seen - 1].hash != self._last_hash)
+            votes_rewritten = votes is not None and n and (
+                len(votes) < n or votes[n - 1]["id"] != self._last_vote_id)
+            if chain_rewritten or votes_rewritten:
+                self._reset()
+                if votes is None:
+                    votes = _load_votes()
+
+            if self._blocks_seen == 0:
+                # blocks of archived elections are no longer in the hot chain
+                for entry in _load_manifest():
+                    for block in load_segment(entry["election_id"], entry):
+                        self._add_block(block)
+            for block in chain[self._blocks_seen:]:
+                self._add_block(block)
+            self._blocks_seen = len(chain)
+            if chain:
+                self._last_hash = chain[-1].hash
+
+            if votes is not None:
+                for vote in votes[self._votes_seen:]:
+                    self._add_vote(vote)
+                self._votes_seen = len(votes)
+                if votes:
+                    self._last_vote_id = votes[-1]["id"]
+                self._votes_version = version
+        return self
+
+    def report(self):
+        """
+        Return the discrepancies found so far:
+          - missing_on_chain: votes without a block
+          - missing_in_votes: blocks without a vote
+          - mismatched: both exist but name different candidates (or rankings)
+          - duplicates: a second ballot for the same voter and election
+        """
+        with self._lock:
+            missing_on_chain = [
+                {"vote_id": v["id"], "election_id": v["election_id"], "candidate_id": v["candidate_id"]}
+                for v in self._pending_votes.values()
+            ]
+            missing_in_votes = [
+                {"block_index": b.index, "election_id": b.election_id, "candidate_id": b.candidate_id}
+                for b in self._pending_blocks.values()
+            ]
+            mismatched = [
+                {"vote_id": v["id"], "block_index": b.index, "election_id": b.election_id,
+                 "vote_candidate_id": v["candidate_id"], "block_candidate_id": b.candidate_id}
+                for v, b in self._mismatched.values()
+            ]
+            duplicates = list(self._duplicates)
+            return {
+                "consistent": not (missing_on_chain or missing_in_votes or mismatched or duplicates),
+                "votes": self._votes_seen,
+                "matched": len(self._matched),
+                "missing_on_chain": missing_on_chain,
+                "missing_in_votes": missing_in_votes,
+                "mismatched": mismatched,
+                "duplicates": duplicates,
+            }
+
+
+def get_reconciler(full=False):
+    """
+    Return the reconciler of the current storage, caught up with any
+    votes and blocks added since the last call (or re-run from scratch).
+    """
+    reconciler = get_storage().cached("reconciler", lambda: Reconciler(get_blockchain()))
+    return reconciler.refresh(full=full)
+
+
+def reconcile_votes():
+    """
+    Interactive: compare votes.json with the blockchain and print the
+    discrepancies. Returns the report.
+    """
+    report = get_reconciler(full=True).report()
+    print("\n=== VOTES / BLOCKCHAIN RECONCILIATION ===")
+    print(f"Votes checked : {report['votes']}")
+    print(f"Matched       : {report['matched']}")
+    if report["consistent"]:
+        print("✅ votes.json and the blockchain agree.")
+        return report
+
+    print("❌ Discrepancies found:")
+    for v in report["missing_on_chain"]:
+        print(f"  - vote #{v['vote_id']} (election {v['election_id']}) has no block")
+    for b in report["missing_in_votes"]:
+        print(f"  - block {b['block_index']} (election {b['election_id']}) has no vote in votes.json")
+    for m in report["mismatched"]:
+        print(f"  - vote #{m['vote_id']} / block {m['block_index']} (election {m['election_id']}): "
+              f"candidate {m['vote_candidate_id']} vs {m['block_candidate_id']}")
+    for d in report["duplicates"]:
+        where = f"vote #{d['vote_id']}" if d["source"] == "votes" else f"block {d['block_index']}"
+        print(f"  - duplicate ballot in {d['source']}: {where} (election {d['election_id']})")
+    return report
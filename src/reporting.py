@@ -1,39 +1,26 @@
+import csv
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-# Base directory (project root)
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-ELECTIONS_FILE = os.path.join(BASE_DIR, "data", "elections.json")
-VOTES_FILE = os.path.join(BASE_DIR, "data", "votes.json")
-
-REPORTS_DIR = os.path.join(BASE_DIR, "reports")
-LOGS_DIR = os.path.join(BASE_DIR, "logs")
-LOG_FILE = os.path.join(LOGS_DIR, "actions.log")
+from ranked import is_ranked, print_irv_rounds, tabulate_election
+from storage import get_storage
 
 
 # ---------- Helpers for reading data ----------
 
-def _load_json_list(path):
-    if not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            return []
-        except json.JSONDecodeError:
-            return []
+def _load_json_list(name):
+    # a damaged file raises StorageCorruptedError rather than reading as []
+    return get_storage().load_list(name)
 
 
 def _load_elections():
-    return _load_json_list(ELECTIONS_FILE)
+    return _load_json_list("elections")
 
 
 def _load_votes():
-    return _load_json_list(VOTES_FILE)
+    return _load_json_list("votes")
 
 
 # ---------- Logging ----------
@@ -43,13 +30,10 @@ def log_action(username, action, details=""):
     Append a simple log entry to logs/actions.log.
     Format: [timestamp] username | ACTION | details
     """
-    os.makedirs(LOGS_DIR, exist_ok=True)
     ts = datetime.utcnow().isoformat()
     user_display = username if username is not None else "-"
     line = f"[{ts}] {user_display} | {action} | {details}\n"
-
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(line)
+    get_storage().append_log(line)
 
 
 # ---------- Results / Reporting ----------
@@ -67,6 +51,24 @@ def _count_votes_for_election(election_id):
     return counts
 
 
+def _count_votes_all_elections(election_ids=None):
+    """
+    Return a dict: {election_id: {candidate_id: count}} for many elections
+    in a single pass over votes.json.
+    If election_ids is given, only those elections are counted.
+    """
+    wanted = set(election_ids) if election_ids is not None else None
+    tallies = {}
+    for v in _load_votes():
+        eid = v["election_id"]
+        if wanted is not None and eid not in wanted:
+            continue
+        counts = tallies.setdefault(eid, {})
+        cid = v["candidate_id"]
+        counts[cid] = counts.get(cid, 0) + 1
+    return tallies
+
+
 def show_results():
     """
     Print vote results for all elections.
@@ -89,6 +91,10 @@ def show_results():
 
         total_votes = sum(counts.get(c["id"], 0) for c in candidates)
         print(f"  Total votes: {total_votes}")
+        if is_ranked(e):
+            print("  Instant-runoff tabulation:")
+            print_irv_rounds(e, tabulate_election(e))
+            continue
         print("  Candidates:")
         for c in candidates:
             c_votes = counts.get(c["id"], 0)
@@ -116,12 +122,25 @@ def export_election_results_to_file():
         return
 
     counts = _count_votes_for_election(election_id)
-    candidates = election.get("candidates", [])
 
-    os.makedirs(REPORTS_DIR, exist_ok=True)
+    reports_dir = get_storage().reports_dir
+    os.makedirs(reports_dir, exist_ok=True)
     filename = f"election_{election_id}_results.txt"
-    path = os.path.join(REPORTS_DIR, filename)
+    path = os.path.join(reports_dir, filename)
+    _write_text_report(election, counts, path)
+
+    print(f"\n✅ Results exported to: {path}")
+    log_action(None, "EXPORT_RESULTS", f"election_id={election_id}, file={filename}")
+
 
+# ---------- Bulk export ----------
+
+EXPORT_FORMATS = ("txt", "csv", "json")
+
+
+def _write_text_report(election, counts, path):
+    """Write one election's results in the plain text report format."""
+    candidates = election.get("candidates", [])
     total_votes = sum(counts.get(c["id"], 0) for c in candidates)
 
     with open(path, "w", encoding="utf-8") as f:
@@ -133,9 +152,120 @@ def export_election_results_to_file():
         for c in candidates:
             c_votes = counts.get(c["id"], 0)
             f.write(f"  - {c['name']}: {c_votes} vote(s)\n")
+    return path
 
-    print(f"\n✅ Results exported to: {path}")
-    log_action(None, "EXPORT_RESULTS", f"election_id={election_id}, file={filename}")
+
+def _result_rows(elections, tallies):
+    """Flatten tallies into one row per (election, candidate)."""
+    for e in elections:
+        counts = tallies.get(e["id"], {})
+        for c in e.get("candidates", []):
+            yield {
+                "election_id": e["id"],
+                "election_title": e["title"],
+                "candidate_id": c["id"],
+                "candidate_name": c["name"],
+                "votes": counts.get(c["id"], 0),
+            }
+
+
+def _write_csv_report(elections, tallies, path):
+    """Write results of many elections as one CSV file."""
+    fields = ["election_id", "election_title", "candidate_id", "candidate_name", "votes"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(_result_rows(elections, tallies))
+    return path
+
+
+def _write_json_report(elections, tallies, path):
+    """Write results of many elections as one JSON file."""
+    out = []
+    for e in elections:
+        counts = tallies.get(e["id"], {})
+        candidates = [
+            {"id": c["id"], "name": c["name"], "votes": counts.get(c["id"], 0)}
+            for c in e.get("candidates", [])
+        ]
+        out.append({
+            "id": e["id"],
+            "title": e["title"],
+            "description": e["description"],
+            "is_active": e.get("is_active", False),
+            "total_votes": sum(c["votes"] for c in candidates),
+            "candidates": candidates,
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    return path
+
+
+def export_results_bulk(election_ids=None, formats=EXPORT_FORMATS, max_workers=8, progress=None):
+    """
+    Export results of many elections (all of them if election_ids is None).
+    Votes are counted once for all elections, then the reports are written
+    in parallel to the reports directory:
+      - txt : one reports/election_<id>_results.txt per election
+      - csv : reports/election_results.csv with one row per candidate
+      - json: reports/election_results.json
+    progress(done, total) is called as files are written, if given.
+    Returns the list of written file paths.
+    """
+    unknown = set(formats) - set(EXPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(sorted(unknown))}")
+
+    elections = _load_elections()
+    if election_ids is not None:
+        wanted = set(election_ids)
+        elections = [e for e in elections if e["id"] in wanted]
+    tallies = _count_votes_all_elections([e["id"] for e in elections])
+
+    reports_dir = get_storage().reports_dir
+    os.makedirs(reports_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        if "txt" in formats:
+            for e in elections:
+                path = os.path.join(reports_dir, f"election_{e['id']}_results.txt")
+                futures.append(pool.submit(_write_text_report, e, tallies.get(e["id"], {}), path))
+        if "csv" in formats:
+            path = os.path.join(reports_dir, "election_results.csv")
+            futures.append(pool.submit(_write_csv_report, elections, tallies, path))
+        if "json" in formats:
+            path = os.path.join(reports_dir, "election_results.json")
+            futures.append(pool.submit(_write_json_report, elections, tallies, path))
+        if progress is not None:
+            for done, _ in enumerate(as_completed(futures), start=1):
+                progress(done, len(futures))
+        paths = [f.result() for f in futures]
+
+    log_action(None, "EXPORT_RESULTS_BULK",
+               f"elections={len(elections)}, formats={','.join(formats)}, files={len(paths)}")
+    return paths
+
+
+def export_all_results_to_files():
+    """
+    Interactive: export results of all (or selected) elections as TXT, CSV and JSON.
+    """
+    elections = _load_elections()
+    if not elections:
+        print("\nNo elections configured yet.")
+        return
+
+    raw = input("Enter election IDs separated by commas (leave empty for all): ").strip()
+    election_ids = None
+    if raw:
+        try:
+            election_ids = [int(x) for x in raw.split(",") if x.strip()]
+        except ValueError:
+            print("❌ Invalid election ID list.")
+            return
+
+    paths = export_results_bulk(election_ids)
+    print(f"\n✅ Exported {len(paths)} file(s) to: {get_storage().reports_dir}")
 
 
 # ---------- Security Info ----------
@@ -0,0 +1,203 @@
+import gzip
+import json
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # stdlib json is used instead
+    orjson = None
+
+# Responses smaller than this are sent uncompressed: the gzip header and
+# the CPU time are not worth it for a few hundred bytes.
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+
+
+# ---------- JSON encoding ----------
+
+def dumps(obj):
+    """Encode obj as compact UTF-8 JSON bytes (orjson if installed)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # something orjson can't encode; let json raise or handle it
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider used by jsonify(): orjson when available,
+    compact stdlib json otherwise.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+class SerializedCache:
+    """
+    Small thread-safe LRU of already-encoded bytes, for data that never
+    changes once written (sealed blocks, results of closed elections).
+    """
+
+    def __init__(self, max_items=4096):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return value
+
+    def get_or_encode(self, key, obj):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, dumps(obj))
+        return value
+
+
+class ChainJSONCache:
+    """
+    Keeps the JSON encoding of the blockchain's blocks.
+    Blocks are immutable once appended, so each one is encoded only once
+    and the joined array is extended with new blocks only. `chain` may be
+    a list or a ChainSnapshot; an older snapshot of the same chain is
+    served from a prefix of the encoding.
+    """
+
+    def __init__(self):
+        self._encoded = b""
+        self._ends = array("q")   # end offset of each block in _encoded
+        self._count = 0
+        self._last_hash = None
+        self._source = None
+        self._lock = threading.Lock()
+
+    def chain_bytes(self, chain):
+        """Return (JSON array bytes, number of blocks, last block hash)."""
+        source = getattr(chain, "blocks", chain)
+        with self._lock:
+            n = len(chain)
+            if n and n <= self._count and source is self._source:
+                return b"[" + self._encoded[:self._ends[n - 1]] + b"]", n, chain[n - 1].hash
+            if self._count and (n < self._count or chain[self._count - 1].hash != self._last_hash):
+                self._encoded, self._ends, self._count = b"", array("q"), 0
+            self._source = source
+            if n > self._count:
+                parts = [dumps(b.to_dict()) for b in chain[self._count:n]]
+                pos = len(self._encoded)
+                for part in parts:
+                    pos += len(part) + (1 if self._ends else 0)
+                    self._ends.append(pos)
+                new = b",".join(parts)
+                self._encoded = self._encoded + b"," + new if self._count else new
+                self._count = n
+                self._last_hash = chain[n - 1].hash
+            return b"[" + self._encoded + b"]", self._count, self._last_hash
+
+
+# ---------- compression ----------
+
+def _accepted_encodings(header):
+    """Parse Accept-Encoding into {encoding: q}."""
+    out = {}
+    for part in (header or "").split(","):
+        fields = part.strip().split(";")
+        name = fields[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        out[name] = q
+    return out
+
+
+def choose_encoding(accept_encoding):
+    """Pick gzip or deflate from an Accept-Encoding header (or None)."""
+    accepted = _accepted_encodings(accept_encoding)
+    for name in ("gzip", "deflate"):
+        q = accepted.get(name, accepted.get("*", 0.0) if name == "gzip" else 0.0)
+        if q > 0:
+            return name
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+    if encoding == "deflate":
+        return zlib.compress(data, COMPRESS_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def compress_response(response, accept_encoding, cache=None):
+    """
+    after_request hook: compress the body with gzip/deflate if the client
+    accepts it and the body is large enough.
+    A view can set response.cache_key to reuse the compressed body of an
+    identical earlier response kept in `cache` (a SerializedCache of the
+    storage the response was built from, so tenants don't share it).
+    A strong ETag is made weak: it names the uncompressed body, and the
+    compressed bytes differ (If-None-Match compares weakly, so 304s still work).
+    """
+    response.vary.add("Accept-Encoding")
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    cache_key = getattr(response, "cache_key", None)
+    if cache is None:
+        cache_key = None
+    body = None
+    if cache_key is not None:
+        body = cache.get((cache_key, encoding))
+    if body is None:
+        body = compress(data, encoding)
+        if cache_key is not None:
+            cache.put((cache_key, encoding), body)
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
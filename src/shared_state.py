@@ -0,0 +1,370 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no shared ledger (one process per data dir)
+    fcntl = None
+
+from storage import get_storage
+
+LEDGER_FILE = "blockchain.ledger"
+MAGIC = b"EVLEDGR1"
+
+# Rows and (election, candidate) tally slots in a new segment; both are
+# doubled (into a new file) when they run out.
+INITIAL_ROWS = 4096
+INITIAL_TALLY_SLOTS = 1024
+
+# magic, seq, stale, generation, count, capacity, tally_used, tally_capacity, journal_offset
+_HEADER = struct.Struct("<8s8Q")
+HEADER_SIZE = 128
+ROW_BYTES = 8 + 8 + 8 + 8 + 32      # index, election, candidate, timestamp, hash
+_TALLY = struct.Struct("<3q")       # election_id, candidate_id, count
+
+# header field offsets, for in-place updates
+_SEQ, _STALE = 8, 16
+
+Header = namedtuple("Header", "generation count capacity tally_used tally_capacity journal_offset")
+
+
+def _layout(capacity, tally_capacity):
+    """Byte offsets of the columns and the tally table, and the file size."""
+    off = {}
+    pos = HEADER_SIZE
+    for name, width in (("index", 8), ("election", 8), ("candidate", 8), ("timestamp", 8), ("hash", 32)):
+        off[name] = pos
+        pos += width * capacity
+    off["tally"] = pos
+    return off, pos + _TALLY.size * tally_capacity
+
+
+class SharedSnapshot:
+    """
+    The ledger as published at one moment: the first `length` rows of one
+    segment file. Published rows never change, so the view stays valid
+    (like a ChainSnapshot) while new votes are appended.
+    """
+
+    def __init__(self, segment, length, generation, last_hash):
+        self.segment = segment
+        self.length = length
+        self.generation = generation
+        self.last_hash = last_hash
+
+    @property
+    def key(self):
+        return self.length, self.last_hash
+
+    def __len__(self):
+        return self.length
+
+    def prefix(self, length):
+        if length >= self.length:
+            return self
+        return SharedSnapshot(self.segment, length, self.generation, self.segment.row_hash(length - 1))
+
+
+class _Segment:
+    """One mapped segment file (replaced, never resized, when it fills up)."""
+
+    def __init__(self, path):
+        with open(path, "r+b") as f:
+            self.map = mmap.mmap(f.fileno(), 0)
+        magic, _, _, _, _, capacity, _, tally_capacity, _ = _HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a ledger segment.")
+        self.capacity = capacity
+        self.tally_capacity = tally_capacity
+        self.offsets, _ = _layout(capacity, tally_capacity)
+
+    def field(self, offset):
+        return struct.unpack_from("<Q", self.map, offset)[0]
+
+    def set_field(self, offset, value):
+        struct.pack_into("<Q", self.map, offset, value)
+
+    def row_hash(self, pos):
+        start = self.offsets["hash"] + 32 * pos
+        return self.map[start:start + 32].hex()
+
+    def column(self, name, length, start=0):
+        """Zero-copy view of rows [start, length) of an 8-byte column."""
+        fmt = "d" if name == "timestamp" else "q"
+        base = self.offsets[name]
+        return memoryview(self.map)[base + 8 * start:base + 8 * length].cast(fmt)
+
+
+class SharedLedger:
+    """
+    Ledger state shared by every worker process serving one data
+    directory: block index, hash, election, candidate and timestamp
+    columns of the hot chain, plus per-election tallies, in a memory-mapped
+    file (data/blockchain.ledger). N workers map one copy instead of
+    each building its own columns and tallies.
+
+    The process that appends a block (any worker) publishes it here while
+    holding an exclusive file lock, together with the journal size after
+    the append. Readers take consistent views without locking: the
+    header carries a sequence number that is odd while it is being
+    updated (a seqlock), and published rows never change. Workers that
+    need the blocks themselves follow the journal up to the published
+    offset (Blockchain.catch_up) instead of reloading it.
+    A full segment, or a chain rewritten by archiving (new generation),
+    is written to a new file that replaces the old one; the old file is
+    marked stale so readers switch over.
+    """
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise ValueError("A shared ledger needs POSIX file locks (not available on this platform).")
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock_file = open(path + ".lock", "a+b")
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._segment = None
+        self._slots = {}            # (election, candidate) -> tally slot, writer side
+        self._slots_key = None      # (generation, tally_used) _slots reflects
+        self.checked = False        # segment confirmed to match the journal (get_shared_ledger)
+
+    def close(self):
+        self._lock_file.close()
+
+    # ---------- reading ----------
+
+    def _current(self):
+        """The mapped segment, switching to the replacement of a stale one; None if none yet."""
+        segment = self._segment
+        if segment is None or segment.field(_STALE):
+            try:
+                segment = self._segment = _Segment(self.path)
+            except FileNotFoundError:
+                return None
+        return segment
+
+    def _read(self, reader):
+        """Run reader(segment) on a consistent header (seqlock); (None, None) before the first publish."""
+        while True:
+            segment = self._current()
+            if segment is None:
+                return None, None
+            seq = segment.field(_SEQ)
+            if seq & 1:
+                time.sleep(0)
+                continue
+            result = reader(segment)
+            if segment.field(_SEQ) == seq and not segment.field(_STALE):
+                return segment, result
+
+    @staticmethod
+    def _header_of(segment):
+        _, _, _, generation, count, capacity, used, tally_capacity, offset = _HEADER.unpack_from(segment.map, 0)
+        return Header(generation, count, capacity, used, tally_capacity, offset)
+
+    def header(self):
+        _, header = self._read(self._header_of)
+        return header if header is not None else Header(0, 0, 0, 0, 0, 0)
+
+    def snapshot(self):
+        """SharedSnapshot of everything published so far."""
+        segment, header = self._read(self._header_of)
+        if segment is None or not header.count:
+            return SharedSnapshot(segment, 0, header.generation if header else 0, None)
+        return SharedSnapshot(segment, header.count, header.generation, segment.row_hash(header.count - 1))
+
+    def tallies(self):
+        """(snapshot key, {election_id: {candidate_id: count}}) as last published."""
+        def read(segment):
+            header = self._header_of(segment)
+            base = segment.offsets["tally"]
+            rows = [_TALLY.unpack_from(segment.map, base + _TALLY.size * i) for i in range(header.tally_used)]
+            last = segment.row_hash(header.count - 1) if header.count else None
+            return (header.generation, header.count, last), rows
+
+        segment, result = self._read(read)
+        if segment is None:
+            return (0, 0, None), {}
+        key, rows = result
+        tallies = {}
+        for eid, cid, count in rows:
+            tallies.setdefault(eid, {})[cid] = count
+        return key, tallies
+
+    # ---------- writing (under locked()) ----------
+
+    @contextmanager
+    def locked(self):
+        """Exclusive writer lock across processes (and threads of this one)."""
+        with self._thread_lock:
+            # nested: flock is per file, so only the outermost level unlocks
+            self._depth += 1
+            if self._depth == 1:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _write_segment(self, capacity, tally_capacity, generation, journal_offset, columns, tally_rows):
+        """Write a complete new segment file and swap it in for the current one."""
+        offsets, size = _layout(capacity, tally_capacity)
+        count = len(columns["index"]) // 8
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w+b") as f:
+            f.truncate(size)
+            with mmap.mmap(f.fileno(), size) as m:
+                _HEADER.pack_into(m, 0, MAGIC, 0, 0, generation, count, capacity,
+                                  len(tally_rows), tally_capacity, journal_offset)
+                for name, data in columns.items():
+                    m[offsets[name]:offsets[name] + len(data)] = data
+                for i, row in enumerate(tally_rows):
+                    _TALLY.pack_into(m, offsets["tally"] + _TALLY.size * i, *row)
+                m.flush()
+        old = self._current()
+        os.replace(tmp_path, self.path)
+        if old is not None:
+            old.set_field(_STALE, 1)
+        self._segment = _Segment(self.path)
+        self._slots_key = None
+
+    def rebuild(self, blocks, journal_offset):
+        """Publish the whole hot chain as a new generation (first start, archiving, repair)."""
+        from analytics import _timestamp_to_epoch   # imported here: analytics imports this module
+        header = self.header()
+        capacity, tally_capacity = INITIAL_ROWS, INITIAL_TALLY_SLOTS
+        while capacity < len(blocks):
+            capacity *= 2
+        counts = {}
+        for b in blocks:
+            if b.election_id != -1:
+                key = (b.election_id, b.candidate_id)
+                counts[key] = counts.get(key, 0) + 1
+        while tally_capacity < len(counts):
+            tally_capacity *= 2
+        columns = {
+            "index": struct.pack(f"<{len(blocks)}q", *(b.index for b in blocks)),
+            "election": struct.pack(f"<{len(blocks)}q", *(b.election_id for b in blocks)),
+            "candidate": struct.pack(f"<{len(blocks)}q", *(b.candidate_id for b in blocks)),
+            "timestamp": struct.pack(f"<{len(blocks)}d", *(_timestamp_to_epoch(b.timestamp) for b in blocks)),
+            "hash": b"".join(bytes.fromhex(b.hash) for b in blocks),
+        }
+        self._write_segment(capacity, tally_capacity, header.generation + 1, journal_offset, columns,
+                            [(eid, cid, n) for (eid, cid), n in counts.items()])
+
+    def _grow(self, header, segment):
+        """Copy the published rows and tallies into a segment with room to spare."""
+        capacity = header.capacity * 2 if header.count >= header.capacity else header.capacity
+        tally_capacity = (header.tally_capacity * 2 if header.tally_used >= header.tally_capacity
+                          else header.tally_capacity)
+        columns = {}
+        for name, width in (("index", 8), ("election", 8), ("candidate", 8), ("timestamp", 8), ("hash", 32)):
+            start = segment.offsets[name]
+            columns[name] = segment.map[start:start + width * header.count]
+        base = segment.offsets["tally"]
+        tally_rows = [_TALLY.unpack_from(segment.map, base + _TALLY.size * i) for i in range(header.tally_used)]
+        self._write_segment(capacity, tally_capacity, header.generation, header.journal_offset,
+                            columns, tally_rows)
+
+    def _slot(self, segment, header, key):
+        if self._slots_key != (header.generation, header.tally_used):
+            base = segment.offsets["tally"]
+            self._slots = {_TALLY.unpack_from(segment.map, base + _TALLY.size * i)[:2]: i
+                           for i in range(header.tally_used)}
+            self._slots_key = (header.generation, header.tally_used)
+        return self._slots.get(key)
+
+    @staticmethod
+    def encode(block):
+        """
+        The block's row, packed column by column. Raises (struct.error,
+        ValueError) for a block the ledger can't hold, e.g. a candidate id
+        beyond 64 bits: callers encode before saving the block anywhere.
+        """
+        from analytics import _timestamp_to_epoch   # imported here: analytics imports this module
+        return (struct.pack("<q", block.index), struct.pack("<q", block.election_id),
+                struct.pack("<q", block.candidate_id), struct.pack("<d", _timestamp_to_epoch(block.timestamp)),
+                bytes.fromhex(block.hash), block.election_id, block.candidate_id)
+
+    def append(self, row, journal_offset):
+        """Publish one encoded block (see encode) appended to the journal, which now ends at journal_offset."""
+        index, election, candidate, timestamp, hash_, election_id, candidate_id = row
+        if len(hash_) != 32:
+            raise ValueError("A block hash must be 32 bytes.")
+        segment = self._current()
+        header = self._header_of(segment)
+        key = (election_id, candidate_id)
+        counted = election_id != -1
+        slot = self._slot(segment, header, key) if counted else None
+        if header.count >= header.capacity or (counted and slot is None
+                                                and header.tally_used >= header.tally_capacity):
+            self._grow(header, segment)
+            segment = self._segment
+            header = self._header_of(segment)
+
+        # everything is packed first: nothing may fail while seq is odd
+        m, off, pos = segment.map, segment.offsets, header.count
+        writes = [(off["index"] + 8 * pos, index), (off["election"] + 8 * pos, election),
+                  (off["candidate"] + 8 * pos, candidate), (off["timestamp"] + 8 * pos, timestamp),
+                  (off["hash"] + 32 * pos, hash_)]
+        used = header.tally_used
+        if counted:
+            if slot is None:
+                slot, used = used, used + 1
+                writes.append((off["tally"] + _TALLY.size * slot, _TALLY.pack(election_id, candidate_id, 1)))
+            else:
+                count_at = off["tally"] + _TALLY.size * slot + 16
+                writes.append((count_at, struct.pack("<q", struct.unpack_from("<q", m, count_at)[0] + 1)))
+        seq = segment.field(_SEQ)
+        writes.append((0, _HEADER.pack(MAGIC, seq + 1, 0, header.generation, pos + 1, header.capacity,
+                                       used, header.tally_capacity, journal_offset)))
+
+        segment.set_field(_SEQ, seq + 1)    # odd: update in progress
+        try:
+            for start, data in writes:
+                m[start:start + len(data)] = data
+        finally:
+            segment.set_field(_SEQ, seq + 2)    # even again: published
+        if counted:
+            self._slots[key] = slot
+        self._slots_key = (header.generation, used)
+
+def ledger_path(store):
+    return os.path.join(store.data_dir, LEDGER_FILE)
+
+
+def open_shared_ledger(store):
+    """The storage's SharedLedger (None unless it shares one), without checking it."""
+    if not store.shared_ledger:
+        return None
+    return store.cached("shared_ledger", lambda: SharedLedger(ledger_path(store)))
+
+
+def get_shared_ledger(store=None):
+    """
+    The current storage's SharedLedger, checked against the journal on
+    first use (None unless the storage shares one). A segment that is
+    missing or behind the journal, or that may hold blocks of a pending
+    archive, is rebuilt by loading the blockchain;
+    otherwise this worker never has to load the chain to serve results.
+    """
+    store = store or get_storage()
+    ledger = open_shared_ledger(store)
+    if ledger is None or ledger.checked:
+        return ledger
+    with ledger.locked():
+        current = ledger.header().journal_offset == store.journal_size("blockchain") and ledger.header().count
+    # an archive a crash left pending may still have its blocks in the segment
+    pending = any(entry.get("pending") for entry in store.load_list("archives"))
+    if not current or pending:
+        from blockchain import get_blockchain   # imported here: blockchain imports this module
+        get_blockchain()   # loading it under the lock publishes the chain
+    ledger.checked = True
+    return ledger
@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response
+
+from responses import _accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Files smaller than this are not precompressed.
+PRECOMPRESS_MIN_SIZE = 256
+
+# Fingerprinted URLs never change content, so they can be cached "forever".
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Entry pages keep their URL across deploys: cache, but always revalidate.
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# Fingerprinted URLs are served under this path.
+ASSET_PREFIX = "/assets/"
+
+# src="..." / href="..." attributes of HTML pages, rewritten to fingerprinted URLs.
+_REFERENCE = re.compile(r'\b(src|href)="([^"#?:]+)"')
+
+
+class StaticAsset:
+    """One front-end file held in memory with its precompressed variants."""
+
+    def __init__(self, name, body):
+        self.name = name
+        self.body = body
+        digest = hashlib.sha256(body).hexdigest()
+        self.fingerprint = digest[:12]
+        self.etag = digest[:32]
+        self.content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/") or self.content_type == "application/javascript":
+            self.content_type += "; charset=utf-8"
+
+        # encoding -> bytes, only kept when actually smaller
+        self.encoded = {}
+        if len(body) >= PRECOMPRESS_MIN_SIZE:
+            variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(body, quality=11)
+            self.encoded = {k: v for k, v in variants.items() if len(v) < len(body)}
+
+    @property
+    def fingerprinted_name(self):
+        """e.g. app.js -> app.3f2a9c1b7d4e.js"""
+        stem, ext = os.path.splitext(self.name)
+        return f"{stem}.{self.fingerprint}{ext}"
+
+
+def _choose_encoding(accept_encoding, available):
+    accepted = _accepted_encodings(accept_encoding)
+    for name in ("br", "gzip"):
+        if name in available and accepted.get(name, 0.0) > 0:
+            return name
+    return None
+
+
+class StaticAssetStore:
+    """
+    Loads every file under `root` once (at startup), fingerprints and
+    precompresses it, and serves it from memory with strong ETags.
+    HTML pages keep their URL; the files they reference (src= / href=)
+    are linked by fingerprinted URL, so those can be cached for good.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.assets = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    self.assets[name] = StaticAsset(name, f.read())
+        # pages last: their fingerprints cover the rewritten references
+        for name, asset in self.assets.items():
+            if name.endswith(".html"):
+                self.assets[name] = StaticAsset(name, self._link_assets(name, asset.body))
+        self._by_fingerprint = {a.fingerprinted_name: a for a in self.assets.values()}
+
+    def _link_assets(self, page, body):
+        base = os.path.dirname(page)
+
+        def link(match):
+            name = os.path.normpath(os.path.join(base, match.group(2).lstrip("/"))).replace(os.sep, "/")
+            if name not in self.assets or name.endswith(".html"):
+                return match.group(0)
+            return f'{match.group(1)}="{self.url_for(name)}"'
+
+        return _REFERENCE.sub(link, body.decode("utf-8")).encode("utf-8")
+
+    def get(self, name):
+        return self.assets.get(name)
+
+    def get_fingerprinted(self, name):
+        return self._by_fingerprint.get(name)
+
+    def url_for(self, name):
+        """Immutable URL of an asset (changes whenever its content does)."""
+        return ASSET_PREFIX + self.assets[name].fingerprinted_name
+
+    def response(self, asset, request, immutable=False):
+        """Build the response for `asset`, honouring If-None-Match and Accept-Encoding."""
+        encoding = _choose_encoding(request.headers.get("Accept-Encoding"), asset.encoded)
+        # strong ETags must differ per representation
+        etag = asset.etag if encoding is None else f"{asset.etag}-{encoding}"
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        body = asset.body
+        if encoding is not None:
+            body = asset.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+        return Response(body, headers=headers, content_type=asset.content_type)
@@ -0,0 +1,614 @@
+import contextvars
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no shared ledger, so no cross-process locks needed
+    fcntl = None
+
+# project root ( .. from src/ )
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Config value selecting the pure in-memory backend.
+MEMORY = ":memory:"
+# Config prefix selecting files with an append-only blockchain journal.
+JOURNAL_PREFIX = "journal:"
+# Same, plus ledger state shared by worker processes (see shared_state.py).
+SHARED_PREFIX = "shared:"
+
+# Bytes read per step when scanning a journal backwards for a torn tail.
+RECOVERY_CHUNK_SIZE = 64 * 1024
+
+
+class StorageCorruptedError(Exception):
+    """A data file exists but cannot be parsed (it is never silently reset)."""
+
+
+# ---------- crash-safe file helpers ----------
+
+def _read_json_list(path):
+    """
+    Parse a JSON file holding a list. Anything unreadable raises
+    StorageCorruptedError, whichever list it is: callers must never
+    mistake a damaged file for an empty one and save over it.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except ValueError as exc:   # bad JSON, or bytes that are not UTF-8
+        raise StorageCorruptedError(f"{path} is corrupted: {exc}") from exc
+    if not isinstance(data, list):
+        raise StorageCorruptedError(f"{path} does not contain a list.")
+    return data
+
+
+def _fsync_dir(path):
+    """Persist a rename in `path` (not possible, nor needed, on Windows)."""
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, data):
+    """
+    Write JSON to path so that a crash leaves either the old or the new
+    file, never a truncated one: write a temp file in the same directory,
+    fsync it, rename it over the target, then fsync the directory.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+def _parse_record(raw, is_valid_record):
+    try:
+        record = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        return False
+    return is_valid_record is None or is_valid_record(record)
+
+
+def recover_journal(path, is_valid_record=None, chunk_size=RECOVERY_CHUNK_SIZE):
+    """
+    Repair the end of a JSON Lines journal after a crash.
+    Walks backwards from the end of the file, dropping records that are
+    torn (no trailing newline), unparsable, or rejected by
+    is_valid_record(record), and truncates the file after the last good
+    record. Only the damaged tail is read, so this costs time
+    proportional to the damage, not to the file size.
+    Returns the number of bytes removed.
+    """
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        good_end = end
+        pos, buf = end, b""   # buf always holds file[pos:good_end]
+
+        while good_end > 0:
+            buf = buf[:good_end - pos]
+            terminated = buf.endswith(b"\n")
+            search_end = len(buf) - 1 if terminated else len(buf)
+            nl = buf.rfind(b"\n", 0, search_end)
+            if nl == -1 and pos > 0:
+                # record starts before what we have read so far
+                step = min(chunk_size, pos)
+                f.seek(pos - step)
+                buf = f.read(step) + buf
+                pos -= step
+                continue
+
+            start = nl + 1
+            if terminated and _parse_record(buf[start:search_end], is_valid_record):
+                break
+            good_end = pos + start
+
+        if good_end < end:
+            f.truncate(good_end)
+            f.flush()
+            os.fsync(f.fileno())
+    return end - good_end
+
+
+class SnapshotBarrier:
+    """
+    Lets a backup copy several lists at one point in time while the app
+    keeps running. Writes that touch more than one list (a vote goes to
+    votes.json and the blockchain) run inside writing(); paused() waits
+    for those in progress and holds new ones back until the copy is taken.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._writers = 0
+        self._paused = False
+        self._local = threading.local()   # per thread: writing() nesting depth
+
+    @contextmanager
+    def writing(self):
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            # nested: already counted (waiting here could deadlock a pause)
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+        with self._cond:
+            while self._paused:
+                self._cond.wait()
+            self._writers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._cond:
+                self._writers -= 1
+                if not self._writers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def paused(self):
+        with self._cond:
+            while self._paused:
+                self._cond.wait()
+            self._paused = True
+            while self._writers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._paused = False
+                self._cond.notify_all()
+
+
+class Storage:
+    """
+    Where one instance of the app keeps its data:
+      - named JSON lists: "users", "elections", "votes", "blockchain"
+      - the action log
+      - the reports directory
+    It also holds the objects built from that data (the Blockchain,
+    analytics caches, ...), created lazily on first use via cached(), so
+    several independent instances can live in one process.
+    """
+
+    # whether worker processes share ledger state (see shared_state.py)
+    shared_ledger = False
+
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.RLock()
+        # name -> is_valid_record(record), used by backends that can
+        # recover a damaged list (see FileStorage journals)
+        self.record_validators = {}
+        # requests / jobs using this storage right now; a pinned storage
+        # is never unloaded (see tenants.py)
+        self.pins = 0
+        # consistent point-in-time copies for online backups (see backup.py)
+        self.write_barrier = SnapshotBarrier()
+        self._section_locks = {}
+
+    def load_list(self, name):
+        raise NotImplementedError
+
+    def save_list(self, name, items):
+        raise NotImplementedError
+
+    def version(self, name):
+        """Cheap change marker for one list (None if it was never saved)."""
+        raise NotImplementedError
+
+    def append_item(self, name, item, all_items):
+        """
+        Persist a list after `item` was appended to it.
+        all_items() returns the whole list; backends that can append in
+        place (journals) don't call it.
+        """
+        self.save_list(name, all_items())
+
+    @contextmanager
+    def write_section(self, name):
+        """
+        Exclusive read-modify-write of the list `name` (load, change, save)
+        inside the backup write barrier. Checks that decide the write (e.g.
+        "has this voter voted?") belong inside it too.
+        """
+        with self._lock:
+            lock = self._section_locks.setdefault(name, threading.RLock())
+        with self.write_barrier.writing(), lock:
+            yield
+
+    def append_log(self, line):
+        raise NotImplementedError
+
+    def save_blob(self, name, data):
+        """Store a read-only binary blob (e.g. an archive segment)."""
+        raise NotImplementedError
+
+    def load_blob(self, name):
+        """Return the bytes of a blob saved with save_blob()."""
+        raise NotImplementedError
+
+    def delete_blob(self, name):
+        """Remove a blob nothing refers to any more (no error if it is gone)."""
+        raise NotImplementedError
+
+    @property
+    def reports_dir(self):
+        raise NotImplementedError
+
+    def cached(self, key, factory):
+        """Return the object stored under key, creating it with factory() once."""
+        obj = self._objects.get(key)
+        if obj is None:
+            with self._lock:
+                obj = self._objects.get(key)
+                if obj is None:
+                    obj = factory()
+                    self._objects[key] = obj
+        return obj
+
+    def pin(self):
+        with self._lock:
+            self.pins += 1
+
+    def unpin(self):
+        with self._lock:
+            self.pins -= 1
+
+    def close(self):
+        """Drop the cached objects (calling their close() if they have one)."""
+        with self._lock:
+            objects, self._objects = list(self._objects.values()), {}
+        for obj in objects:
+            close = getattr(obj, "close", None)
+            if close is not None:
+                close()
+
+
+class FileStorage(Storage):
+    """
+    JSON files on disk (the original layout):
+      <base_dir>/data/<name>.json
+      <base_dir>/reports/
+      <base_dir>/logs/actions.log
+    Files are replaced atomically, so a crash never leaves a half-written one.
+    Lists named in `journaled` are kept as append-only JSON Lines
+    (<name>.jsonl, one record per line): appending costs O(1) instead of a
+    full rewrite, and a torn last record is cut off on load.
+    Point base_dir at a tmpfs mount (e.g. /dev/shm/...) for fast,
+    throw-away instances.
+    """
+
+    def __init__(self, base_dir=BASE_DIR, journaled=(), shared_ledger=False):
+        super().__init__()
+        if shared_ledger and "blockchain" not in journaled:
+            raise ValueError("A shared ledger needs the blockchain journal.")
+        if shared_ledger and fcntl is None:
+            raise ValueError("A shared ledger needs POSIX file locks (not available on this platform).")
+        self.base_dir = base_dir
+        self.journaled = frozenset(journaled)
+        self.shared_ledger = shared_ledger
+        self._section_files = {}   # name -> [open lock file, depth] while held
+        self.data_dir = os.path.join(base_dir, "data")
+        self.logs_dir = os.path.join(base_dir, "logs")
+        self.log_file = os.path.join(self.logs_dir, "actions.log")
+        self.archive_dir = os.path.join(self.data_dir, "archive")
+        self._reports_dir = os.path.join(base_dir, "reports")
+
+    def __repr__(self):
+        return f"FileStorage({self.base_dir!r})"
+
+    def path(self, name):
+        ext = "jsonl" if name in self.journaled else "json"
+        return os.path.join(self.data_dir, f"{name}.{ext}")
+
+    def load_list(self, name):
+        if name in self.journaled:
+            return self._load_journal(name)
+        path = self.path(name)
+        if not os.path.exists(path):
+            return []
+        return _read_json_list(path)
+
+    def save_list(self, name, items):
+        os.makedirs(self.data_dir, exist_ok=True)
+        if name in self.journaled:
+            self._rewrite_journal(name, items)
+        else:
+            atomic_write_json(self.path(name), items)
+
+    def append_item(self, name, item, all_items):
+        if name not in self.journaled:
+            return super().append_item(name, item, all_items)
+        os.makedirs(self.data_dir, exist_ok=True)
+        with open(self.path(name), "a", encoding="utf-8") as f:
+            # one write per record: a crash can only tear the last line
+            f.write(json.dumps(item, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ---------- journals ----------
+
+    def _load_journal(self, name):
+        path = self.path(name)
+        if not os.path.exists(path):
+            # first use: migrate an existing <name>.json snapshot
+            legacy = os.path.join(self.data_dir, f"{name}.json")
+            if not os.path.exists(legacy):
+                return []
+            items = _read_json_list(legacy)
+            self._rewrite_journal(name, items)
+            return items
+
+        # a torn tail is a crash and is cut off; damage before it is not
+        recover_journal(path, self.record_validators.get(name))
+        items = []
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except ValueError as exc:
+                    raise StorageCorruptedError(f"{path} line {number} is corrupted: {exc}") from exc
+        return items
+
+    @contextmanager
+    def write_section(self, name):
+        with super().write_section(name):
+            if not self.shared_ledger:
+                yield
+                return
+            # other worker processes write the same files. The section lock
+            # is held, so only this thread touches _section_files[name];
+            # nested sections reuse the flock (a second open() would block).
+            held = self._section_files.get(name)
+            if held is None:
+                os.makedirs(self.data_dir, exist_ok=True)
+                lock_file = open(os.path.join(self.data_dir, f".{name}.lock"), "a+b")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                held = self._section_files[name] = [lock_file, 0]
+            held[1] += 1
+            try:
+                yield
+            finally:
+                held[1] -= 1
+                if not held[1]:
+                    del self._section_files[name]
+                    fcntl.flock(held[0], fcntl.LOCK_UN)
+                    held[0].close()
+
+    def journal_size(self, name):
+        """Bytes in a journal: the offset where the next record will go."""
+        try:
+            return os.path.getsize(self.path(name))
+        except FileNotFoundError:
+            return 0
+
+    def read_journal(self, name, start, end):
+        """
+        Records in bytes [start, end) of a journal, for processes that
+        follow a journal another process appends to. No recovery is done:
+        `end` must be the end of a complete record.
+        """
+        with open(self.path(name), "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+    def _rewrite_journal(self, name, items):
+        path = self.path(name)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=self.data_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for item in items:
+                    f.write(json.dumps(item, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        _fsync_dir(self.data_dir)
+
+    def version(self, name):
+        try:
+            st = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def append_log(self, line):
+        os.makedirs(self.logs_dir, exist_ok=True)
+        with open(self.log_file, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def save_blob(self, name, data):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, name)
+        if os.path.exists(path):
+            os.chmod(path, 0o644)   # replaced below; Windows can't replace read-only files
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=self.archive_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        _fsync_dir(self.archive_dir)
+
+    def load_blob(self, name):
+        with open(os.path.join(self.archive_dir, name), "rb") as f:
+            return f.read()
+
+    def delete_blob(self, name):
+        path = os.path.join(self.archive_dir, name)
+        try:
+            os.chmod(path, 0o644)   # Windows can't remove read-only files
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        _fsync_dir(self.archive_dir)
+
+    @property
+    def reports_dir(self):
+        return self._reports_dir
+
+
+class MemoryStorage(Storage):
+    """
+    Everything kept in process memory; nothing touches data/.
+    Reports go to a private temporary directory created on first export.
+    """
+
+    def __init__(self, reports_dir=None):
+        super().__init__()
+        self._lists = {}
+        self._versions = {}
+        self._blobs = {}
+        self.log_lines = []
+        self._reports_dir = reports_dir
+
+    def __repr__(self):
+        return f"MemoryStorage(lists={sorted(self._lists)})"
+
+    def load_list(self, name):
+        # callers mutate what they load, like a freshly parsed file
+        return copy.deepcopy(self._lists.get(name, []))
+
+    def save_list(self, name, items):
+        # the caller hands the list over (it is not used after saving)
+        with self._lock:
+            self._lists[name] = items
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def append_item(self, name, item, all_items):
+        with self._lock:
+            self._lists.setdefault(name, []).append(item)
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def version(self, name):
+        return self._versions.get(name)
+
+    def append_log(self, line):
+        self.log_lines.append(line)
+
+    def save_blob(self, name, data):
+        self._blobs[name] = bytes(data)
+
+    def load_blob(self, name):
+        try:
+            return self._blobs[name]
+        except KeyError:
+            raise FileNotFoundError(name) from None
+
+    def delete_blob(self, name):
+        self._blobs.pop(name, None)
+
+    @property
+    def reports_dir(self):
+        if self._reports_dir is None:
+            self._reports_dir = tempfile.mkdtemp(prefix="evoting-reports-")
+        return self._reports_dir
+
+
+def from_config(config=None):
+    """
+    Build a storage from a configuration value:
+      - None          -> files under the project root (data/, reports/, logs/)
+      - ":memory:"    -> MemoryStorage
+      - a path        -> FileStorage rooted at that directory
+      - "journal:<path>" -> same, with the blockchain kept as an append-only journal
+      - "shared:<path>"  -> journal, plus ledger state shared by all worker
+                            processes using that path (see shared_state.py)
+      - a Storage     -> used as is
+    """
+    if isinstance(config, Storage):
+        return config
+    if config is None:
+        return FileStorage()
+    if config == MEMORY:
+        return MemoryStorage()
+    config = os.fspath(config)
+    if config.startswith(SHARED_PREFIX):
+        return FileStorage(config[len(SHARED_PREFIX):] or BASE_DIR, journaled=("blockchain",), shared_ledger=True)
+    if config.startswith(JOURNAL_PREFIX):
+        return FileStorage(config[len(JOURNAL_PREFIX):] or BASE_DIR, journaled=("blockchain",))
+    return FileStorage(config)
+
+
+# ---------- current storage ----------
+
+_default_storage = None
+_default_lock = threading.Lock()
+_current_storage = contextvars.ContextVar("evoting_storage", default=None)
+
+
+def get_storage():
+    """
+    Storage used by the calling code: the one activated for this context
+    (e.g. by the Flask app serving the request), else the process default.
+    """
+    store = _current_storage.get()
+    if store is not None:
+        return store
+    global _default_storage
+    if _default_storage is None:
+        with _default_lock:
+            if _default_storage is None:
+                _default_storage = FileStorage()
+    return _default_storage
+
+
+def set_default_storage(store):
+    """Replace the process-wide default storage (e.g. from the CLI)."""
+    global _default_storage
+    with _default_lock:
+        _default_storage = store
+
+
+def activate(store):
+    """Make store current for this context; returns a token for deactivate()."""
+    return _current_storage.set(store)
+
+
+def deactivate(token):
+    _current_storage.reset(token)
+
+
+@contextmanager
+def use_storage(store):
+    """with use_storage(store): ... runs the block against store."""
+    token = activate(store)
+    try:
+        yield store
+    finally:
+        deactivate(token)
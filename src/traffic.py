@@ -0,0 +1,378 @@
+import argparse
+import hashlib
+import http.cookiejar
+import itertools
+import json
+import os
+import re
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import storage
+
+CAPTURE_VERSION = 1
+
+# Body fields replaced by replay_password() in captures.
+SECRET_FIELDS = ("password",)
+
+# Digits in a path are collapsed to this when grouping latencies by route.
+_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+
+def replay_password(username):
+    """
+    Password a user gets in captures and in replay instances.
+    Captures never contain real passwords; the replayer creates every
+    user with this one, so captured logins still succeed.
+    """
+    return hashlib.sha256(f"replay:{username}".encode("utf-8")).hexdigest()[:20]
+
+
+def _redact(body):
+    if not isinstance(body, dict) or not any(f in body for f in SECRET_FIELDS):
+        return body
+    username = str(body.get("username") or "").strip()
+    return {k: (replay_password(username) if k in SECRET_FIELDS else v) for k, v in body.items()}
+
+
+# ---------- capture ----------
+
+class TrafficRecorder:
+    """
+    Records API requests to a JSON-lines capture file for replay.
+    Off by default; while off, the request hooks only check `active`.
+    The first line is a header with the users (names and roles only) and
+    elections at the start of the capture, then one line per request:
+        {"t": seconds since start, "session": client id, "method": ...,
+         "path": ... (with query), "body": JSON body or null,
+         "status": ..., "ms": ...}
+    Lines are written as requests finish, so they are not in "t" order.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.path = None
+        self.deadline = None
+        self.max_requests = None
+        self.recorded = 0
+        self._started = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start(self, path, users, elections, duration=None, max_requests=None):
+        if duration is not None and duration <= 0:
+            raise ValueError("duration must be positive")
+        if max_requests is not None and max_requests <= 0:
+            raise ValueError("max_requests must be positive")
+        with self._lock:
+            if self.active:
+                raise ValueError("A capture is already running.")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "w", encoding="utf-8")
+            header = {
+                "capture": CAPTURE_VERSION,
+                "started": datetime.utcnow().isoformat(),
+                "users": [{"username": u["username"], "role": u.get("role", "voter")} for u in users],
+                "elections": elections,
+            }
+            self._file.write(json.dumps(header, separators=(",", ":")) + "\n")
+            self.path = path
+            self.recorded = 0
+            self.deadline = time.monotonic() + duration if duration else None
+            self.max_requests = max_requests
+            self._started = time.monotonic()
+            self.active = True
+
+    def stop(self):
+        with self._lock:
+            self.active = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def begin(self, session_id, method, path, body):
+        """Called at the start of a request while active; returns a context for end(), or None."""
+        now = time.monotonic()
+        if (self.deadline is not None and now > self.deadline) or (
+                self.max_requests is not None and self.recorded >= self.max_requests):
+            self.stop()
+            return None
+        return {
+            "t": round(now - self._started, 6),
+            "session": session_id,
+            "method": method,
+            "path": path,
+            "body": _redact(body),
+        }, now
+
+    def end(self, ctx, status):
+        entry, started = ctx
+        entry["status"] = status
+        entry["ms"] = round((time.monotonic() - started) * 1000, 3)
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.recorded += 1
+
+    def status(self):
+        remaining = None
+        if self.active and self.deadline is not None:
+            remaining = max(0.0, round(self.deadline - time.monotonic(), 1))
+        return {
+            "active": self.active,
+            "path": self.path,
+            "recorded": self.recorded,
+            "seconds_left": remaining,
+        }
+
+
+def new_session_id():
+    return secrets.token_hex(8)
+
+
+# ---------- replay ----------
+
+def load_capture(path):
+    """Return (header, requests sorted by t). A torn last line is ignored."""
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("capture") != CAPTURE_VERSION:
+            raise ValueError(f"{path} is not a traffic capture (version {CAPTURE_VERSION}).")
+        entries = []
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+    entries.sort(key=lambda e: e["t"])
+    return header, entries
+
+
+def seed_storage(store, header):
+    """Fill an empty storage with the users (replay passwords) and elections of a capture."""
+    import auth   # imported here: only replay instances need it
+    users = []
+    for u in header["users"]:
+        salt = auth._generate_salt()   # one per user, as registration does
+        users.append({
+            "username": u["username"],
+            "password_hash": auth._hash_password(replay_password(u["username"]), salt),
+            "salt": salt,
+            "role": u["role"],
+        })
+    store.save_list("users", users)
+    store.save_list("elections", header["elections"])
+
+
+class InProcessTarget:
+    """Replays against a Flask app in this process (one test client per session)."""
+
+    def __init__(self, app):
+        self.app = app
+        # sessions are opened from several replay threads; next() on a
+        # count is atomic, unlike `+= 1`
+        self._numbers = itertools.count(1)
+
+    def session(self):
+        n = next(self._numbers)
+        # a distinct address per session, as real clients have
+        addr = f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+        client = self.app.test_client()
+
+        def send(method, path, body):
+            return client.open(path, method=method, json=body, environ_base={"REMOTE_ADDR": addr}).status_code
+        return send
+
+
+class HttpTarget:
+    """Replays against a running server, e.g. http://127.0.0.1:5000 (cookies per session)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def session(self):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+        def send(method, path, body):
+            data = json.dumps(body).encode("utf-8") if body is not None else None
+            req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"} if data else {})
+            try:
+                with opener.open(req, timeout=60) as resp:
+                    resp.read()
+                    return resp.status
+            except urllib.error.HTTPError as exc:
+                exc.read()
+                return exc.code
+        return send
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[k], 3)
+
+
+def _latency_summary(ms):
+    ms = sorted(ms)
+    return {
+        "p50_ms": _percentile(ms, 50),
+        "p90_ms": _percentile(ms, 90),
+        "p99_ms": _percentile(ms, 99),
+        "max_ms": round(ms[-1], 3) if ms else None,
+    }
+
+
+def route_of(method, path):
+    """Group key of a request: method and path without query, ids collapsed."""
+    return f"{method} {_ID_RE.sub('/<n>', path.split('?', 1)[0])}"
+
+
+def replay(entries, target, speed=1.0, concurrency=16):
+    """
+    Send captured requests to `target`, `speed` times faster than captured.
+    Each captured session is replayed in order by one of `concurrency`
+    worker threads; a worker busy with one session delays the others it
+    serves, which shows up as schedule lag.
+    Returns a report dict (throughput, latency percentiles, errors, lag).
+    """
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    sessions = {}
+    lanes = [[] for _ in range(concurrency)]
+    for e in entries:
+        if e["session"] not in sessions:
+            sessions[e["session"]] = len(sessions) % concurrency
+        lanes[sessions[e["session"]]].append(e)
+
+    results = []   # (route, status or None, ms, lag_ms, captured status)
+    lock = threading.Lock()
+    start = time.monotonic() + 0.1
+
+    def work(lane):
+        senders = {}
+        out = []
+        for e in lane:
+            due = start + e["t"] / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            send = senders.get(e["session"])
+            if send is None:
+                send = senders[e["session"]] = target.session()
+            sent = time.monotonic()
+            try:
+                status = send(e["method"], e["path"], e.get("body"))
+            except Exception:
+                status = None
+            done = time.monotonic()
+            out.append((route_of(e["method"], e["path"]), status, (done - sent) * 1000,
+                        max(0.0, (sent - due) * 1000), e.get("status")))
+        with lock:
+            results.extend(out)
+
+    threads = [threading.Thread(target=work, args=(lane,)) for lane in lanes if lane]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = max(time.monotonic() - start, 1e-9)
+
+    by_route = {}
+    for route, status, ms, lag, captured in results:
+        by_route.setdefault(route, []).append((status, ms))
+    failed = sum(1 for r in results if r[1] is None or r[1] >= 500)
+    report = {
+        "requests": len(results),
+        "sessions": len(sessions),
+        "speed": speed,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1),
+        "errors": failed,
+        "error_rate": round(failed / len(results), 4) if results else 0.0,
+        "client_errors": sum(1 for r in results if r[1] is not None and 400 <= r[1] < 500 and r[1] != 429),
+        "rejected_429": sum(1 for r in results if r[1] == 429),
+        "status_mismatches": sum(1 for r in results if r[4] is not None and r[1] != r[4]),
+        **_latency_summary([r[2] for r in results]),
+        "lag_p99_ms": _percentile(sorted(r[3] for r in results), 99),
+        "routes": {
+            route: {"requests": len(items),
+                    "errors": sum(1 for s, _ in items if s is None or s >= 500),
+                    **_latency_summary([ms for _, ms in items])}
+            for route, items in sorted(by_route.items())
+        },
+    }
+    return report
+
+
+def print_report(report):
+    print(f"\n=== REPLAY: {report['requests']} requests, {report['sessions']} sessions, "
+          f"{report['speed']}x, {report['concurrency']} workers ===")
+    print(f"Duration      : {report['seconds']} s")
+    print(f"Throughput    : {report['throughput_rps']} req/s")
+    print(f"Latency (ms)  : p50 {report['p50_ms']}  p90 {report['p90_ms']}  "
+          f"p99 {report['p99_ms']}  max {report['max_ms']}")
+    print(f"Errors (5xx)  : {report['errors']} ({report['error_rate']:.2%})")
+    print(f"4xx / 429     : {report['client_errors']} / {report['rejected_429']}")
+    print(f"Status differs from capture: {report['status_mismatches']}")
+    print(f"Schedule lag p99: {report['lag_p99_ms']} ms")
+    print("\nPer route:")
+    for route, r in report["routes"].items():
+        print(f"  {route:<40} {r['requests']:>7}  p50 {r['p50_ms']}  p99 {r['p99_ms']}  errors {r['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a traffic capture and report throughput and latency.")
+    parser.add_argument("capture", help="capture file recorded via /api/admin/capture")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor (default 1, e.g. 10 or 100)")
+    parser.add_argument("--concurrency", type=int, default=16, help="worker threads (default 16)")
+    parser.add_argument("--url", help="replay against this running server instead of an isolated in-process one")
+    parser.add_argument("--memory", action="store_true", help="isolated instance keeps its data in memory")
+    parser.add_argument("--no-admission", action="store_true", help="turn admission control off in the instance")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    header, entries = load_capture(args.capture)
+    data_dir = None
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        import api_server   # the app lives at the project root
+        if args.memory:
+            store = storage.MemoryStorage()
+        else:
+            data_dir = tempfile.mkdtemp(prefix="evoting-replay-")
+            store = storage.FileStorage(data_dir)
+        seed_storage(store, header)
+        app = api_server.create_app(store, admission_control=False if args.no_admission else None)
+        target = InProcessTarget(app)
+
+    try:
+        report = replay(entries, target, args.speed, args.concurrency)
+    finally:
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.exit(main())
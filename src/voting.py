@@ -1,24 +1,16 @@
-import json
-import os
 from election import list_active_elections
+from eligibility import get_rolls
 from blockchain import add_vote_to_blockchain
+from ranked import is_ranked, parse_ranking
 from reporting import log_action
+from storage import get_storage
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-os.makedirs(DATA_DIR, exist_ok=True)
-
-VOTES_FILE = os.path.join(DATA_DIR, "votes.json")
 
 def _load_votes():
-    if not os.path.exists(VOTES_FILE):
-        return []
-    with open(VOTES_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return get_storage().load_list("votes")
 
 def _save_votes(votes):
-    with open(VOTES_FILE, "w", encoding="utf-8") as f:
-        json.dump(votes, f, indent=2)
+    get_storage().save_list("votes", votes)
 
 def _next_vote_id(votes):
     """Return next integer ID for a new vote."""
@@ -29,13 +21,57 @@ def _next_vote_id(votes):
 
 def has_user_voted_in_election(username: str, election_id: int) -> bool:
     """
-    Check in votes.json if this user already voted in this election.
+    Check if this user already voted in this election
+    (has-voted bitsets built from votes.json, see eligibility.py).
     """
-    votes = _load_votes()
-    for v in votes:
-        if v["voter_username"] == username and v["election_id"] == election_id:
-            return True
-    return False
+    return get_rolls().has_voted(username, election_id)
+
+
+class VoteError(Exception):
+    pass
+
+
+class NotEligible(VoteError):
+    pass
+
+
+class AlreadyVoted(VoteError):
+    pass
+
+
+def record_vote(vote, election):
+    """
+    Check that the voter may vote in `election` and hasn't yet, append
+    the vote to votes.json, mark the voter as having voted and add its
+    block to the blockchain. All of it runs in the storage's exclusive
+    "votes" write section: two requests of one voter can't both pass the
+    check, no concurrent vote is lost from votes.json, and an online
+    backup never sees a vote without its block. If the block can't be
+    added, the vote is taken back out of votes.json.
+    Returns the new block; raises NotEligible / AlreadyVoted.
+    """
+    username, election_id = vote["voter_username"], vote["election_id"]
+    store = get_storage()
+    with store.write_section("votes"):
+        rolls = get_rolls()
+        if not rolls.is_eligible(username, election):
+            raise NotEligible("Not on the voter roll of this election")
+        if rolls.has_voted(username, election_id):
+            raise AlreadyVoted("Already voted in this election")
+        version = store.version("votes")
+        votes = _load_votes()
+        vote = {"id": _next_vote_id(votes), **vote}
+        votes.append(vote)
+        _save_votes(votes)
+        try:
+            block = add_vote_to_blockchain(username, election_id, vote["candidate_id"], vote.get("ranking"))
+        except BaseException:
+            # no block was added: neither is the vote
+            votes.pop()
+            _save_votes(votes)
+            raise
+        rolls.mark_voted(username, election_id, version)
+        return block
 
 
 def cast_vote(user):
@@ -76,6 +112,10 @@ def cast_vote(user):
         print("❌ Election not found or not active.")
         return
 
+    if not get_rolls().is_eligible(username, election):
+        print("❌ You are not on the voter roll of this election.")
+        return
+
     # Prevent double voting
     if has_user_voted_in_election(username, election_id):
         print("❌ You have already voted in this election.")
@@ -90,31 +130,41 @@ def cast_vote(user):
     for c in candidates:
         print(f"- [{c['id']}] {c['name']}")
 
-    # Choose candidate
-    try:
-        candidate_id = int(input("Enter candidate ID to vote for: ").strip())
-    except ValueError:
-        print("❌ Invalid candidate ID.")
-        return
+    ranking = None
+    if is_ranked(election):
+        # Ranked ballot: candidate IDs in order of preference
+        try:
+            ranking = parse_ranking(input("Rank candidates by ID, best first (e.g. 2,1,3): "), election)
+        except ValueError as exc:
+            print(f"❌ {exc}")
+            return
+        candidate_id = ranking[0]
+    else:
+        # Choose candidate
+        try:
+            candidate_id = int(input("Enter candidate ID to vote for: ").strip())
+        except ValueError:
+            print("❌ Invalid candidate ID.")
+            return
 
     candidate = next((c for c in candidates if c["id"] == candidate_id), None)
     if candidate is None:
         print("❌ No such candidate in this election.")
         return
 
-    # Save vote in votes.json
-    votes = _load_votes()
+    # Save vote in votes.json and the blockchain
     new_vote = {
-        "id": _next_vote_id(votes),
         "election_id": election_id,
         "voter_username": username,
         "candidate_id": candidate_id
     }
-    votes.append(new_vote)
-    _save_votes(votes)
-
-    # Also store the vote in the blockchain
-    new_block = add_vote_to_blockchain(username, election_id, candidate_id)
+    if ranking is not None:
+        new_vote["ranking"] = ranking
+    try:
+        new_block = record_vote(new_vote, election)
+    except VoteError as exc:
+        print(f"❌ {exc}.")
+        return
 
     print(f"✅ Your vote for '{candidate['name']}' has been recorded.")
     print(f"   → Blockchain block index: {new_block.index}")
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the modules import each other by bare name, as when run from src/
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, ROOT)
+
+import storage
+
+
+@pytest.fixture
+def memory_store():
+    """A fresh MemoryStorage, current for the test."""
+    store = storage.MemoryStorage()
+    with storage.use_storage(store):
+        yield store
+    store.close()
+
+
+@pytest.fixture
+def journal_store(tmp_path):
+    """A FileStorage in a temporary directory with a journaled blockchain, current for the test."""
+    store = storage.FileStorage(str(tmp_path), journaled=("blockchain",))
+    with storage.use_storage(store):
+        yield store
+    store.close()
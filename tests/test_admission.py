@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+import admission
+import api_server
+from admission import PRIORITY_READ, PRIORITY_VOTE, Admission, AdmissionQueue, RateLimiter
+
+
+def _client(adm):
+    app = api_server.create_app(":memory:", admission_control=adm)
+    return app.test_client()
+
+
+# ---------- over HTTP ----------
+
+def test_rate_limited_requests_get_429_with_retry_after():
+    adm = Admission(limiter=RateLimiter(client_limits={"api.api_login": (0.01, 2)}, route_limits={}))
+    client = _client(adm)
+    login = {"username": "nobody", "password": "wrong"}
+
+    assert client.post("/api/login", json=login).status_code != 429
+    assert client.post("/api/login", json=login).status_code != 429
+    resp = client.post("/api/login", json=login)
+
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert "rate limit" in resp.get_json()["error"]
+
+
+def test_busy_server_sheds_reads_but_keeps_the_vote_slot():
+    queue = AdmissionQueue(max_active=2, reserved=1, max_queue=0, max_wait=0.05)
+    client = _client(Admission(limiter=RateLimiter({}, {}), queue=queue))
+    assert queue.acquire(PRIORITY_READ)   # the only slot reads may use
+
+    resp = client.get("/api/results")
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == str(queue.retry_after())
+    assert "server busy" in resp.get_json()["error"]
+
+    # the reserved slot still admits votes (this one then fails for lack of a login)
+    assert client.post("/api/vote", json={"election_id": 1, "candidate_id": 1}).status_code == 401
+    queue.release()
+    assert client.get("/api/results").status_code == 200
+    assert queue.active == 0
+
+
+# ---------- the queue ----------
+
+def _acquire_in_thread(queue, priority):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("admitted", queue.acquire(priority)))
+    thread.start()
+    return thread, result
+
+
+def _wait_for_waiters(queue, count):
+    deadline = time.monotonic() + 2
+    while len(queue._waiters) != count:
+        assert time.monotonic() < deadline, "waiters did not queue up"
+        time.sleep(0.001)
+
+
+def test_full_queue_rejects_a_request_that_does_not_outrank_any_waiter():
+    queue = AdmissionQueue(max_active=1, reserved=0, max_queue=1, max_wait=2)
+    assert queue.acquire(PRIORITY_READ)
+    waiter, result = _acquire_in_thread(queue, PRIORITY_READ)
+    _wait_for_waiters(queue, 1)
+
+    assert queue.acquire(PRIORITY_READ) is False
+    queue.release()
+    waiter.join(2)
+    assert result["admitted"] is True
+    assert queue.rejected == 1
+
+
+def test_vote_pushes_the_lowest_priority_waiter_out_of_a_full_queue():
+    queue = AdmissionQueue(max_active=1, reserved=0, max_queue=1, max_wait=2)
+    assert queue.acquire(PRIORITY_READ)
+    reader, read_result = _acquire_in_thread(queue, PRIORITY_READ)
+    _wait_for_waiters(queue, 1)
+
+    voter, vote_result = _acquire_in_thread(queue, PRIORITY_VOTE)
+    reader.join(2)
+    assert read_result["admitted"] is False
+    queue.release()
+    voter.join(2)
+    assert vote_result["admitted"] is True
+
+
+def test_waiters_give_up_after_max_wait():
+    queue = AdmissionQueue(max_active=1, reserved=0, max_queue=4, max_wait=0.05)
+    assert queue.acquire(PRIORITY_READ)
+    started = time.monotonic()
+
+    assert queue.acquire(PRIORITY_READ) is False
+    assert time.monotonic() - started >= 0.05
+    assert queue._waiters == []
+
+
+@pytest.mark.parametrize("wait,expected", [(0.2, 1), (2.5, 3)])
+def test_rate_limit_retry_after_rounds_up(wait, expected, monkeypatch):
+    adm = Admission(limiter=RateLimiter({}, {}))
+    monkeypatch.setattr(adm.limiter, "check", lambda endpoint, client: wait)
+
+    decision = adm.admit("api.api_results", "GET", "client")
+
+    assert isinstance(decision, admission.Rejected)
+    assert decision.retry_after == expected
@@ -0,0 +1,41 @@
+import pytest
+
+import analytics
+from analytics import ColumnarLedger
+
+
+def _ledger(election_ids, candidate_ids):
+    return ColumnarLedger.from_arrays(election_ids, candidate_ids, [0.0] * len(election_ids))
+
+
+def test_tallies_group_by_election_and_candidate():
+    ledger = _ledger([1, 1, 2, 1, 3], [1, 2, 1, 1, 7])
+
+    assert ledger.tally_all() == {1: {1: 2, 2: 1}, 2: {1: 1}, 3: {7: 1}}
+    assert ledger.tally(1) == {1: 2, 2: 1}
+    assert ledger.tally(4) == {}
+
+
+@pytest.mark.parametrize("election_ids, candidate_ids", [
+    ([1, 3, 3], [1, 2 ** 62, 1]),          # combined key would overflow int64
+    ([1, 1], [-2 ** 62, 2 ** 62]),         # so would the candidate range
+    ([1, 1, 2], [10 ** 12, 10 ** 12, 3]),  # a dense bincount would need terabytes
+])
+def test_wide_id_ranges_are_grouped_sparsely(election_ids, candidate_ids):
+    ledger = _ledger(election_ids, candidate_ids)
+    expected = {}
+    for eid, cid in zip(election_ids, candidate_ids):
+        expected.setdefault(eid, {})[cid] = expected.get(eid, {}).get(cid, 0) + 1
+
+    assert ledger.tally_all() == expected
+    for eid, counts in expected.items():
+        assert ledger.tally(eid) == counts
+
+
+def test_sparse_and_dense_grouping_agree(monkeypatch):
+    ledger = _ledger([1, 2, 2, 5, 1], [4, 4, 9, 1, 4])
+    dense = ledger.tally_all(), ledger.tally(2)
+
+    monkeypatch.setattr(analytics, "_DENSE_KEY_LIMIT", 1)
+
+    assert (ledger.tally_all(), ledger.tally(2)) == dense
@@ -0,0 +1,35 @@
+import pytest
+
+import api_server
+import auth
+import election
+
+
+@pytest.fixture
+def client(memory_store):
+    memory_store.save_list("users", [
+        {"username": "alice", "password_hash": auth._hash_password("pw", "salt"), "salt": "salt", "role": "voter"},
+    ])
+    election.new_election("Single", active=True)
+    election.add_candidates(1, ["X", "Y"])
+    client = api_server.create_app(memory_store, admission_control=False).test_client()
+    assert client.post("/api/login", json={"username": "alice", "password": "pw"}).status_code == 200
+    return client
+
+
+# ---------- /api/vote ----------
+
+@pytest.mark.parametrize("candidate_id", [3, 0, -1, 2 ** 64])
+def test_vote_for_a_candidate_outside_the_election_is_refused(client, memory_store, candidate_id):
+    resp = client.post("/api/vote", json={"election_id": 1, "candidate_id": candidate_id})
+
+    assert resp.status_code == 400
+    assert memory_store.load_list("votes") == []
+
+
+def test_vote_for_a_candidate_is_recorded(client, memory_store):
+    resp = client.post("/api/vote", json={"election_id": 1, "candidate_id": 2})
+
+    assert resp.status_code == 200
+    assert [v["candidate_id"] for v in memory_store.load_list("votes")] == [2]
+    assert client.get("/api/results").status_code == 200
@@ -0,0 +1,46 @@
+import pytest
+
+import archive
+import election
+from blockchain import get_blockchain
+
+
+@pytest.fixture
+def tip_left_hot(memory_store):
+    """Election 1 archived while its last vote was the chain tip, then a vote in election 2."""
+    election.new_election("A")
+    election.new_election("B")
+    bc = get_blockchain()
+    for i in range(4):
+        bc.add_vote_block(f"v{i}", 1, 1)
+    first = archive.archive_election(1)
+    bc.add_vote_block("w", 2, 1)
+    return memory_store, first
+
+
+def test_archiving_again_writes_a_new_segment_and_drops_the_old(tip_left_hot):
+    store, first = tip_left_hot
+
+    second = archive.archive_election(1)
+
+    assert first["block_count"] == 3 and second["block_count"] == 4
+    assert second["segment"] != first["segment"]
+    with pytest.raises(FileNotFoundError):
+        store.load_blob(first["segment"])
+    assert archive.verify_archives()[0]
+    assert archive.archived_tallies()[1] == {1: 4}
+
+
+def test_crash_before_the_new_entry_keeps_the_old_segment_intact(tip_left_hot, monkeypatch):
+    store, first = tip_left_hot
+
+    def crash(entries):
+        raise KeyboardInterrupt("crash")
+    monkeypatch.setattr(archive, "_save_manifest", crash)
+    with pytest.raises(KeyboardInterrupt):
+        archive.archive_election(1)
+    monkeypatch.undo()
+
+    assert archive.get_archive_entry(1)["digest"] == first["digest"]
+    assert [b.index for b in archive.load_segment(1)] == [1, 2, 3]
+    assert archive.verify_archives()[0]
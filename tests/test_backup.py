@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+import archive
+import backup
+import election
+import eligibility
+import storage
+from blockchain import get_blockchain
+from voting import record_vote
+
+
+def _vote(username, election_id, candidate_id):
+    e = next(e for e in election._load_elections() if e["id"] == election_id)
+    vote = {"election_id": election_id, "voter_username": username, "candidate_id": candidate_id}
+    return record_vote(vote, e)
+
+
+@pytest.fixture
+def source(journal_store):
+    """A journaled storage with users, two elections (one archived), a voter roll and votes."""
+    journal_store.save_list("users", [
+        {"username": f"u{i}", "password_hash": "x", "salt": "s", "role": "voter"} for i in range(20)
+    ])
+    election.new_election("First", active=True)
+    election.add_candidates(1, ["A", "B"])
+    election.new_election("Second", active=True)
+    election.add_candidates(2, ["C", "D"])
+    eligibility.set_roll(2, [f"u{i}" for i in range(10)])
+    for i in range(10):
+        _vote(f"u{i}", 1, 1 + i % 2)
+    election.set_election_active(1, False)
+    archive.archive_election(1)
+    for i in range(5):
+        _vote(f"u{i}", 2, 1)
+    return journal_store
+
+
+def _state(store):
+    with storage.use_storage(store):
+        chain = [b.to_dict() for b in archive.full_chain()]
+    lists = {name: store.load_list(name) for name in backup.COPIED_LISTS + ("votes",)}
+    return chain, lists
+
+
+def _restore(backup_dir, tmp_path, name):
+    target = storage.FileStorage(str(tmp_path / name), journaled=("blockchain",))
+    backup.restore_backup(backup_dir, target)
+    return target
+
+
+def test_full_backup_restores_the_same_state(source, tmp_path):
+    manifest = backup.create_backup()
+
+    target = _restore(os.path.join(backup.default_backup_dir(source), manifest["id"]), tmp_path, "restored")
+
+    assert _state(target) == _state(source)
+    with storage.use_storage(target):
+        assert get_blockchain().is_valid()[0]
+        assert archive.verify_archives()[0]
+
+
+def test_incremental_backup_restores_the_later_state(source, tmp_path):
+    backup.create_backup()
+    for i in range(5, 10):
+        _vote(f"u{i}", 2, 2)
+    manifest = backup.create_backup(incremental=True)
+
+    assert manifest["kind"] == "incremental"
+    assert manifest["chain"]["new_blocks"] == 5
+    assert manifest["votes"] == {"count": 20, "new_votes": 5, "last_id": 20}
+    target = _restore(os.path.join(backup.default_backup_dir(source), manifest["id"]), tmp_path, "restored")
+    assert _state(target) == _state(source)
+
+
+def test_incremental_backup_needs_the_backed_up_votes_unchanged(source):
+    backup.create_backup()
+    votes = source.load_list("votes")
+    source.save_list("votes", votes[1:])
+
+    with pytest.raises(backup.BackupError):
+        backup.create_backup(incremental=True)
+
+
+def test_tampered_backup_is_rejected_before_anything_is_written(source, tmp_path):
+    manifest = backup.create_backup()
+    backup_dir = os.path.join(backup.default_backup_dir(source), manifest["id"])
+    with open(os.path.join(backup_dir, "elections.json"), "r+", encoding="utf-8") as f:
+        elections = json.load(f)
+        elections[0]["title"] = "Forged"
+        f.seek(0)
+        f.truncate()
+        json.dump(elections, f)
+
+    target = storage.FileStorage(str(tmp_path / "restored"), journaled=("blockchain",))
+    with pytest.raises(backup.BackupError):
+        backup.restore_backup(backup_dir, target)
+    assert not os.path.exists(target.data_dir)
+
+
+def test_restore_refuses_to_overwrite_without_force(source, tmp_path):
+    manifest = backup.create_backup()
+    backup_dir = os.path.join(backup.default_backup_dir(source), manifest["id"])
+
+    with pytest.raises(backup.BackupError):
+        backup.restore_backup(backup_dir, source)
+    backup.restore_backup(backup_dir, source, force=True)
@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+import archive
+import election
+from blockchain import Block, Blockchain, get_blockchain
+from chain_diff import diff_chains, first_divergence, load_chain_file
+
+
+def _copy(chain):
+    return [Block.from_dict(b.to_dict()) for b in chain]
+
+
+def _fork(chain, position):
+    """A copy whose block at `position` names another candidate, rehashed from there on."""
+    forked = _copy(chain)
+    forked[position].candidate_id += 1
+    for i in range(position, len(forked)):
+        b = forked[i]
+        b.previous_hash = forked[i - 1].hash
+        b.hash = Blockchain._calculate_hash(b.index, b.timestamp, b.voter_hash, b.election_id,
+                                            b.candidate_id, b.previous_hash, b.ranking)
+    return forked
+
+
+@pytest.fixture
+def chain(memory_store):
+    election.new_election("A")
+    election.new_election("B")
+    bc = get_blockchain()
+    for i in range(40):
+        bc.add_vote_block(f"v{i}", 1 + i % 2, 1)
+    return bc
+
+
+def test_identical_chains(chain):
+    diff = diff_chains(chain.get_chain(), _copy(chain.get_chain()))
+
+    assert not diff["forked"]
+    assert diff["common_prefix"] == 41
+    assert not diff["changed"] and not diff["only_a"] and not diff["only_b"]
+
+
+def test_longer_chain_is_an_extension_not_a_fork(chain):
+    old = _copy(chain.get_chain())
+    chain.add_vote_block("late", 1, 1)
+
+    diff = diff_chains(old, chain.get_chain())
+
+    assert not diff["forked"]
+    assert [b["index"] for b in diff["only_b"]] == [41]
+
+
+@pytest.mark.parametrize("position", [1, 20, 40])
+def test_fork_is_found_at_its_block_index(chain, position):
+    blocks = chain.get_chain()
+
+    common, fork_index, comparisons = first_divergence(blocks, _fork(blocks, position))
+
+    assert fork_index == blocks[position].index
+    assert common == position
+    assert comparisons <= 7   # about log2(41)
+
+
+def test_archived_blocks_are_not_a_fork(chain):
+    backup = _copy(chain.get_chain())
+    archive.archive_election(1)
+    live = chain.get_chain()
+    assert len(live) < len(backup)
+
+    without_links = diff_chains(live, backup)
+    with_links = diff_chains(live, backup, links_a=chain.archived_links)
+
+    assert not without_links["forked"]
+    assert without_links["unmatched_b"] == 20
+    assert not with_links["forked"]
+    assert with_links["common_prefix"] == 41
+
+
+def test_fork_inside_archived_blocks_is_found_through_the_links(chain):
+    backup = _copy(chain.get_chain())
+    archive.archive_election(1)
+    tampered = _fork(backup, 39)   # the last block of the archived election
+    assert tampered[39].election_id == 1
+
+    diff = diff_chains(chain.get_chain(), tampered, links_a=chain.archived_links)
+
+    assert diff["forked"]
+    assert diff["fork_index"] == 39
+    assert diff["changed"][0]["fields"] == ["hash"]
+
+
+class _CountingList(list):
+    """A chain that counts how many blocks are looked at."""
+
+    reads = 0
+
+    def __getitem__(self, item):
+        self.reads += 1
+        return super().__getitem__(item)
+
+
+def test_fork_search_looks_at_logarithmically_many_blocks():
+    chain = [Block(i, "t", "v", 1, 1, str(i - 1), f"h{i}") for i in range(100_000)]
+    forked = chain[:70_000] + [Block(i, "t", "v", 1, 2, str(i - 1), f"x{i}") for i in range(70_000, 100_000)]
+    a, b = _CountingList(chain), _CountingList(forked)
+
+    _, fork_index, comparisons = first_divergence(a, b)
+
+    assert fork_index == 70_000
+    assert comparisons <= 17
+    assert a.reads + b.reads < 500
+
+
+# ---------- loading copies ----------
+
+def _write_journal(path, blocks, tail=""):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(b.to_dict()) + "\n" for b in blocks)
+        f.write(tail)
+
+
+def test_torn_last_journal_line_is_ignored(chain, tmp_path):
+    path = str(tmp_path / "blockchain.jsonl")
+    _write_journal(path, chain.get_chain(), '{"index": 41, "times')
+
+    assert [b.hash for b in load_chain_file(path)] == [b.hash for b in chain.get_chain()]
+
+
+def test_damage_before_the_last_journal_line_is_an_error(chain, tmp_path):
+    path = str(tmp_path / "blockchain.jsonl")
+    blocks = chain.get_chain()
+    _write_journal(path, blocks[:10], "garbage\n" + "".join(json.dumps(b.to_dict()) + "\n" for b in blocks[10:]))
+
+    with pytest.raises(ValueError, match="line 11"):
+        load_chain_file(path)
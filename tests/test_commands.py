@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+import commands
+
+
+def _batch(lines):
+    out = []
+    ran, failed = commands.run_batch(lines, out.append)
+    # every outcome must survive a JSON-lines round trip
+    return ran, failed, [json.loads(json.dumps(o)) for o in out]
+
+
+def test_batch_runs_each_line_in_order(memory_store):
+    ran, failed, out = _batch(['create-election --title "A B" --open', "add-candidate 1 X Y", "", "# note", "list"])
+
+    assert (ran, failed) == (3, 0)
+    assert [o["line"] for o in out] == [1, 2, 5]
+    assert out[-1]["result"]["elections"][0]["candidates"] == [{"id": 1, "name": "X"}, {"id": 2, "name": "Y"}]
+
+
+@pytest.mark.parametrize("line", ["list -h", "results --help", "toggle", "nope", 'create-election --title "x'])
+def test_bad_or_help_lines_become_error_records(memory_store, capsys, line):
+    ran, failed, out = _batch([line, "list"])
+
+    assert (ran, failed) == (2, 1)
+    assert not out[0]["ok"] and out[0]["error"]
+    assert out[1]["ok"]
+    assert capsys.readouterr().out == ""   # nothing but the emitted records
@@ -0,0 +1,89 @@
+import pytest
+
+import election
+import eligibility
+from eligibility import Bitset
+from voting import AlreadyVoted, NotEligible, record_vote
+
+
+# ---------- Bitset ----------
+
+def test_bitset_membership_and_counts():
+    a, b = Bitset(), Bitset()
+    for n in (0, 3, 9, 100, 1000):
+        a.add(n)
+    for n in (3, 7, 1000):
+        b.add(n)
+
+    assert 100 in a and 1 not in a and 5000 not in a
+    assert a.count() == 5
+    assert a.count_and(b) == 2
+    assert b.count_and(a) == 2
+    assert a.nbytes == 1000 // 8 + 1
+
+
+def test_bitset_round_trips_through_bytes():
+    a = Bitset()
+    for n in range(0, 300, 7):
+        a.add(n)
+
+    b = Bitset(a.to_bytes())
+
+    assert [n for n in range(300) if n in b] == list(range(0, 300, 7))
+    assert b.count() == a.count()
+
+
+def test_empty_bitsets_count_zero():
+    assert Bitset().count() == 0
+    assert Bitset().count_and(Bitset(b"\xff")) == 0
+
+
+# ---------- rolls and has-voted ----------
+
+@pytest.fixture
+def users(memory_store):
+    memory_store.save_list("users", [
+        {"username": f"u{i}", "password_hash": "x", "salt": "s", "role": "voter"} for i in range(5)
+    ])
+    election.new_election("E", active=True)
+    election.add_candidates(1, ["A", "B"])
+    return memory_store
+
+
+def _vote(username, election_id=1):
+    e = next(e for e in election._load_elections() if e["id"] == election_id)
+    return record_vote({"election_id": election_id, "voter_username": username, "candidate_id": 1}, e)
+
+
+def test_roll_limits_who_may_vote(users):
+    eligibility.set_roll(1, ["u0", "u1"])
+
+    _vote("u0")
+    with pytest.raises(NotEligible):
+        _vote("u2")
+    with pytest.raises(AlreadyVoted):
+        _vote("u0")
+
+    e = election._load_elections()[0]
+    assert eligibility.get_rolls().turnout(e) == {"election_id": 1, "eligible": 2, "voted": 1, "percent": 50.0}
+
+
+def test_unknown_users_are_refused_on_a_roll(users):
+    with pytest.raises(eligibility.RollError):
+        eligibility.set_roll(1, ["u0", "nobody"])
+    assert "roll" not in election._load_elections()[0]
+
+
+def test_mark_voted_does_not_hide_a_concurrent_change(users):
+    rolls = eligibility.EligibilityRolls(users)
+    assert not rolls.has_voted("u1", 1)   # version of the empty list is now cached
+    # another writer adds a vote, then this one saves its own
+    users.save_list("votes", [{"id": 1, "election_id": 1, "voter_username": "u1", "candidate_id": 1}])
+    before = users.version("votes")
+    users.save_list("votes", users.load_list("votes") + [
+        {"id": 2, "election_id": 1, "voter_username": "u0", "candidate_id": 1}])
+
+    rolls.mark_voted("u0", 1, before)
+
+    assert rolls.has_voted("u0", 1)
+    assert rolls.has_voted("u1", 1)
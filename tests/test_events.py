@@ -0,0 +1,50 @@
+import re
+import threading
+
+from events import EventPublisher
+
+
+def _ids(messages):
+    return [int(m) for m in re.findall(r"^id: (\d+)$", "".join(messages), re.M)]
+
+
+def test_concurrent_publishers_deliver_in_id_order():
+    publisher = EventPublisher(buffer_size=100_000)
+    live = publisher.subscribe()
+    start = threading.Barrier(8)
+
+    def publish():
+        start.wait()
+        for i in range(500):
+            publisher.publish("tally", {"n": i})
+
+    threads = [threading.Thread(target=publish) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert _ids(live.get(timeout=0)) == list(range(1, 4001))
+
+
+def test_reconnect_replays_what_was_missed():
+    publisher = EventPublisher()
+    for i in range(5):
+        publisher.publish("block", {"n": i})
+
+    replay = publisher.subscribe(last_event_id=3)
+    publisher.publish("block", {"n": 5})
+
+    assert _ids(replay.get(timeout=0)) == [4, 5, 6]
+
+
+def test_slow_subscriber_gets_a_resync_instead_of_a_backlog():
+    publisher = EventPublisher(buffer_size=3)
+    slow = publisher.subscribe()
+    for i in range(10):
+        publisher.publish("block", {"n": i})
+
+    messages = slow.get(timeout=0)
+
+    assert messages[0].startswith("event: resync")
+    assert len(messages) <= 4
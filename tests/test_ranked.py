@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+import archive
+import election
+import ranked
+from blockchain import get_blockchain
+from ranked import RankedBallots, instant_runoff
+
+
+def _ballots(candidate_ids, *groups):
+    """groups: (ranking, count) pairs."""
+    ballots = RankedBallots(candidate_ids)
+    for ranking, count in groups:
+        ballots.add(ranking, count)
+    return ballots
+
+
+# ---------- instant runoff ----------
+
+def test_first_round_majority_wins_without_eliminations():
+    result = instant_runoff(_ballots([1, 2], ([1], 3), ([2], 1)))
+
+    assert result["winner"] == 1
+    assert len(result["rounds"]) == 1
+    assert "eliminated" not in result["rounds"][0]
+
+
+def test_eliminated_candidate_transfers_to_next_choice():
+    result = instant_runoff(_ballots([1, 2, 3], ([1], 4), ([2, 3], 3), ([3, 2], 2)))
+
+    first, second = result["rounds"]
+    assert first["counts"] == {1: 4, 2: 3, 3: 2}
+    assert first["eliminated"] == 3
+    assert first["transfers"] == {2: 2}
+    assert second["counts"] == {1: 4, 2: 5}
+    assert result["winner"] == 2
+
+
+def test_ballots_without_a_continuing_choice_are_exhausted():
+    result = instant_runoff(_ballots([1, 2, 3], ([1], 3), ([2], 2), ([3], 1)))
+
+    assert result["rounds"][0]["eliminated"] == 3
+    assert result["rounds"][0]["transfers"] == {"exhausted": 1}
+    assert result["rounds"][1]["exhausted"] == 1
+    assert result["winner"] == 1
+
+
+def test_tie_for_last_without_history_eliminates_the_candidate_listed_last():
+    result = instant_runoff(_ballots([1, 2, 3], ([1], 3), ([2], 2), ([3], 2)))
+
+    assert result["rounds"][0]["eliminated"] == 3
+    assert result["winner"] == 1
+
+
+def test_tie_for_last_goes_to_fewer_votes_in_an_earlier_round():
+    # round 1: 2 has 3 votes, 3 has 4; after 4 is eliminated both have 4
+    result = instant_runoff(_ballots([1, 2, 3, 4], ([1], 6), ([3], 4), ([2], 3), ([4, 2], 1)))
+
+    assert result["rounds"][0]["eliminated"] == 4
+    assert result["rounds"][1]["counts"][2] == result["rounds"][1]["counts"][3] == 4
+    assert result["rounds"][1]["eliminated"] == 2
+    assert result["winner"] == 1
+
+
+def test_no_ballots_means_no_winner():
+    result = instant_runoff(_ballots([1, 2]))
+
+    assert result["winner"] is None
+    assert result["rounds"][0]["counts"] == {1: 0, 2: 0}
+
+
+# ---------- ballots from the chain ----------
+
+@pytest.fixture
+def ranked_election(memory_store):
+    election.new_election("Board", kind=ranked.RANKED, active=True)
+    election.add_candidates(1, ["A", "B", "C"])
+    election.new_election("Other", active=True)
+    election.add_candidates(2, ["X"])
+    return 1
+
+
+def _cast(votes, username, election_id, ranking):
+    get_blockchain().add_vote_block(username, election_id, ranking[0], ranking=ranking)
+    votes.append({"election_id": election_id, "candidate_id": ranking[0], "ranking": ranking})
+
+
+def _election(election_id):
+    return next(e for e in election._load_elections() if e["id"] == election_id)
+
+
+def test_chain_ballots_follow_new_blocks_and_archiving(ranked_election):
+    rng = random.Random(3)
+    votes = []
+    for i in range(60):
+        _cast(votes, f"v{i}", 1, rng.sample([1, 2, 3], rng.randint(1, 3)))
+    _cast(votes, "other", 2, [1])
+    e = _election(1)
+    assert ranked.tabulate_election(e) == ranked.tabulate_election(e, votes)
+
+    _cast(votes, "late", 1, [3, 2])
+    assert ranked.tabulate_election(e) == ranked.tabulate_election(e, votes)
+
+    election.set_election_active(1, False)
+    archive.archive_election(1)
+    e = _election(1)
+    assert len(ranked.ballots_for_election(e)) == 61
+    assert ranked.tabulate_election(e) == ranked.tabulate_election(e, votes)
@@ -0,0 +1,70 @@
+import pytest
+
+import archive
+import election
+from blockchain import get_blockchain
+from reconcile import get_reconciler
+from voting import _load_votes, _save_votes, record_vote
+
+
+def _vote(username, election_id=1, candidate_id=1):
+    e = next(e for e in election._load_elections() if e["id"] == election_id)
+    return record_vote({"election_id": election_id, "voter_username": username, "candidate_id": candidate_id}, e)
+
+
+@pytest.fixture
+def votes(memory_store):
+    election.new_election("A", active=True)
+    election.add_candidates(1, ["X", "Y"])
+    election.new_election("B", active=True)
+    election.add_candidates(2, ["Z"])
+    for i in range(10):
+        _vote(f"v{i}", 1 + i % 2)
+    return memory_store
+
+
+def test_votes_recorded_normally_are_consistent(votes):
+    report = get_reconciler().report()
+
+    assert report["consistent"]
+    assert report["matched"] == 10
+
+
+def test_new_votes_are_picked_up_incrementally(votes):
+    get_reconciler()
+    _vote("late", 1)
+
+    report = get_reconciler().report()
+
+    assert report["consistent"]
+    assert report["matched"] == 11
+
+
+def test_each_kind_of_discrepancy_is_reported(votes):
+    get_reconciler()
+    bc = get_blockchain()
+    bc.add_vote_block("chain-only", 1, 1)                          # block without a vote
+    saved = _load_votes()
+    saved.append({"id": 100, "election_id": 1, "voter_username": "votes-only", "candidate_id": 2})
+    saved[0]["candidate_id"] = 2                                   # vote and block disagree
+    saved.append({**saved[1], "id": 101})                          # second ballot of one voter
+    _save_votes(saved)
+
+    report = get_reconciler(full=True).report()
+
+    assert not report["consistent"]
+    assert [m["vote_id"] for m in report["missing_on_chain"]] == [100]
+    assert [m["block_index"] for m in report["missing_in_votes"]] == [bc.get_chain()[-1].index]
+    assert [(m["vote_candidate_id"], m["block_candidate_id"]) for m in report["mismatched"]] == [(2, 1)]
+    assert [d["vote_id"] for d in report["duplicates"]] == [101]
+
+
+def test_archiving_keeps_the_sources_consistent(votes):
+    get_reconciler()
+    election.set_election_active(1, False)
+    archive.archive_election(1)
+
+    report = get_reconciler().report()
+
+    assert report["consistent"]
+    assert report["matched"] == 10
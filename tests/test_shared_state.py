@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import struct
+
+import pytest
+
+import archive
+import election
+import shared_state
+import storage
+import voting
+from blockchain import Blockchain, get_blockchain
+from shared_state import SharedLedger, ledger_path
+
+pytestmark = pytest.mark.skipif(shared_state.fcntl is None, reason="needs POSIX file locks")
+
+
+@pytest.fixture
+def shared_store(tmp_path):
+    """A FileStorage sharing its ledger, current for the test."""
+    store = storage.from_config(storage.SHARED_PREFIX + str(tmp_path))
+    with storage.use_storage(store):
+        yield store
+    store.close()
+
+
+def _reader(store):
+    """A second view of the ledger, as another worker process would map it."""
+    return SharedLedger(ledger_path(store))
+
+
+def _add_votes(bc, count, candidates=2):
+    for i in range(count):
+        bc.add_vote_block(f"voter{i}", 1, 1 + i % candidates)
+
+
+# ---------- append, grow, rebuild ----------
+
+def test_appended_blocks_are_published(shared_store):
+    bc = get_blockchain()
+    _add_votes(bc, 5)
+
+    ledger = _reader(shared_store)
+    header = ledger.header()
+
+    assert header.count == 6
+    assert header.journal_offset == shared_store.journal_size("blockchain")
+    assert ledger.snapshot().last_hash == bc.get_chain()[-1].hash
+    assert ledger.tallies()[1] == {1: {1: 3, 2: 2}}
+
+
+def test_full_segment_is_replaced_by_a_bigger_one(shared_store, monkeypatch):
+    monkeypatch.setattr(shared_state, "INITIAL_ROWS", 4)
+    monkeypatch.setattr(shared_state, "INITIAL_TALLY_SLOTS", 2)
+    bc = get_blockchain()
+    ledger = _reader(shared_store)
+    old = ledger.header()
+
+    _add_votes(bc, 10, candidates=3)
+
+    header = ledger.header()
+    assert (old.capacity, old.tally_capacity) == (4, 2)
+    assert header.capacity >= 11 and header.tally_capacity >= 3
+    assert header.generation == old.generation
+    assert ledger.tallies()[1] == {1: {1: 4, 2: 3, 3: 3}}
+    assert [ledger.snapshot().segment.row_hash(i) for i in range(11)] == [b.hash for b in bc.get_chain()]
+
+
+def test_archiving_rebuilds_a_new_generation(shared_store):
+    election.new_election("A")
+    election.new_election("B")
+    bc = get_blockchain()
+    for i in range(6):
+        bc.add_vote_block(f"v{i}", 1 + i % 2, 1)
+    ledger = _reader(shared_store)
+    before = ledger.header()
+
+    archive.archive_election(1)
+
+    header = ledger.header()
+    assert header.generation == before.generation + 1
+    assert header.count == len(bc.get_chain())
+    assert header.journal_offset == shared_store.journal_size("blockchain")
+    assert ledger.tallies()[1] == {2: {1: 3}}
+
+
+# ---------- failed publish ----------
+
+def test_block_the_ledger_cannot_hold_is_not_saved(shared_store):
+    bc = get_blockchain()
+    _add_votes(bc, 2)
+    size = shared_store.journal_size("blockchain")
+
+    with pytest.raises(struct.error):
+        bc.add_vote_block("big", 1, 2 ** 64)
+
+    assert shared_store.journal_size("blockchain") == size
+    assert len(bc.get_chain()) == 3
+    ledger = _reader(shared_store)
+    assert ledger.header().count == 3   # the seqlock is even: this doesn't spin
+    bc.add_vote_block("next", 1, 1)
+    assert ledger.header().count == 4
+
+
+def test_vote_without_a_block_is_taken_back_out(shared_store):
+    election.new_election("A", active=True)
+    election.add_candidates(1, ["X"])
+    e = election._load_elections()[0]
+
+    with pytest.raises(struct.error):
+        voting.record_vote({"election_id": 1, "voter_username": "big", "candidate_id": 2 ** 64}, e)
+
+    assert shared_store.load_list("votes") == []
+    assert not voting.has_user_voted_in_election("big", 1)
+
+
+def test_failed_publish_rolls_back_the_journal(shared_store, monkeypatch):
+    bc = get_blockchain()
+    _add_votes(bc, 2)
+    size = shared_store.journal_size("blockchain")
+
+    def fail(row, offset):
+        raise OSError("disk full")
+    monkeypatch.setattr(bc.shared, "append", fail)
+    with pytest.raises(OSError):
+        bc.add_vote_block("lost", 1, 1)
+    monkeypatch.undo()
+
+    assert shared_store.journal_size("blockchain") == size
+    reloaded = Blockchain(storage.from_config(storage.SHARED_PREFIX + shared_store.base_dir))
+    assert [b.hash for b in reloaded.get_chain()] == [b.hash for b in bc.get_chain()]
+
+
+# ---------- seqlock across processes ----------
+
+def _write_votes(config, count):
+    with storage.use_storage(storage.from_config(config)):
+        _add_votes(get_blockchain(), count, candidates=3)
+    os._exit(0)
+
+
+def test_reader_in_another_process_sees_whole_updates(shared_store):
+    get_blockchain()
+    ledger = _reader(shared_store)
+    writer = multiprocessing.get_context("fork").Process(
+        target=_write_votes, args=(storage.SHARED_PREFIX + shared_store.base_dir, 300))
+    writer.start()
+
+    reads = 0
+    while True:
+        done = not writer.is_alive()
+        (generation, count, last_hash), tallies = ledger.tallies()
+        # the tallies always cover exactly the published rows (all but genesis)
+        assert sum(n for counts in tallies.values() for n in counts.values()) == count - 1
+        assert last_hash == ledger.snapshot().prefix(count).last_hash
+        reads += 1
+        if done:
+            break
+    writer.join()
+
+    assert writer.exitcode == 0
+    assert count == 301
+    assert reads > 1
@@ -0,0 +1,54 @@
+import gzip
+import re
+
+import pytest
+
+import api_server
+from static_assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+
+
+@pytest.fixture
+def client():
+    return api_server.create_app(":memory:", admission_control=False).test_client()
+
+
+def _page(client):
+    return client.get("/").get_data(as_text=True)
+
+
+def test_page_links_its_files_by_fingerprinted_url(client):
+    urls = re.findall(r'(?:src|href)="(/assets/[^"]+)"', _page(client))
+
+    assert len(urls) == 2
+    for url in urls:
+        resp = client.get(url)
+        assert resp.status_code == 200
+        assert resp.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+@pytest.mark.parametrize("path", ["/", "/index.html"])
+def test_entry_page_is_revalidated_with_its_etag(client, path):
+    resp = client.get(path)
+    again = client.get(path, headers={"If-None-Match": resp.headers["ETag"]})
+
+    assert resp.headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+    assert again.status_code == 304
+
+
+def test_unknown_files_are_not_found(client):
+    assert client.get("/assets/app.000000000000.js").status_code == 404
+    assert client.get("/missing.js").status_code == 404
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip", "gzip"),
+    ("gzip;q=0, identity", None),
+    ("GZIP ; q=0.5", "gzip"),
+    ("", None),
+])
+def test_precompressed_variant_follows_accept_encoding(client, accept, encoding):
+    resp = client.get("/index.html", headers={"Accept-Encoding": accept})
+
+    assert resp.headers.get("Content-Encoding") == encoding
+    body = gzip.decompress(resp.data) if encoding == "gzip" else resp.data
+    assert body.decode("utf-8") == _page(client)
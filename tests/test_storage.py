@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+import storage
+from blockchain import Blockchain
+
+
+def _add_votes(bc, count):
+    for i in range(count):
+        bc.add_vote_block(f"voter{i}", 1, 1 + i % 2)
+
+
+# ---------- torn journal recovery ----------
+
+def test_torn_last_line_is_cut_off_on_load(journal_store):
+    bc = Blockchain(journal_store)
+    _add_votes(bc, 5)
+    path = journal_store.path("blockchain")
+    good_size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b'{"index": 6, "timestamp": "2026-')   # crash mid-append
+
+    reloaded = Blockchain(storage.FileStorage(journal_store.base_dir, journaled=("blockchain",)))
+
+    assert len(reloaded.get_chain()) == 6
+    assert reloaded.is_valid()[0]
+    assert os.path.getsize(path) == good_size
+
+
+def test_complete_but_invalid_last_record_is_dropped(journal_store):
+    bc = Blockchain(journal_store)
+    _add_votes(bc, 3)
+    path = journal_store.path("blockchain")
+    last = bc.get_chain()[-1].to_dict()
+    forged = {**last, "index": last["index"] + 1, "previous_hash": last["hash"], "candidate_id": 2}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(forged) + "\n")   # parses, but its hash doesn't match
+
+    reloaded = Blockchain(storage.FileStorage(journal_store.base_dir, journaled=("blockchain",)))
+
+    assert [b.hash for b in reloaded.get_chain()] == [b.hash for b in bc.get_chain()]
+
+
+def test_recover_journal_reads_back_across_chunks(tmp_path):
+    path = tmp_path / "log.jsonl"
+    records = [{"n": i, "pad": "x" * 50} for i in range(100)]
+    path.write_text("".join(json.dumps(r) + "\n" for r in records) + '{"n": 100, "pa')
+
+    removed = storage.recover_journal(str(path), chunk_size=16)
+
+    assert removed == len('{"n": 100, "pa')
+    assert [json.loads(line)["n"] for line in path.read_text().splitlines()] == list(range(100))
+
+
+# ---------- corruption ----------
+
+@pytest.mark.parametrize("name", ["users", "votes", "elections"])
+def test_unparsable_list_raises_instead_of_reading_empty(journal_store, name):
+    os.makedirs(journal_store.data_dir, exist_ok=True)
+    with open(journal_store.path(name), "w", encoding="utf-8") as f:
+        f.write('[{"id": 1,')
+
+    with pytest.raises(storage.StorageCorruptedError):
+        journal_store.load_list(name)
+
+
+def test_list_file_that_is_not_a_list_raises(journal_store):
+    os.makedirs(journal_store.data_dir, exist_ok=True)
+    with open(journal_store.path("elections"), "w", encoding="utf-8") as f:
+        f.write('{"id": 1}')
+
+    with pytest.raises(storage.StorageCorruptedError):
+        journal_store.load_list("elections")
+
+
+def test_damage_before_the_journal_tail_raises(journal_store):
+    bc = Blockchain(journal_store)
+    _add_votes(bc, 3)
+    path = journal_store.path("blockchain")
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    lines[1] = lines[1][:20] + "\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+
+    with pytest.raises(storage.StorageCorruptedError):
+        journal_store.load_list("blockchain")
@@ -0,0 +1,433 @@
+const authMsg = document.getElementById("authMessage");
+const regMsg  = document.getElementById("regMessage");
+const userPill = document.getElementById("currentUserPill");
+const logoutBtn = document.getElementById("logoutBtn");
+
+// Everything the page needs comes from one /api/bootstrap call.
+const state = {
+  user: null,
+  activeElections: [],
+  elections: [],   // admin only
+  results: [],     // admin only
+};
+
+// ---------- helpers ----------
+
+// multi-tenant servers also serve each organization under /t/<name>/
+const TENANT_PREFIX = (location.pathname.match(/^\/t\/[a-z0-9][a-z0-9-]*/) || [""])[0];
+
+async function api(path, options = {}) {
+  const res = await fetch(TENANT_PREFIX + path, {
+    credentials: "include",          // send cookies for session
+    headers: { "Content-Type": "application/json" },
+    ...options,
+  });
+  return res.json();
+}
+
+function appendLog(line) {
+  // session-only view of what this page did; the real audit trail is logs/actions.log
+  const box = document.getElementById("logBox");
+  const div = document.createElement("div");
+  div.className = "log-line";
+  div.textContent = `[${new Date().toISOString()}] ${line}`;
+  box.appendChild(div);
+  box.scrollTop = box.scrollHeight;
+}
+
+function setUserPill(user) {
+  if (!user) {
+    userPill.textContent = "Not logged in";
+    logoutBtn.style.display = "none";
+  } else {
+    userPill.textContent = `${user.username} (${user.role.toUpperCase()})`;
+    logoutBtn.style.display = "inline-flex";
+  }
+}
+
+function showSection(id) {
+  document.querySelectorAll(".section").forEach(sec => {
+    sec.classList.toggle("active", sec.id === id);
+  });
+  document.querySelectorAll(".nav-btn").forEach(btn => {
+    btn.classList.toggle("active", btn.dataset.section === id);
+  });
+}
+
+async function bootstrap() {
+  const data = await api("/api/bootstrap");
+  if (!data.ok) return;
+  state.user = data.user;
+  state.activeElections = data.active_elections || [];
+  state.elections = data.elections || [];
+  state.results = data.results || [];
+  setUserPill(state.user);
+  renderActiveElections();
+  if (state.user && state.user.role === "admin") {
+    renderElections();
+    renderResults();
+  }
+}
+
+// ---------- AUTH ----------
+
+document.getElementById("registerSubmit").addEventListener("click", async () => {
+  const u = document.getElementById("regUsername").value.trim();
+  const p = document.getElementById("regPassword").value;
+  const c = document.getElementById("regConfirm").value;
+
+  if (!u || !p || !c) {
+    regMsg.textContent = "Please fill all fields.";
+    return;
+  }
+  if (p !== c) {
+    regMsg.textContent = "Passwords do not match.";
+    return;
+  }
+
+  const data = await api("/api/register", {
+    method: "POST",
+    body: JSON.stringify({ username: u, password: p }),
+  });
+
+  if (data.ok) {
+    regMsg.textContent = `Registered as ${data.role.toUpperCase()}. You can now login.`;
+    appendLog(`REGISTER user=${u} role=${data.role}`);
+  } else {
+    regMsg.textContent = data.error || "Error during registration.";
+  }
+});
+
+document.getElementById("loginSubmit").addEventListener("click", async () => {
+  const u = document.getElementById("loginUsername").value.trim();
+  const p = document.getElementById("loginPassword").value;
+
+  const data = await api("/api/login", {
+    method: "POST",
+    body: JSON.stringify({ username: u, password: p }),
+  });
+
+  if (data.ok) {
+    authMsg.textContent = `Logged in as ${data.role.toUpperCase()}.`;
+    appendLog(`LOGIN user=${data.username} role=${data.role}`);
+    await bootstrap();
+    showSection(data.role === "admin" ? "adminSection" : "voterSection");
+  } else {
+    authMsg.textContent = data.error || "Login failed.";
+  }
+});
+
+logoutBtn.addEventListener("click", async () => {
+  await api("/api/logout", { method: "POST" });
+  if (state.user) appendLog(`LOGOUT user=${state.user.username}`);
+  state.user = null;
+  state.elections = [];
+  state.results = [];
+  setUserPill(null);
+  showSection("authSection");
+});
+
+// ---------- NAV GUARDS ----------
+
+document.querySelectorAll(".nav-btn").forEach(btn => {
+  btn.addEventListener("click", () => {
+    const target = btn.dataset.section;
+    const user = state.user;
+
+    if (target === "adminSection" && (!user || user.role !== "admin")) {
+      alert("You must login as ADMIN to view this section.");
+      showSection("authSection");
+      return;
+    }
+    if (target === "voterSection" && !user) {
+      alert("You must login as a voter/admin to view this section.");
+      showSection("authSection");
+      return;
+    }
+    showSection(target);
+  });
+});
+
+// ---------- ADMIN: elections + blockchain + results ----------
+
+function renderElections() {
+  const container = document.getElementById("electionList");
+  container.innerHTML = "";
+
+  state.elections.forEach(e => {
+    const div = document.createElement("div");
+    div.className = "item";
+
+    const header = document.createElement("div");
+    header.className = "item-header";
+
+    const title = document.createElement("div");
+    title.className = "item-title";
+    title.textContent = `#${e.id} – ${e.title}`;
+    const pill = document.createElement("span");
+    pill.className = "pill";
+    pill.textContent = e.is_active ? "ACTIVE" : "CLOSED";
+
+    header.appendChild(title);
+    header.appendChild(pill);
+
+    const desc = document.createElement("div");
+    desc.className = "small-text";
+    desc.textContent = e.description || "No description.";
+
+    const cand = document.createElement("div");
+    cand.className = "small-text";
+    cand.textContent = "Candidates: " +
+      (e.candidates.length
+        ? e.candidates.map(c => `${c.id}) ${c.name}`).join(", ")
+        : "none yet.");
+
+    const controls = document.createElement("div");
+    controls.className = "row";
+    controls.style.marginTop = "4px";
+
+    const inp = document.createElement("input");
+    inp.placeholder = "New candidate name";
+    inp.style.flex = "1";
+
+    const addBtn = document.createElement("button");
+    addBtn.className = "btn-ghost";
+    addBtn.textContent = "Add";
+    addBtn.onclick = async () => {
+      const name = inp.value.trim();
+      if (!name) return;
+      const data = await api(`/api/elections/${e.id}/candidates`, {
+        method: "POST",
+        body: JSON.stringify({ name }),
+      });
+      if (!data.ok) {
+        alert(data.error || "Could not add candidate.");
+        return;
+      }
+      appendLog(`ADD_CANDIDATE election=${e.id} name="${name}"`);
+      bootstrap();
+    };
+
+    const toggleBtn = document.createElement("button");
+    toggleBtn.className = "btn-ghost";
+    toggleBtn.textContent = e.is_active ? "Close" : "Open";
+    toggleBtn.onclick = async () => {
+      const data = await api(`/api/elections/${e.id}/toggle`, { method: "POST" });
+      if (!data.ok) {
+        alert(data.error || "Could not change election status.");
+        return;
+      }
+      appendLog(`TOGGLE_ELECTION id=${e.id} now=${data.election.is_active ? "ACTIVE" : "CLOSED"}`);
+      bootstrap();
+    };
+
+    controls.appendChild(inp);
+    controls.appendChild(addBtn);
+    controls.appendChild(toggleBtn);
+
+    div.appendChild(header);
+    div.appendChild(desc);
+    div.appendChild(cand);
+    div.appendChild(controls);
+
+    container.appendChild(div);
+  });
+}
+
+document.getElementById("createElectionBtn").addEventListener("click", async () => {
+  const title = document.getElementById("electionTitle").value.trim();
+  const description = document.getElementById("electionDesc").value.trim();
+  if (!title) {
+    alert("Title is required");
+    return;
+  }
+  const data = await api("/api/elections", {
+    method: "POST",
+    body: JSON.stringify({ title, description }),
+  });
+  if (!data.ok) {
+    alert(data.error || "Could not create election.");
+    return;
+  }
+  appendLog(`CREATE_ELECTION id=${data.election.id} title="${title}"`);
+  document.getElementById("electionTitle").value = "";
+  document.getElementById("electionDesc").value = "";
+  bootstrap();
+});
+
+async function renderBlockchain() {
+  const container = document.getElementById("blockchainContainer");
+  container.innerHTML = "";
+  const data = await api("/api/blockchain");
+  if (!data.ok) return;
+  const chain = data.chain;
+
+  const table = document.createElement("table");
+  table.className = "block-table";
+  const head = document.createElement("thead");
+  head.innerHTML = "<tr><th>#</th><th>Election</th><th>Candidate</th><th>Voter hash</th><th>Prev</th><th>Hash</th></tr>";
+  table.appendChild(head);
+  const body = document.createElement("tbody");
+  chain.forEach(b => {
+    const tr = document.createElement("tr");
+    tr.innerHTML = `
+      <td>${b.index}</td>
+      <td>${b.election_id}</td>
+      <td>${b.candidate_id}</td>
+      <td>${b.voter_hash}</td>
+      <td>${String(b.previous_hash).slice(0, 8)}…</td>
+      <td>${b.hash.slice(0, 8)}…</td>
+    `;
+    body.appendChild(tr);
+  });
+  table.appendChild(body);
+  container.appendChild(table);
+}
+
+document.getElementById("viewChainBtn").addEventListener("click", renderBlockchain);
+
+document.getElementById("checkChainBtn").addEventListener("click", async () => {
+  const res = await api("/api/blockchain/verify");
+  const el = document.getElementById("chainStatus");
+  if (res.valid) {
+    el.innerHTML = `<span class="label-ok">✔ ${res.message}</span>`;
+  } else {
+    el.innerHTML = `<span class="label-bad">✖ ${res.message}</span>`;
+  }
+});
+
+function renderResults() {
+  const container = document.getElementById("resultsContainer");
+  container.innerHTML = "";
+  if (!state.results.length) {
+    container.innerHTML = "<div class='small-text'>No elections / votes yet.</div>";
+    return;
+  }
+  state.results.forEach(({ election: e, counts }) => {
+    const div = document.createElement("div");
+    div.className = "item";
+    const h = document.createElement("div");
+    h.className = "item-header";
+    h.textContent = `Results – #${e.id} ${e.title}`;
+    div.appendChild(h);
+
+    const total = (e.candidates || []).reduce(
+      (acc, c) => acc + (counts[c.id] || 0), 0
+    );
+    const info = document.createElement("div");
+    info.className = "small-text";
+    info.textContent = `Total votes: ${total}`;
+    div.appendChild(info);
+
+    (e.candidates || []).forEach(c => {
+      const line = document.createElement("div");
+      line.className = "small-text";
+      line.textContent = `• ${c.name}: ${counts[c.id] || 0} vote(s)`;
+      div.appendChild(line);
+    });
+
+    container.appendChild(div);
+  });
+}
+
+document.getElementById("showResultsBtn").addEventListener("click", bootstrap);
+
+// ---------- VOTER ----------
+
+function renderActiveElections() {
+  const listDiv = document.getElementById("activeElectionsList");
+  const selElection = document.getElementById("voteElectionSelect");
+  const selCandidate = document.getElementById("voteCandidateSelect");
+
+  listDiv.innerHTML = "";
+  selElection.innerHTML = `<option value="">Choose an active election</option>`;
+  selCandidate.innerHTML = `<option value="">Choose a candidate</option>`;
+
+  state.activeElections.forEach(e => {
+    const div = document.createElement("div");
+    div.className = "item";
+    const header = document.createElement("div");
+    header.className = "item-header";
+    const title = document.createElement("div");
+    title.className = "item-title";
+    title.textContent = `#${e.id} – ${e.title}`;
+    const tag = document.createElement("span");
+    tag.className = "pill";
+    tag.textContent = "ACTIVE";
+    header.appendChild(title);
+    header.appendChild(tag);
+
+    const desc = document.createElement("div");
+    desc.className = "small-text";
+    desc.textContent = e.description || "";
+
+    const cand = document.createElement("div");
+    cand.className = "small-text";
+    cand.textContent = "Candidates: " +
+      (e.candidates.length
+        ? e.candidates.map(c => `${c.id}) ${c.name}`).join(", ")
+        : "none configured yet.");
+
+    div.appendChild(header);
+    div.appendChild(desc);
+    div.appendChild(cand);
+    listDiv.appendChild(div);
+
+    const opt = document.createElement("option");
+    opt.value = e.id;
+    opt.textContent = `#${e.id} – ${e.title}`;
+    selElection.appendChild(opt);
+  });
+}
+
+document.getElementById("voteElectionSelect").addEventListener("change", (e) => {
+  const val = Number(e.target.value);
+  const selCandidate = document.getElementById("voteCandidateSelect");
+  selCandidate.innerHTML = `<option value="">Choose a candidate</option>`;
+  if (!val) return;
+  const election = state.activeElections.find(el => el.id === val);
+  if (!election) return;
+  election.candidates.forEach(c => {
+    const opt = document.createElement("option");
+    opt.value = c.id;
+    opt.textContent = `${c.id}) ${c.name}`;
+    selCandidate.appendChild(opt);
+  });
+});
+
+document.getElementById("castVoteBtn").addEventListener("click", async () => {
+  const electionId = Number(document.getElementById("voteElectionSelect").value);
+  const candidateId = Number(document.getElementById("voteCandidateSelect").value);
+  const msgEl = document.getElementById("voteMessage");
+  msgEl.textContent = "";
+
+  if (!state.user) {
+    msgEl.textContent = "You must be logged in to vote.";
+    return;
+  }
+  if (!electionId || !candidateId) {
+    msgEl.textContent = "Please choose an election and a candidate.";
+    return;
+  }
+
+  const data = await api("/api/vote", {
+    method: "POST",
+    body: JSON.stringify({ election_id: electionId, candidate_id: candidateId }),
+  });
+
+  if (data.ok) {
+    msgEl.textContent = `Vote recorded (block index ${data.block_index}).`;
+    appendLog(`VOTE election=${electionId} candidate=${candidateId} block=${data.block_index}`);
+    if (state.user.role === "admin") bootstrap();
+  } else {
+    msgEl.textContent = data.error || "Voting failed.";
+  }
+});
+
+// ---------- init ----------
+
+bootstrap().then(() => {
+  if (state.user) {
+    showSection(state.user.role === "admin" ? "adminSection" : "voterSection");
+  }
+});